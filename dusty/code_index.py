@@ -0,0 +1,148 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Code tree index: built with single walk over code_path and shared by all SAST tools
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from fnmatch import fnmatch
+from collections import namedtuple
+
+from dusty import constants as c
+from dusty.instrumentation import profile
+
+CodeFile = namedtuple("CodeFile", ["path", "size", "language"])
+
+
+class CodeIndex(object):
+    """ Files of code_path (relative paths, sizes, languages), manifests and skipped vendored,
+    generated (build output) and excluded paths
+
+    exclusions: glob patterns matched against relative paths and base names of files and dirs
+    """
+
+    def __init__(self, code_path, exclusions=None):
+        self.code_path = code_path
+        self.exclusions = list(exclusions) if exclusions else list()
+        self.files = list()
+        self.manifests = dict()
+        self.vendored = list()
+        self.generated = list()
+        self.excluded = list()
+        self.lock = threading.Lock()
+        self.hashes = dict()
+        self.json_cache = dict()
+        with profile.stage("code_index"):
+            self.walk()
+        profile.count("code_index.files", len(self.files))
+        logging.info("Indexed %d file(s) in %s, skipped %d vendored and %d generated dir(s)",
+                     len(self.files), code_path, len(self.vendored), len(self.generated))
+
+    def is_excluded(self, relative_path, name):
+        return any(fnmatch(relative_path, pattern) or fnmatch(name, pattern) for pattern in self.exclusions)
+
+    def walk(self):
+        pending = [""]
+        while pending:
+            relative_dir = pending.pop()
+            try:
+                with os.scandir(os.path.join(self.code_path, relative_dir)) as scanner:
+                    entries = list(scanner)
+            except OSError as e:
+                logging.warning("Failed to list %s: %s", relative_dir, str(e))
+                continue
+            names = {entry.name for entry in entries}
+            for entry in entries:
+                relative_path = os.path.join(relative_dir, entry.name)
+                if self.is_excluded(relative_path, entry.name):
+                    self.excluded.append(relative_path)
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if any(fnmatch(entry.name, pattern) for pattern in c.SAST_EXCLUDED_DIRS):
+                            self.vendored.append(relative_path)
+                        elif names.intersection(c.SAST_GENERATED_DIRS.get(entry.name, [])):
+                            self.generated.append(relative_path)
+                        else:
+                            pending.append(relative_path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                extension = os.path.splitext(entry.name)[1].lower()
+                self.files.append(CodeFile(relative_path, size, c.SAST_LANGUAGE_EXTENSIONS.get(extension)))
+                if any(fnmatch(entry.name, pattern) for pattern in c.SAST_MANIFESTS):
+                    self.manifests.setdefault(entry.name, list()).append(relative_path)
+        self.files.sort()
+        for paths in self.manifests.values():
+            paths.sort()
+
+    def full_path(self, relative_path):
+        return os.path.join(self.code_path, relative_path)
+
+    def languages(self):
+        """ Returns languages (as SastyWrapper methods are named) of indexed files """
+        found = {item.language for item in self.files}
+        return [language for language in c.SAST_LANGUAGES_ORDER if language in found]
+
+    def get_files(self, language=None, full_paths=True):
+        """ Returns list of (path, size) of files in given language (all files if not set) """
+        return [(self.full_path(item.path) if full_paths else item.path, item.size) for item in self.files
+                if language is None or item.language == language]
+
+    def get_manifests(self, *patterns):
+        """ Returns relative paths of manifest files with names matching patterns """
+        return sorted(path for name, paths in self.manifests.items()
+                      if any(fnmatch(name, pattern) for pattern in patterns) for path in paths)
+
+    def file_hash(self, relative_path):
+        """ Content hash (sha256), calculated on first request """
+        with self.lock:
+            if relative_path in self.hashes:
+                return self.hashes[relative_path]
+        digest = hashlib.sha256()
+        with open(self.full_path(relative_path), "rb") as f:
+            for chunk in iter(lambda: f.read(c.CODE_INDEX_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        with self.lock:
+            self.hashes[relative_path] = digest.hexdigest()
+        return self.hashes[relative_path]
+
+    def load_json(self, relative_path):
+        """ Parsed JSON file (package.json and alike), read once per run """
+        with self.lock:
+            if relative_path not in self.json_cache:
+                with open(self.full_path(relative_path)) as f:
+                    self.json_cache[relative_path] = json.load(f)
+            return self.json_cache[relative_path]
+
+
+indexes = dict()
+indexes_lock = threading.Lock()
+
+
+def get_code_index(code_path, exclusions=None):
+    """ Returns index of code_path, built on first request """
+    key = (os.path.abspath(code_path), tuple(exclusions) if exclusions else ())
+    with indexes_lock:
+        if key not in indexes:
+            indexes[key] = CodeIndex(code_path, exclusions)
+        return indexes[key]
@@ -17,7 +17,7 @@ NON_SCANNERS_CONFIG_KEYS = ['target_host', 'target_port', 'protocol', "/",
                             'safe_pipeline_mode', 'project_name', 'environment',
                             'test_type', 'junit_report', 'jira', 'jira_mapping', 'emails',
                             'min_priority', 'code_path', 'composition_analysis', 'influx',
-                            'code_source']
+                            'code_source', 'redis_findings', 'code_exclusions']
 SASTY_SCANNERS_CONFIG_KEYS = ['language', 'npm', 'retirejs', 'ptai', 'safety', 'scan_opts']
 READ_THROUGH_ENV = ['target_host', 'target_port', 'protocol', 'project_name', 'environment']
 CONFIG_ENV_KEY = "CARRIER_SCAN_CONFIG"
@@ -77,6 +77,14 @@ ZAP_CONFIDENCES = {
     "3": "High",
     "4": "User Confirmed"
 }
+ZAP_RISK_CODES = {
+    "Informational": "0",
+    "Low": "1",
+    "Medium": "2",
+    "High": "3"
+}
+ZAP_ALERTS_PAGE_SIZE = 5000
+ZAP_MARKDOWN_CACHE_SIZE = 4096
 ZAP_BLACKLISTED_RULES = [
     10095  # Backup File Disclosure
 ]
@@ -95,6 +103,7 @@ output config console
 set verbose False
 back
 back"""
+W3AF_MAX_BODY_SIZE = 32 * 1024
 
 SEVERITY_TYPE = {
     0: 'Critical',
@@ -104,6 +113,10 @@ SEVERITY_TYPE = {
 }
 
 NVD_URL = 'https://nvd.nist.gov/vuln/detail/'
+NVD_CACHE_PATH = '/tmp/nvd_cache'
+NVD_FETCH_WORKERS = 8
+NVD_FETCH_TIMEOUT = 10
+NVD_ENRICHMENT_TIMEOUT = 120
 JIRA_DESCRIPTION_MAX_SIZE = 61908
 # This is jira.text.field.character.limit default value
 JIRA_COMMENT_MAX_SIZE = 32767
@@ -116,3 +129,71 @@ JIRA_FIELD_DO_NOT_USE_VALUE = '!remove'
 PTAI_DEFAULT_FILTERED_STATUSES = ['discarded', 'suspected']
 QUALYS_STATUS_CHECK_INTERVAL = 60
 QUALYS_MAX_STATUS_CHECK_ERRORS = 7
+QUALYS_MAX_PAYLOAD_SIZE = 64 * 1024
+
+RUN_ID_ENV_KEY = "run_id"
+REDIS_KEY_PREFIX = "dusty"
+REDIS_CHUNK_SIZE = 1024 * 1024
+REDIS_PIPELINE_CHUNKS = 8
+REDIS_KEY_TTL = 7 * 24 * 3600
+REDIS_FINDINGS_BATCH_SIZE = 500
+INFLUX_BATCH_SIZE = 5000
+INFLUX_RETRIES = 3
+RUN_PROFILE_PATH = '/tmp/reports/run_profile.json'
+PROFILE_HOOKS_PATH = '/tmp/reports/profiles'
+PROFILE_HOOKS_TRACEBACK_DEPTH = 10
+PROFILE_HOOKS_TOP = 30
+JSON_STREAM_CHUNK_SIZE = 1024 * 1024
+ENDPOINT_CACHE_SIZE = 65536
+EXECUTE_LOG_MAX_ARGS = 20
+MAX_ARGUMENTS_LENGTH = 64 * 1024
+BANDIT_REPORT = '/tmp/bandit.json'
+BANDIT_SHARD_REPORT = 'bandit_shard_{}_{}.json'
+# Same as bandit's own default --exclude
+BANDIT_EXCLUDED_DIRS = ['.svn', 'CVS', '.bzr', '.hg', '.git', '__pycache__', '.tox', '.eggs', '*.egg']
+# Polyglot SAST: file extensions of languages with SastyWrapper scanners
+SAST_LANGUAGE_EXTENSIONS = {
+    '.py': 'python',
+    '.java': 'java',
+    '.jsp': 'java',
+    '.js': 'nodejs',
+    '.jsx': 'nodejs',
+    '.mjs': 'nodejs',
+    '.ts': 'nodejs',
+    '.rb': 'ruby',
+    '.erb': 'ruby'
+}
+SAST_LANGUAGES_ORDER = ['python', 'java', 'nodejs', 'ruby']
+SAST_EXCLUDED_DIRS = BANDIT_EXCLUDED_DIRS + ['node_modules', 'bower_components', 'vendor', '.venv', 'venv',
+                                            'site-packages', '.idea', '.vscode']
+# Build output dirs: generated if a build manifest is next to them (src/build of a package is not)
+SAST_GENERATED_DIRS = {
+    'build': ['setup.py', 'pyproject.toml', 'build.gradle', 'build.gradle.kts', 'package.json'],
+    'dist': ['setup.py', 'pyproject.toml', 'package.json'],
+    'target': ['pom.xml', 'build.sbt'],
+    '.next': ['package.json'],
+    'coverage': ['package.json']
+}
+SAST_MANIFESTS = ['package.json', 'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'requirements*.txt',
+                  'Pipfile', 'Pipfile.lock', 'setup.py', 'pom.xml', 'build.gradle', 'Gemfile', 'Gemfile.lock']
+CODE_INDEX_HASH_CHUNK_SIZE = 1024 * 1024
+NPM_AUDIT_REPORT = '/tmp/npm_audit_{}.json'
+SAFETY_REPORT = '/tmp/safety_report_{}.json'
+# OSV database_specific severities (GHSA, PyPA) -> dusty severities
+ADVISORY_SEVERITIES = {
+    'CRITICAL': 'Critical',
+    'HIGH': 'High',
+    'MODERATE': 'Medium',
+    'MEDIUM': 'Medium',
+    'LOW': 'Low'
+}
+ADVISORY_DEFAULT_SEVERITY = 'Medium'
+ZAP_DAEMON_PORT = 8091
+ZAP_DAEMON_HEAP = '499m'
+ZAP_API_KEY = 'dusty'
+ZAP_START_TIMEOUT = 600
+POLL_MIN_INTERVAL = 1
+POLL_MAX_INTERVAL = 10
+POLL_BACKOFF_FACTOR = 1.5
+QUALYS_STATUS_CHECK_MAX_INTERVAL = 300
+ZAP_POLICY_PATH = '/tmp/{}.policy'
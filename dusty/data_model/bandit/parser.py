@@ -7,9 +7,11 @@ from dusty.data_model.canonical_model import DefaultModel as Finding
 
 
 class BanditParser(object):
-    def __init__(self, filename, test):
-        with open(filename, 'rb') as f:
-            data = json.load(f)
+    def __init__(self, filename, test, data=None):
+        """ data: bandit report as dict, when bandit was run in-process (filename is not read then) """
+        if data is None:
+            with open(filename, 'rb') as f:
+                data = json.load(f)
         dupes = dict()
         find_date = None
         if "generated_at" in data:
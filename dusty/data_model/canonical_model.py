@@ -14,8 +14,11 @@
 
 import hashlib
 import re
+import json
+import zlib
 import markdown2
 import logging
+from collections import UserString
 from junit_xml import TestCase
 from dusty import constants as c
 from dusty.utils import define_jira_priority
@@ -50,6 +53,23 @@ class Endpoint(object):
             str_repr += f"?{self.query}"
         return str_repr
 
+    def to_dict(self):
+        return dict(vars(self))
+
+    @staticmethod
+    def dump(endpoint):
+        """ Makes JSON-serializable value from Endpoint instance or raw endpoint string """
+        if isinstance(endpoint, Endpoint):
+            return {"endpoint": endpoint.to_dict()}
+        return endpoint
+
+    @staticmethod
+    def load(value):
+        """ Reverts Endpoint.dump """
+        if isinstance(value, dict) and "endpoint" in value:
+            return Endpoint(**value["endpoint"])
+        return value
+
 
 class DefaultModel(object):
     def __init__(self, title, severity, description, tool, endpoints=None,
@@ -104,6 +124,33 @@ class DefaultModel(object):
         self.endpoints = []
         self.scan_type = ""
 
+    def to_dict(self):
+        """ Returns JSON-serializable representation of the finding (images are not included) """
+        finding = {key: str(value) if isinstance(value, UserString) else value for key, value in self.finding.items()}
+        finding["dynamic_finding_details"] = dict(finding["dynamic_finding_details"])
+        finding["dynamic_finding_details"]["endpoints"] = \
+            [Endpoint.dump(item) for item in finding["dynamic_finding_details"]["endpoints"]]
+        return {
+            "finding": finding,
+            "unsaved_endpoints": [Endpoint.dump(item) for item in self.unsaved_endpoints],
+            "endpoints": [Endpoint.dump(item) for item in self.endpoints],
+            "scan_type": self.scan_type
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Restores finding made by to_dict without re-processing title and description """
+        item = cls.__new__(cls)
+        item.finding = data["finding"]
+        item.finding["dynamic_finding_details"]["endpoints"] = \
+            [Endpoint.load(value) for value in item.finding["dynamic_finding_details"]["endpoints"]]
+        item.severity = c.SEVERITIES.get(item.finding["severity"], 100)
+        item.unsaved_endpoints = [Endpoint.load(value) for value in data.get("unsaved_endpoints", [])]
+        item.images = []
+        item.endpoints = [Endpoint.load(value) for value in data.get("endpoints", [])]
+        item.scan_type = data.get("scan_type", "")
+        return item
+
     def get_numerical_severity(self) -> int:
         return 0
 
@@ -231,3 +278,12 @@ class DefaultModel(object):
 
     def dd_item(self):
         pass
+
+
+def dump_finding(finding):
+    """ Serializes finding into compact (compressed JSON) form to pass it between processes and hosts """
+    return zlib.compress(json.dumps(finding.to_dict(), separators=(',', ':')).encode('utf-8'))
+
+
+def load_finding(data):
+    return DefaultModel.from_dict(json.loads(zlib.decompress(data).decode('utf-8')))
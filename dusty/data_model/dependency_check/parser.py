@@ -13,17 +13,15 @@ __author__ = 'arozumenko'
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from json import load
 from dusty.data_model.canonical_model import DefaultModel as Finding
-from dusty.utils import cwe_to_severity
-from jsonpath_rw import parse
+from dusty.utils import cwe_to_severity, iter_json_array
 
 
 class DependencyCheckParser(object):
     ATTACK_VECTOR_MAPPING = {
         "accessVector": "AV",
         "accessComplexity": "AC",
-        "authenticationr>": "Au",
+        "authentication": "Au",
         "confidentialImpact": "C",
         "integrityImpact": "I",
         "availabilityImpact": "A",
@@ -37,15 +35,14 @@ class DependencyCheckParser(object):
 
     def __init__(self, filename, test):
         self.items = []
-        data = load(open(filename))
-        expr = parse("dependencies[*].vulnerabilities.`parent`")
-
-        for item in expr.find(data):
-            title = f"Vulnerable dependency {item.value['fileName']}"
-            description = f"{item.value.get('description', '')}"
-            _severity, steps_to_reproduce = self.steps_to_reproduce(item)
+        for dependency in iter_json_array(filename, 'dependencies'):
+            if 'vulnerabilities' not in dependency:
+                continue
+            title = f"Vulnerable dependency {dependency['fileName']}"
+            description = f"{dependency.get('description', '')}"
+            _severity, steps_to_reproduce = self.steps_to_reproduce(dependency)
             severity = cwe_to_severity(_severity)
-            file_path = item.value['filePath']
+            file_path = dependency['filePath']
             self.items.append(Finding(title=title, tool='dependency_check',
                                       active=False, verified=False, description=description,
                                       severity=severity, numerical_severity=severity,
@@ -57,7 +54,7 @@ class DependencyCheckParser(object):
         steps = []
         max_priority = 0
 
-        for each in item.value['vulnerabilities']:
+        for each in item['vulnerabilities']:
             _max = max([each.get("cvssv2", {"score": 0})["score"], each.get("cvssv3", {'baseScore': 0})['baseScore']])
             if max_priority < _max:
                 max_priority = _max
@@ -65,13 +62,13 @@ class DependencyCheckParser(object):
             if 'cvssv2' in each:
                 cvss2_vector = self._calculate_vector(each['cvssv2'])
                 step += f"cvssv2: " \
-                    f"{cwe_to_severity(each['cvssv2']['score'])}(f{each['cvssv2']['score']})\n" \
+                    f"{cwe_to_severity(each['cvssv2']['score'])}({each['cvssv2']['score']})\n" \
                     f"Attack Vector: {cvss2_vector}"
 
             if 'cvssv3' in each:
                 cvss3_vector = self._calculate_vector(each['cvssv3'])
                 step += f"\ncvssv3: " \
-                    f"{cwe_to_severity(each['cvssv2']['score'])}(f{each['cvssv2']['score']})\n" \
+                    f"{cwe_to_severity(each['cvssv3']['baseScore'])}({each['cvssv3']['baseScore']})\n" \
                     f"Attack Vector: {cvss3_vector}"
             if 'references' in each:
                 step += '\n\nReferences:\n'
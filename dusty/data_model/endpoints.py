@@ -0,0 +1,106 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    URL parsing and endpoint normalization shared by parsers
+"""
+
+import re
+import functools
+
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from dusty import constants as c
+from dusty.data_model.canonical_model import Endpoint
+
+URL_PATTERN = re.compile("".join([
+    r"^\s*((?P<protocol>.*?)\:\/\/)?",
+    r"((?P<username>.*?)(\:(?P<password>.*))?\@)?",
+    r"((?P<hostname>.*?)(\:((?P<port>[0-9]+)))?)(?P<path>/.*?)?",
+    r"(?P<query>\?.*?)?(?P<fragment>\#.*?)?\s*$"
+]))
+
+# Scheme and host (without credentials and port) of URL, host has to be IP, localhost or domain name
+HOST_URL_PATTERN = re.compile(
+    r"(http|https|ftp)\://([a-zA-Z0-9\.\-]+(\:[a-zA-Z0-9\.&amp;%\$\-]+)*@)*((25[0-5]|2[0-4][0-9]|[0-1]{1}["
+    r"0-9]{2}|[1-9]{1}[0-9]{1}|[1-9])\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9]|0)\.(2"
+    r"5[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9]|0)\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}"
+    r"|[1-9]{1}[0-9]{1}|[0-9])|localhost|([a-zA-Z0-9\-]+\.)*[a-zA-Z0-9\-]+\.(com|edu|gov|int|mil|net|org|b"
+    r"iz|arpa|info|name|pro|aero|coop|museum|[a-zA-Z]{2}))[\:]*([0-9]+)*([/]*($|[a-zA-Z0-9\.\,\?'\\+&amp;%"
+    r"\$#\=~_\-]+)).*?$"
+)
+
+URL = namedtuple("URL", [
+    "protocol", "hostname", "port",
+    "path", "query", "fragment",
+    "username", "password"
+])
+
+
+@functools.lru_cache(maxsize=c.ENDPOINT_CACHE_SIZE)
+def parse_url(url):
+    """ Parses URL into parts """
+    parsed_url = URL_PATTERN.search(url)
+    protocol = parsed_url.group("protocol")
+    hostname = parsed_url.group("hostname")
+    port = parsed_url.group("port")
+    path = parsed_url.group("path")
+    query = parsed_url.group("query")
+    fragment = parsed_url.group("fragment")
+    username = parsed_url.group("username")
+    password = parsed_url.group("password")
+    return URL(
+        protocol=protocol if protocol is not None else "",
+        hostname=hostname if hostname is not None else "",
+        port=port if port is not None else "",
+        path=path if path is not None else "/",
+        query=query[1:] if query is not None else "",
+        fragment=fragment[1:] if fragment is not None else "",
+        username=username if username is not None else "",
+        password=password if password is not None else ""
+    )
+
+
+@functools.lru_cache(maxsize=c.ENDPOINT_CACHE_SIZE)
+def make_endpoint_from_url(url, include_query=True, include_fragment=True):
+    """ Makes Enpoint instance from URL (instances are cached, treat them as read-only) """
+    parsed_url = parse_url(url)
+    host_value = parsed_url.hostname
+    protocol = parsed_url.protocol
+    port = parsed_url.port
+    if (protocol == "http" and port != "80") or (
+            protocol == "https" and port != "443"):
+        host_value = f'{parsed_url.hostname}:{parsed_url.port}'
+    return Endpoint(
+        protocol=parsed_url.protocol,
+        host=host_value,
+        fqdn=parsed_url.hostname,
+        port=parsed_url.port,
+        path=parsed_url.path,
+        query=parsed_url.query if include_query else "",
+        fragment=parsed_url.fragment if include_fragment else ""
+    )
+
+
+@functools.lru_cache(maxsize=c.ENDPOINT_CACHE_SIZE)
+def make_endpoint_from_host_url(url):
+    """ Makes Endpoint instance with scheme, bare host and path of URL (as reported by Nikto) """
+    rhost = HOST_URL_PATTERN.search(url)
+    return Endpoint(protocol=rhost.group(1), host=rhost.group(4), query="", fragment="", path=urlparse(url).path)
+
+
+def make_endpoint_from_address(host, port=None, protocol=None):
+    """ Makes Endpoint instance for network service (host:port, optionally with transport protocol) """
+    return Endpoint(protocol=protocol, host=host, port=str(port) if port is not None else None)
@@ -14,6 +14,7 @@
 
 from json import load
 from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.data_model.endpoints import make_endpoint_from_address
 
 
 class MasscanJSONParser(object):
@@ -27,4 +28,4 @@ class MasscanJSONParser(object):
                                       active=False, verified=False,
                                       description=title,
                                       severity="Info",
-                                      endpoints=[f'{issue["ip"]}:{issue["ports"][0]["port"]}']))
+                                      endpoints=[make_endpoint_from_address(issue["ip"], issue["ports"][0]["port"])]))
@@ -4,9 +4,9 @@ __author__ = 'aaronweaver'
 import re
 from defusedxml import ElementTree as ET
 import hashlib
-from urllib.parse import urlparse
 
-from dusty.data_model.canonical_model import Endpoint, DefaultModel as Finding
+from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.data_model.endpoints import make_endpoint_from_host_url
 
 
 class NiktoXMLParser(object):
@@ -84,29 +84,6 @@ class NiktoXMLParser(object):
         self.items = dupes.values()
 
     def process_endpoints(self, finding, host):
-        protocol = "http"
-        query = ""
-        fragment = ""
-        path = ""
-        url = urlparse(host)
-
-        if url:
-            path = url.path
-
-        rhost = re.search(
-            "(http|https|ftp)\://([a-zA-Z0-9\.\-]+(\:[a-zA-Z0-9\.&amp;%\$\-]+)*@)*((25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]"
-            "{2}|[1-9]{1}[0-9]{1}|[1-9])\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9]|0)\.(25[0-5]|2"
-            "[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}[0-9]{1}|[1-9]|0)\.(25[0-5]|2[0-4][0-9]|[0-1]{1}[0-9]{2}|[1-9]{1}"
-            "[0-9]{1}|[0-9])|localhost|([a-zA-Z0-9\-]+\.)*[a-zA-Z0-9\-]+\.(com|edu|gov|int|mil|net|org|biz|arpa|info"
-            "|name|pro|aero|coop|museum|[a-zA-Z]{2}))[\:]*([0-9]+)*([/]*($|[a-zA-Z0-9\.\,\?\'\\\+&amp;%\$#\=~_\-]"
-            "+)).*?$",
-            host)
-        protocol = rhost.group(1)
-        host = rhost.group(4)
-        endpoint = Endpoint(protocol=protocol,
-                            host=host,
-                            query=query,
-                            fragment=fragment,
-                            path=path)
+        endpoint = make_endpoint_from_host_url(host)
 
         finding.unsaved_endpoints = finding.unsaved_endpoints + [endpoint]
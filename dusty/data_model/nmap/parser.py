@@ -1,6 +1,7 @@
 from xml.dom import NamespaceErr
 import lxml.etree as le
-from dusty.data_model.canonical_model import Endpoint, DefaultModel as Finding
+from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.data_model.endpoints import make_endpoint_from_address
 
 __author__ = 'patriknordlen'
 # Modified for Dusty by arozumenko
@@ -8,72 +9,86 @@ __author__ = 'patriknordlen'
 
 class NmapXMLParser(object):
     def __init__(self, file, test):
-        parser = le.XMLParser(resolve_entities=False, huge_tree=True)
-        nscan = le.parse(file, parser)
-        root = nscan.getroot()
-
-        if 'nmaprun' not in root.tag:
-            raise NamespaceErr("This doesn't seem to be a valid Nmap xml file.")
         dupes = {}
-        hostInfo = ""
+        nmaprun_found = False
+        # Stream hosts one by one and free them once processed to keep memory flat on large scans
+        for event, elem in le.iterparse(file, events=("start", "end"), tag=("nmaprun", "host"),
+                                        resolve_entities=False, huge_tree=True):
+            if elem.tag == "nmaprun":
+                nmaprun_found = True
+                continue
+            if event != "end":
+                continue
+            self.process_host(elem, test, dupes)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        if not nmaprun_found:
+            raise NamespaceErr("This doesn't seem to be a valid Nmap xml file.")
+        self.items = dupes.values()
 
-        for host in root.iter("host"):
-            ip = host.find("address[@addrtype='ipv4']").attrib['addr']
-            fqdn = None
-            if host.find("hostnames/hostname[@type='PTR']") is not None:
-                fqdn = host.find("hostnames/hostname[@type='PTR']").attrib['name']
+    @staticmethod
+    def get_host_info(host, ip, fqdn):
+        host_info = ""
+        for os in host.iter("os"):
+            if ip is not None:
+                host_info += "IP Address: %s\n" % ip
+            if fqdn is not None:
+                host_info += "FQDN: %s\n" % fqdn
+            for osv in os.iter('osmatch'):
+                if 'name' in osv.attrib:
+                    host_info += "Host OS: %s\n" % osv.attrib['name']
+                if 'accuracy' in osv.attrib:
+                    host_info += "Accuracy: {0}%\n".format(osv.attrib['accuracy'])
+            host_info += "\n"
+        return host_info
 
-            for os in root.iter("os"):
-                if ip is not None:
-                    hostInfo += "IP Address: %s\n" % ip
-                if fqdn is not None:
-                    fqdn += "FQDN: %s\n" % ip
-                for osv in os.iter('osmatch'):
-                    if 'name' in osv.attrib:
-                        hostInfo += "Host OS: %s\n" % osv.attrib['name']
-                    if 'accuracy' in osv.attrib:
-                        hostInfo += "Accuracy: {0}%\n".format(osv.attrib['accuracy'])
-                hostInfo += "\n"
-            for portelem in host.xpath("ports/port[state/@state='open']"):
-                port = portelem.attrib['portid']
-                protocol = portelem.attrib['protocol']
+    def process_host(self, host, test, dupes):
+        ip = host.find("address[@addrtype='ipv4']").attrib['addr']
+        fqdn = None
+        hostname = host.find("hostnames/hostname[@type='PTR']")
+        if hostname is not None:
+            fqdn = hostname.attrib['name']
+        host_info = self.get_host_info(host, ip, fqdn)
+        for portelem in host.xpath("ports/port[state/@state='open']"):
+            port = portelem.attrib['portid']
+            protocol = portelem.attrib['protocol']
 
-                title = f"Open port: {ip}:{port}/{protocol}"
-                description = hostInfo
-                description += f"Port: {port}\n"
-                serviceinfo = ""
+            title = f"Open port: {ip}:{port}/{protocol}"
+            description = host_info
+            description += f"Port: {port}\n"
+            serviceinfo = ""
 
-                if portelem.find('service') is not None:
-                    if 'product' in portelem.find('service').attrib:
-                        serviceinfo += "Product: %s\n" % portelem.find('service').attrib['product']
+            service = portelem.find('service')
+            if service is not None:
+                if 'product' in service.attrib:
+                    serviceinfo += "Product: %s\n" % service.attrib['product']
 
-                    if 'version' in portelem.find('service').attrib:
-                        serviceinfo += "Version: %s\n" % portelem.find('service').attrib['version']
+                if 'version' in service.attrib:
+                    serviceinfo += "Version: %s\n" % service.attrib['version']
 
-                    if 'extrainfo' in portelem.find('service').attrib:
-                        serviceinfo += "Extra Info: %s\n" % portelem.find('service').attrib['extrainfo']
+                if 'extrainfo' in service.attrib:
+                    serviceinfo += "Extra Info: %s\n" % service.attrib['extrainfo']
 
-                    description += serviceinfo
+                description += serviceinfo
 
-                description += '\n\n'
+            description += '\n\n'
 
-                severity = "Info"
+            severity = "Info"
 
-                dupe_key = f'{port}_{protocol}_{ip}'
-                print(dupe_key)
-                if dupe_key in dupes:
-                    find = dupes[dupe_key]
-                    if description is not None:
-                        find.description += description
-                else:
-                    find = Finding(title=title,
-                                   tool="NMAP",
-                                   test=test,
-                                   active=False,
-                                   verified=False,
-                                   description=description,
-                                   severity=severity,
-                                   numerical_severity=Finding.get_numerical_severity(severity))
-                    find.unsaved_endpoints.append(f'{ip}:{port}/{protocol}')
-                    dupes[dupe_key] = find
-        self.items = dupes.values()
+            dupe_key = f'{port}_{protocol}_{ip}'
+            if dupe_key in dupes:
+                find = dupes[dupe_key]
+                if description is not None:
+                    find.finding['description'] += description
+            else:
+                find = Finding(title=title,
+                               tool="NMAP",
+                               test=test,
+                               active=False,
+                               verified=False,
+                               description=description,
+                               severity=severity,
+                               numerical_severity=Finding.get_numerical_severity(severity))
+                find.unsaved_endpoints.append(make_endpoint_from_address(ip, port, protocol))
+                dupes[dupe_key] = find
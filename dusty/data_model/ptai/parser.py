@@ -15,7 +15,7 @@
 
 import os
 import re
-from bs4 import BeautifulSoup
+from lxml import etree
 from dusty import constants
 from dusty.data_model.canonical_model import DefaultModel as Finding
 
@@ -23,170 +23,212 @@ from dusty.data_model.canonical_model import DefaultModel as Finding
 __author__ = 'KarynaTaranova'
 
 
+def has_class(name):
+    """ XPath predicate matching class token (as BeautifulSoup does for find_all) """
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+FILE_PATH_DESCRIPTIONS = ['Уязвимый файл', 'Vulnerable File']
+BOLD_CLASSES = ['code-line-part-EntryPoint', 'code-line-part-DataEntryPoint',
+                'code-line-part-DataOperation', 'code-line-part-VulnerableCode']
+BLANK_LINES = re.compile('\n( *\n)')
+NEW_LINES = re.compile('\n+')
+
+ASCII_SPACES = ' \n\t\f\r'
+PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+
+text_nodes = etree.XPath('.//text()')
+glossary_anchor_id = etree.XPath(f'string(.//a[{has_class("glossary-anchor")}]/@id)')
+severity_levels = etree.XPath('.//div[contains(@class, "vulnerability-type-name-level-")]')
+option_descriptions = etree.XPath('.//td[contains(@class, "option-description")]')
+option_values = etree.XPath('.//td[contains(@class, "option-value")]')
+description_links = etree.XPath(f'.//a[{has_class("vulnerability-description-link")}]/@href')
+detail_info_tables = etree.XPath(f'.//table[{has_class("vulnerability-detail-info")}]')
+detail_info_tds = etree.XPath('.//td')
+functions_of = etree.XPath(f'.//div[{has_class("vulnerability-info")}]')
+table_rows = etree.XPath('.//tr')
+links_of = etree.XPath('.//a')
+data_flow_entries = etree.XPath(f'.//div[{has_class("data-flow-entry-root")}]')
+header_file_names = etree.XPath(f'.//span[{has_class("data-flow-entry-header-file-name")}]')
+header_types = etree.XPath(f'.//span[{has_class("data-flow-entry-header-type")}]')
+code_lines_of = etree.XPath(f'.//div[{has_class("data-flow-entry-code-line-root")}]')
+line_numbers = etree.XPath(f'.//span[{has_class("data-flow-entry-code-line-number")}]')
+line_contents = etree.XPath(f'.//pre[{has_class("data-flow-entry-code-line-content")}]')
+bold_parts = etree.XPath('.//span[{}]'.format(' or '.join(has_class(item) for item in BOLD_CLASSES)))
+
+
+def text_of(element):
+    """ Returns element text the way BeautifulSoup html.parser does: whitespace-only strings outside
+        of pre/textarea are collapsed into single newline (or space) """
+    return ''.join(collapse_whitespace(text) for text in text_nodes(element))
+
+
+def collapse_whitespace(text):
+    if text.strip(ASCII_SPACES):
+        return text
+    parent = text.getparent().getparent() if text.is_tail else text.getparent()
+    while parent is not None:
+        if parent.tag in PRESERVE_WHITESPACE_TAGS:
+            return text
+        parent = parent.getparent()
+    return '\n' if '\n' in text else ' '
+
+
+def trim_blank_lines(line):
+    for pattern in [BLANK_LINES, NEW_LINES]:
+        for find in pattern.findall(line):
+            line = line.replace(find, '\n')
+    return line
+
+
+def get_value_by_description(vulnerability, descriptions):
+    descriptions_text = [text_of(item) for item in option_descriptions(vulnerability)]
+    for description in descriptions:
+        if description in descriptions_text:
+            return text_of(option_values(vulnerability)[descriptions_text.index(description)])
+    return ''
+
+
+def is_filtered(vulnerability, filtered_statuses):
+    for filter_status in filtered_statuses:
+        if vulnerability.xpath(f'.//i[{has_class(f"{filter_status}-icon")}]'):
+            return True
+    return False
+
+
+def strip_first_newline(value):
+    return value[1:] if value.startswith('\n') else value
+
+
+def read_function(function):
+    """ Reduces vulnerability-info block to its parameter rows and formatted data flow panel """
+    rows = list()
+    for tr in table_rows(detail_info_tables(function)[0]):
+        tds = detail_info_tds(tr)
+        if not tds:
+            continue
+        param = strip_first_newline(text_of(tds[0]))
+        value, link = ' ', None
+        if len(tds) == 2:
+            value = strip_first_newline(text_of(tds[1]))
+            if 'CWE' in value:
+                # Resolved against vulnerability type description once whole report is read
+                links = links_of(tds[1])
+                link = [links[0].get('href'), text_of(links[0])] if links else [None, None]
+                if link[1] is not None and link[1].startswith('\n'):
+                    link[1] = value[1:]
+        rows.append((param, value, link))
+    code_blocks = list()
+    for entry in data_flow_entries(function):
+        code_lines = list()
+        for code_line in code_lines_of(entry):
+            line_content = line_contents(code_line)[0]
+            line_text = text_of(line_content)
+            if bold_parts(line_content):
+                line_text = line_text + '      <------'
+            code_lines.append((text_of(line_numbers(code_line)[0]), line_text))
+        # Same line number can only be reported once per code block
+        code_lines = dict(code_lines)
+        code_blocks.append('{{code:title={} - {}|borderStyle=solid}}  \n{}  \n{{code}}'.format(
+            text_of(header_file_names(entry)[0]), text_of(header_types(entry)[0]),
+            ''.join('{} {}  \n'.format(key, value) for key, value in code_lines.items())))
+    data_flow_panel_str = '  \n  \n|{}|  \n  \n'.format(chr(129147)).join(code_blocks)
+    return rows, data_flow_panel_str
+
+
+def read_vulnerability(vulnerability):
+    title = ''
+    file_path = ''
+    short_file_path = ''
+    severity = None
+    severity_level = severity_levels(vulnerability)
+    if severity_level:
+        title = text_of(severity_level[0])
+        # Get file path (strip line number if present)
+        file_path = get_value_by_description(vulnerability, FILE_PATH_DESCRIPTIONS).rsplit(' : ', 1)[0]
+        if '\\' in file_path:
+            short_file_path = ' in ...\\' + file_path.split('\\')[-1]
+        for severity_class in severity_level[0].get('class', '').split():
+            if 'vulnerability-type-name-level-' in severity_class:
+                severity = severity_class.split('-')[-1]
+    links = description_links(vulnerability)
+    info_href = links[0].replace('#', '') if links else None
+    detail_info_values = dict()
+    detail_info = detail_info_tables(vulnerability)
+    if detail_info:
+        tds = detail_info_tds(detail_info[0])
+        detail_info_values[text_of(tds[0])] = text_of(tds[1])
+    functions = [read_function(function) for function in functions_of(vulnerability)]
+    return title, file_path, short_file_path, severity, info_href, detail_info_values, functions
+
+
+def format_function(rows, data_flow_panel_str, detail_info_values, vulnerability_info):
+    function_info_values = dict()
+    for param, value, link in rows:
+        if link is not None:
+            link_str_list = vulnerability_info[vulnerability_info.find(value.strip()):].split('\n')
+            link_info = [x.strip() for x in link_str_list if x.strip()]
+            if not link_info or link_info == ['.']:
+                link_info = [link[1].strip(), link[0]] if link[1] is not None else [' ']
+            value = ': '.join(link_info)
+        function_info_values[param] = trim_blank_lines(value)
+    function_info_values_str = ''
+    for param, value in detail_info_values.items():
+        if param not in function_info_values:
+            value = value.replace('\n                      \xa0', ': ') \
+                .replace('|', '&#124; ').replace('{', '\{').replace('}', '\}')
+            function_info_values_str = '  \n  \n|| *{}* | *{}* |'.format(param, value)
+    for param, value in function_info_values.items():
+        value = value.replace('*', '\*').replace('|', '&#124; ').replace('{', '\{') \
+            .replace('}', '\}')
+        str_line = '|| *{}* | {} |'.format(param, value)
+        str_line = str_line.replace('  ', '')
+        function_info_values_str += '  \n' + str_line
+    function_full_info_str = function_info_values_str + '\n  \n '
+    if data_flow_panel_str:
+        function_full_info_str += '  \n {panel:title=Data Flow:|borderStyle=dashed|borderColor' \
+                                  '=#ccc|titleBGColor=#F7D6C1|bgColor=#FFFFCE}  \n  \n' + data_flow_panel_str \
+                                  + '  \n  \n {panel}  \n  \n'
+    return function_full_info_str
+
+
 class PTAIScanParser(object):
     def __init__(self, filename, filtered_statuses=constants.PTAI_DEFAULT_FILTERED_STATUSES):
         """
         :param filename:
         :param filtered_statuses: str with statuses, separated ', '
         """
-        file_path_descriptions_list = ['Уязвимый файл', 'Vulnerable File']
-
-        def trim_blank_lines(line):
-            blank_lines_patterns = ['\n( *\n)', '\n+']
-            for pattern in blank_lines_patterns:
-                finds = re.findall(pattern, line)
-                for find in finds:
-                    line = line.replace(find, '\n')
-            return line
-
-        def get_value_by_description(table_soap, descriptions):
-            option_descriptions_soup = table_soap.select('td[class*="option-description"]')
-            option_descriptions = [item.text for item in option_descriptions_soup]
-            value_index = -1
-            value = ''
-            for description in descriptions:
-                if description in option_descriptions:
-                    value_index = option_descriptions.index(description)
-                    break
-            if value_index >= 0:
-                option_values_soup = table_soap.select('td[class*="option-value"]')
-                value = option_values_soup[value_index].text
-            return value
-
         dupes = dict()
         self.items = []
         if not os.path.exists(filename):
             return
-        soup = BeautifulSoup(open(filename, encoding="utf8"), 'html.parser')
         vulnerabilities_info = {}
-        vulnerabilities_info_soup = soup.find_all('div', {'class': 'type-description'})
-        for vulnerability_info_soup in vulnerabilities_info_soup:
-            id = vulnerability_info_soup.find('a', {'class': 'glossary-anchor'}).attrs.get('id')
-            vulnerabilities_info[id] = vulnerability_info_soup.text.replace(id, '')
-        vulnerabilities_soup = soup.find_all('div', {'class': 'vulnerability'})
-        for vulnerability_soup in vulnerabilities_soup:
-            if filtered_statuses:
-                skip_flag = False
-                for filter_status in filtered_statuses:
-                    status = vulnerability_soup.find_all('i', {'class': '{}-icon'.format(filter_status)})
-                    if status:
-                        skip_flag = True
-                        break
-                if skip_flag:
-                    continue
-            severity_level_soup = vulnerability_soup.select('div[class*="vulnerability-type-name-level-"]')
-            title = ''
-            file_path = ''
-            short_file_path = ''
-            if severity_level_soup:
-                title = severity_level_soup[0].text
-                # Get file path (strip line number if present)
-                file_path = get_value_by_description(vulnerability_soup, file_path_descriptions_list).rsplit(' : ', 1)[0]
-                if '\\' in file_path:
-                    short_file_path = ' in ...\\' + file_path.split('\\')[-1]
-                severity_classes_soup = severity_level_soup[0].attrs.get('class')
-                for severity_class_soup in severity_classes_soup:
-                    if 'vulnerability-type-name-level-' in severity_class_soup:
-                        severity = severity_class_soup.split('-')[-1]
-            vulnerability_link_info_soup = vulnerability_soup.find_all('a', {'class': 'vulnerability-description-link'})
-            if vulnerability_link_info_soup:
-                vulnerability_info_href = vulnerability_link_info_soup[0].attrs.get('href').replace('#', '')
-                vulnerability_info = ''
-                if vulnerability_info_href in vulnerabilities_info:
-                    vulnerability_info = vulnerabilities_info[
-                                             vulnerability_info_href][
-                                         vulnerabilities_info[vulnerability_info_href].find(title) + len(title):]
-            detail_info_soup = vulnerability_soup.find_all('table', {'class': 'vulnerability-detail-info'})
-            detail_info_values = {}
-            if detail_info_soup:
-                detail_info_soup_tds = detail_info_soup[0].find_all('td')
-                detail_info_values[detail_info_soup_tds[0].text] = detail_info_soup_tds[1].text
-            functions = vulnerability_soup.find_all('div', {'class': 'vulnerability-info'})
-            function_blocks_strs = []
-            for function in functions:
-                function_info_values = {}
-                for tr in function.find_all('table', {'class': 'vulnerability-detail-info'})[0].find_all('tr'):
-                    tds = tr.find_all('td')
-                    if tds:
-                        param = tds[0].text
-                        if param.startswith('\n'):
-                            param = param[1:]
-                        value = ' '
-                        if len(tds) == 2:
-                            value = tds[1].text
-                            if value.startswith('\n'):
-                                value = value[1:]
-                            if 'CWE' in value:
-                                link_str_list = vulnerability_info[vulnerability_info.find(value.strip()):].split('\n')
-                                link_info = [x.strip() for x in link_str_list if x.strip()]
-                                if not link_info or link_info == ['.']:
-                                    a_soup = tds[1].find_all('a')
-                                    if a_soup:
-                                        a_href = a_soup[0].attrs.get('href')
-                                        a_text = a_soup[0].text
-                                        if a_text.startswith('\n'):
-                                            a_text = value[1:]
-                                        link_info = [a_text.strip(), a_href]
-                                    else:
-                                        link_info = [' ']
-                                value = ': '.join(link_info)
-                        function_info_values[param] = trim_blank_lines(value)
-                tables_lines = []
-                tables_soup = function.find_all('div', {'class': 'data-flow-entry-root'})
-                for table_soup in tables_soup:
-                    lines = {}
-                    header_file_name = table_soup.find_all('span', {'class': 'data-flow-entry-header-file-name'})[0].text
-                    header_type = table_soup.find_all('span', {'class': 'data-flow-entry-header-type'})[0].text
-                    code_lines_soup = table_soup.find_all('div', {'class': 'data-flow-entry-code-line-root'})
-                    for code_line_soup in code_lines_soup:
-                        line_number = code_line_soup.find_all('span', {'class': 'data-flow-entry-code-line-number'})[0].text
-                        line_content = code_line_soup.find_all('pre', {'class': 'data-flow-entry-code-line-content'})[0]
-                        line_text = line_content.text
-                        bold_text = line_content.find('span', {'class': ['code-line-part-EntryPoint',
-                                                                         'code-line-part-DataEntryPoint',
-                                                                         'code-line-part-DataOperation',
-                                                                         'code-line-part-VulnerableCode']})
-                        if bold_text:
-                            line_text = line_text + '      <------'
-                        lines[line_number] = line_text
-                    tables_lines.append({'lines': lines,
-                                        'header_file_name': header_file_name,
-                                        'header_type': header_type})
-                #  format strings
-                srt_code_blocks = []
-                for table_lines in tables_lines:
-                    table_markdown_str = '{{code:title={} - {}|borderStyle=solid}}  \n{}  \n{{code}}'
-                    code_lines = ''
-                    for key, value in table_lines['lines'].items():
-                        code_lines += '{} {}  \n'.format(key, value)
-                    srt_code_blocks.append(table_markdown_str.format(table_lines['header_file_name'],
-                                                                table_lines['header_type'],
-                                                                code_lines))
-                data_flow_panel_str = ''
-                for str_code_block in srt_code_blocks:
-                    if data_flow_panel_str:
-                        # add arrow
-                        data_flow_panel_str += '  \n  \n|{}|  \n  \n'.format(chr(129147))
-                    data_flow_panel_str += str_code_block
-                function_info_values_str = ''
-                for param, value in detail_info_values.items():
-                    if param not in function_info_values:
-                        value = value.replace('\n                       ', ': ')\
-                                .replace('|', '&#124; ').replace('{', '\{').replace('}', '\}')
-                        str_line = '  \n  \n|| *{}* | *{}* |'.format(param, value)
-                        function_info_values_str = str_line
-                for param, value in function_info_values.items():
-                    value = value.replace('*', '\*').replace('|', '&#124; ').replace('{', '\{')\
-                        .replace('}', '\}')
-                    str_line = '|| *{}* | {} |'.format(param, value)
-                    str_line = str_line.replace('  ', '')
-                    function_info_values_str += '  \n' + str_line
-                function_full_info_str = function_info_values_str + '\n  \n '
-                if data_flow_panel_str:
-                    function_full_info_str += '  \n {panel:title=Data Flow:|borderStyle=dashed|borderColor' \
-                                             '=#ccc|titleBGColor=#F7D6C1|bgColor=#FFFFCE}  \n  \n' + data_flow_panel_str \
-                                             + '  \n  \n {panel}  \n  \n'
-                function_blocks_strs.append(function_full_info_str)
+        vulnerabilities = list()
+        # Report is processed one vulnerability at a time; type descriptions (glossary) may come after
+        # vulnerabilities, so texts depending on them are formatted once whole report is read
+        for _, element in etree.iterparse(filename, events=("end",), tag="div", html=True,
+                                          encoding="utf8", huge_tree=True):
+            classes = element.get('class', '').split()
+            if 'type-description' in classes:
+                id = glossary_anchor_id(element)
+                vulnerabilities_info[id] = text_of(element).replace(id, '')
+            elif 'vulnerability' in classes:
+                if not (filtered_statuses and is_filtered(element, filtered_statuses)):
+                    vulnerabilities.append(read_vulnerability(element))
+            else:
+                continue
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        for title, file_path, short_file_path, severity, info_href, detail_info_values, functions \
+                in vulnerabilities:
+            vulnerability_info = ''
+            if info_href in vulnerabilities_info:
+                vulnerability_info = vulnerabilities_info[info_href][
+                    vulnerabilities_info[info_href].find(title) + len(title):]
+            function_blocks_strs = [format_function(rows, data_flow_panel_str, detail_info_values,
+                                                    vulnerability_info)
+                                    for rows, data_flow_panel_str in functions]
             description = ' \n \n{}:  \n  \n{}  \n  \n'.format(title, vulnerability_info.strip())
             dup_key = title + ' in file: ' + file_path
             # Add finding data to de-duplication store
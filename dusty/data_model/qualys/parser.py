@@ -12,20 +12,68 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import math
 import base64
 import html
+from collections import UserString
 from lxml import etree
 from dusty import constants as c
 from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.data_model.endpoints import make_endpoint_from_url
 
 __author__ = "arozumenko"
 
 
+def decode_payload(payload, max_size=c.QUALYS_MAX_PAYLOAD_SIZE):
+    """ Decodes and escapes base64 payload, decoding no more than max_size bytes """
+    if not payload:
+        return ""
+    payload = "".join(payload.split())
+    truncated = max_size and len(payload) > 4 * math.ceil(max_size / 3)
+    if truncated:
+        payload = payload[:4 * math.ceil(max_size / 3)]
+    data = base64.b64decode(payload)
+    if truncated:
+        data = data[:max_size]
+    data = html.escape(data.decode("utf-8", errors="ignore"))
+    if truncated:
+        data += f"\n\n... (truncated to {max_size} bytes)"
+    return data
+
+
+class PayloadReference(UserString):
+    """ References text with base64 payload, decoded on first use (raw payload is capped to max_size) """
+
+    def __init__(self, payload, max_size=c.QUALYS_MAX_PAYLOAD_SIZE, prefix="", suffix=""):
+        payload = "".join(payload.split()) if payload else ""
+        if max_size:
+            # One base64 quantum more than decoded: decode_payload still sees payload was truncated
+            payload = payload[:4 * math.ceil(max_size / 3) + 4]
+        self.payload = payload
+        self.max_size = max_size
+        self.prefix = prefix
+        self.suffix = suffix
+        self.text = None
+
+    @property
+    def data(self):
+        if self.text is None:
+            self.text = f"{self.prefix}{decode_payload(self.payload, self.max_size)}{self.suffix}"
+        return self.text
+
+
 class QualysWebAppParser(object):
-    def __init__(self, file, test):
+    def __init__(self, file, test, max_payload_size=c.QUALYS_MAX_PAYLOAD_SIZE):
         self.items = []
         parser = etree.XMLParser(remove_blank_text=True, no_network=True, recover=True)
         d = etree.parse(file, parser)
+        # Group all records by QID in one pass instead of an xpath lookup over the whole report per QID
+        records_by_qid = {'VULNERABILITY_LIST': dict(), 'INFORMATION_GATHERED_LIST': dict()}
+        for record in d.iter('VULNERABILITY', 'INFORMATION_GATHERED'):
+            parent = record.getparent()
+            if parent is None or parent.tag not in records_by_qid:
+                continue
+            records_by_qid[parent.tag].setdefault(record.findtext('QID'), list()).append(record)
         qids = d.xpath('/WAS_WEBAPP_REPORT/GLOSSARY/QID_LIST/QID')
         disabled_titles = ['Scan Diagnostics']
         for qid in qids:
@@ -41,36 +89,34 @@ class QualysWebAppParser(object):
                 wasc = qid.findtext('WASC') if qid.findtext('WASC') else ''
                 cwe = qid.findtext('CWE') if qid.findtext('CWE') else ''
                 cvss_base = qid.findtext('CVSS_BASE') if qid.findtext('CVSS_BASE') else ''
-                if qid.xpath('SEVERITY'):
+                if qid.find('SEVERITY') is not None:
                     qid_severity = c.QUALYS_SEVERITIES[int(qid.findtext('SEVERITY'))]
                 description = f'{qid_description}\n\n**OWASP**:{owasp}\n\n**WASC**:{wasc}\n\n**CVSS_BASE**:{cvss_base}\n\n'
                 references = []
                 entrypoints = []
                 if 'Information Gathered' in qid_category:
                     qid_severity = 'Info'
-                    records = d.xpath(f'//INFORMATION_GATHERED_LIST/INFORMATION_GATHERED/QID[text()="{_qid}"]/..')
+                    records = records_by_qid['INFORMATION_GATHERED_LIST'].get(_qid, [])
                     for record in records:
-                        references.append(html.escape(base64.b64decode(record.findtext('DATA')).decode("utf-8", errors="ignore")))
+                        references.append(PayloadReference(record.findtext('DATA'), max_payload_size))
                 else:
-                    records = d.xpath(f'//VULNERABILITY_LIST/VULNERABILITY/QID[text()="{_qid}"]/..')
+                    records = records_by_qid['VULNERABILITY_LIST'].get(_qid, [])
                     for record in records:
                         url = record.findtext('URL')
-                        access_pass = [a.text for a in records[0].xpath('ACCESS_PATH/URL')]
+                        access_pass = [a.text for a in record.iterfind('ACCESS_PATH/URL')]
                         method = record.findtext('PAYLOADS/PAYLOAD/REQUEST/METHOD')
                         request = record.findtext('PAYLOADS/PAYLOAD/REQUEST/URL')
-                        response = record.findtext('PAYLOADS/PAYLOAD/RESPONSE/CONTENTS')
-                        response = html.escape(base64.b64decode(response).decode("utf-8", errors="ignore"))
                         entrypoints.append(url)
                         entrypoints.extend(access_pass)
-                        references.append(f"{method.upper()}: {request}\n\nResponse: {response}\n\n")
+                        references.append(PayloadReference(record.findtext('PAYLOADS/PAYLOAD/RESPONSE/CONTENTS'),
+                                                           max_payload_size,
+                                                           prefix=f"{method.upper()}: {request}\n\nResponse: ",
+                                                           suffix="\n\n"))
                 for reference in references:
                     finding = Finding(title=f'{qid_title} - {qid_category}', tool="QualysWAS", cwe=cwe,
                                       description=description, test=test, severity=qid_severity,
                                       mitigation=qid_solution, references=reference,
                                       active=False, verified=False, false_p=False, duplicate=False,
                                       out_of_scope=False, mitigated=None, impact=qid_impact)
-                    finding.unsaved_endpoints.extend(entrypoints)
+                    finding.unsaved_endpoints.extend(make_endpoint_from_url(url) for url in entrypoints if url)
                     self.items.append(finding)
-
-
-
@@ -0,0 +1,151 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Parser registry: tool name -> parser class, imported on first use
+
+    Third-party parsers are registered with setuptools entry points in 'dusty.parsers' group:
+        entry_points={'dusty.parsers': ['mytool = mypackage.parser:MyToolParser']}
+    Parser class may list artifact file names it understands in ARTIFACTS attribute.
+"""
+
+import os
+import fnmatch
+import logging
+import importlib
+import threading
+
+import pkg_resources
+
+ENTRY_POINT_GROUP = "dusty.parsers"
+
+PARSERS = {
+    "aemhacker": "dusty.data_model.aemhacker.parser:AemOutputParser",
+    "bandit": "dusty.data_model.bandit.parser:BanditParser",
+    "bandit_inprocess": "dusty.inprocess:BanditInProcess",
+    "brakeman": "dusty.data_model.brakeman.parser:BrakemanParser",
+    "dependency_check": "dusty.data_model.dependency_check.parser:DependencyCheckParser",
+    "masscan": "dusty.data_model.masscan.parser:MasscanJSONParser",
+    "nikto": "dusty.data_model.nikto.parser:NiktoXMLParser",
+    "nmap": "dusty.data_model.nmap.parser:NmapXMLParser",
+    "nodejsscan": "dusty.data_model.nodejsscan.parser:NodeJsScanParser",
+    "npm": "dusty.data_model.npm.parser:NpmScanParser",
+    "ptai": "dusty.data_model.ptai.parser:PTAIScanParser",
+    "qualys": "dusty.data_model.qualys.parser:QualysWebAppParser",
+    "retirejs": "dusty.data_model.retire.parser:RetireScanParser",
+    "safety": "dusty.data_model.safety.parser:SafetyScanParser",
+    "safety_inprocess": "dusty.inprocess:SafetyInProcess",
+    "safety_advisories": "dusty.drivers.advisories:AdvisoryAudit",
+    "spotbugs": "dusty.data_model.spotbugs.parser:SpotbugsParser",
+    "sslyze": "dusty.data_model.sslyze.parser:SslyzeJSONParser",
+    "w3af": "dusty.data_model.w3af.parser:W3AFXMLParser",
+    "zap": "dusty.data_model.zap.parser:ZapAlertsParser",
+    "zap_report": "dusty.data_model.zap.parser:ZapJsonParser",
+}
+
+# Artifact file name (pattern) -> parser name, as the tools are run by wrappers
+ARTIFACTS = {
+    "bandit*.json": "bandit",
+    "brakeman.json": "brakeman",
+    "dependency-check-report.json": "dependency_check",
+    "masscan.json": "masscan",
+    "nikto.xml": "nikto",
+    "nmap.xml": "nmap",
+    "nodejsscan.json": "nodejsscan",
+    "npm_audit*.json": "npm",
+    "qualys.xml": "qualys",
+    "retirejs.json": "retirejs",
+    "safety_report*.json": "safety",
+    "spotbugs.xml": "spotbugs",
+    "sslyze.json": "sslyze",
+    "w3af.xml": "w3af",
+    "zap.json": "zap_report",
+}
+
+
+class ParserRegistry(object):
+    def __init__(self, parsers=None, artifacts=None):
+        self.parsers = dict(parsers if parsers is not None else PARSERS)
+        self.artifacts = dict(artifacts if artifacts is not None else ARTIFACTS)
+        self.classes = dict()
+        self.entry_points = None
+        self.lock = threading.Lock()
+
+    def register(self, name, parser, artifacts=None):
+        """ Registers parser: class or 'module:Class' string (imported on first use) """
+        with self.lock:
+            self.parsers[name] = parser
+            self.classes.pop(name, None)
+            for artifact in artifacts if artifacts else []:
+                self.artifacts[artifact] = name
+
+    def load_entry_points(self):
+        with self.lock:
+            if self.entry_points is not None:
+                return self.entry_points
+            self.entry_points = dict()
+            for entry_point in pkg_resources.iter_entry_points(ENTRY_POINT_GROUP):
+                self.entry_points[entry_point.name] = entry_point
+                # Plugins can override built-in parsers
+                self.parsers[entry_point.name] = entry_point
+                self.classes.pop(entry_point.name, None)
+            return self.entry_points
+
+    def names(self):
+        self.load_entry_points()
+        return sorted(self.parsers)
+
+    def get(self, name):
+        """ Returns parser class by tool name, importing its module on first use """
+        # Entry points go first: plugins override built-in parsers whatever the call order
+        self.load_entry_points()
+        with self.lock:
+            if name in self.classes:
+                return self.classes[name]
+            if name not in self.parsers:
+                raise KeyError(f"No parser registered for {name}")
+            parser = self.parsers[name]
+            if isinstance(parser, pkg_resources.EntryPoint):
+                parser = parser.resolve()
+            elif isinstance(parser, str):
+                module_name, class_name = parser.split(":", 1)
+                parser = getattr(importlib.import_module(module_name), class_name)
+            self.classes[name] = parser
+            logging.debug("Loaded parser %s for %s", parser.__name__, name)
+            return parser
+
+    def resolve_artifact(self, path):
+        """ Returns parser name for saved artifact by its file name """
+        file_name = os.path.basename(path)
+        for pattern, name in self.artifacts.items():
+            if fnmatch.fnmatch(file_name, pattern):
+                return name
+        for name in self.load_entry_points():
+            for pattern in getattr(self.get(name), "ARTIFACTS", []):
+                if fnmatch.fnmatch(file_name, pattern):
+                    return name
+        raise KeyError(f"No parser registered for artifact {file_name}")
+
+
+registry = ParserRegistry()
+
+
+def get_parser(name):
+    return registry.get(name)
+
+
+def parse_artifact(path, *args, tool=None, **kwargs):
+    """ Parses saved artifact with parser of the tool (resolved by file name if not set) """
+    from dusty.instrumentation import parse
+    return parse(tool if tool else registry.resolve_artifact(path), path, *args, **kwargs)
@@ -15,9 +15,6 @@
 
 import json
 import os
-import re
-import requests
-from bs4 import BeautifulSoup
 from distutils.version import LooseVersion
 from dusty import constants
 from dusty.data_model.canonical_model import DefaultModel as Finding
@@ -27,7 +24,12 @@ __author__ = 'KarynaTaranova'
 
 
 class RetireScanParser(object):
-    def __init__(self, filename, test, deps):
+    def __init__(self, filename, test, deps, enrichment=None):
+        """
+        :param enrichment: dict with NVD data by reference URL (see NvdEnricher.enrich), parser does not
+                           go to network itself
+        """
+        enrichment = enrichment if enrichment else dict()
         dupes = dict()
         find_date = None
         self.items = []
@@ -54,21 +56,15 @@ class RetireScanParser(object):
                         for reference in vulnerability.get('info'):
                             if reference not in components_data[component]['references']:
                                 components_data[component]['references'][summary].add(reference)
-                                if constants.NVD_URL in reference:
-                                    url_text = requests.get(reference).text
-                                    soup = BeautifulSoup(url_text, 'html.parser')
-                                    recomendation = soup.find_all('a', {'id': 'showCPERanges'})
-                                    if recomendation:
-                                        ver_res = re.findall('versions up to \(excluding\)(.*)',
-                                                             recomendation[0].attrs['data-range-description'])
-                                        if ver_res:
-                                            ver = ver_res[0].strip()
-                                            if (LooseVersion(components_data[component]['version_to_update'])
-                                                    < LooseVersion(ver)):
-                                                components_data[component]['version_to_update'] = ver
-                                    description = soup.find_all('p', {'data-testid': 'vuln-description'})
-                                    if description:
-                                        components_data[component]['descriptions'][summary] = description[0].text
+                                nvd_info = enrichment.get(reference) if constants.NVD_URL in reference else None
+                                if nvd_info:
+                                    ver = nvd_info.get('fixed_version')
+                                    if ver and (LooseVersion(components_data[component]['version_to_update'])
+                                                < LooseVersion(ver)):
+                                        components_data[component]['version_to_update'] = ver
+                                    if nvd_info.get('description'):
+                                        components_data[component]['descriptions'][summary] = \
+                                            nvd_info.get('description')
                         cur_severity = vulnerability.get('severity').title()
                         if constants.SEVERITIES.get(components_data[component]['severity']) \
                                 > constants.SEVERITIES.get(cur_severity):
@@ -100,3 +96,19 @@ class RetireScanParser(object):
                                       references=references,
                                       static_finding=True)
         self.items = dupes.values()
+
+    @staticmethod
+    def get_nvd_references(filename, deps):
+        """ Returns NVD references of vulnerable components, to be resolved before parsing """
+        references = list()
+        if not os.path.exists(filename):
+            return references
+        for file_results in json.load(open(filename))['data']:
+            for version_results in file_results.get('results'):
+                if version_results.get('component') not in deps:
+                    continue
+                for vulnerability in version_results.get('vulnerabilities', []):
+                    for reference in vulnerability.get('info'):
+                        if constants.NVD_URL in reference and reference not in references:
+                            references.append(reference)
+        return references
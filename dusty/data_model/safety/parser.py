@@ -17,6 +17,7 @@ import json
 import os
 import re
 from packaging import version
+from dusty import constants
 from dusty.data_model.canonical_model import DefaultModel as Finding
 
 
@@ -24,18 +25,32 @@ __author__ = 'KarynaTaranova'
 
 
 class SafetyScanParser(object):
-    def __init__(self, filename, test):
+    def __init__(self, filename, test, data=None, advisories=None):
+        """
+        :param data: list of safety vulnerabilities (as in json report), when safety was run in-process;
+                     optional sixth item of vulnerability is its severity
+        :param advisories: path to advisory store (see dusty.drivers.advisories) used to set severities
+        """
         dupes = dict()
         find_date = None
         self.items = []
-        if not os.path.exists(filename):
-            return
-        data = json.load(open(filename))
+        if data is None:
+            if not os.path.exists(filename):
+                return
+            data = json.load(open(filename))
+        store = None
+        if advisories:
+            from dusty.drivers.advisories import AdvisoryStore
+            store = AdvisoryStore(advisories)
         for vulnerability in data:
             package = vulnerability[0]
             affected = vulnerability[1]
             installed = vulnerability[2]
             description = vulnerability[3]
+            severity = vulnerability[5] if len(vulnerability) > 5 else None
+            if not severity and store:
+                severity = store.severity("PyPI", package, installed)
+            severity = severity if severity else 'Medium'
             title = 'Update {} {}'.format(package, installed)
             version_to_update = affected.split(',')[-1].replace('<', '')
             fixed_version = 'latest' if '=' in version_to_update else version_to_update
@@ -46,13 +61,18 @@ class SafetyScanParser(object):
                                           active=False,
                                           verified=False,
                                           description=description,
-                                          severity='Medium',
+                                          severity=severity,
                                           date=find_date,
                                           static_finding=True)
             else:
+                if constants.SEVERITIES.get(severity, 100) < dupes[package].severity:
+                    dupes[package].finding['severity'] = severity
+                    dupes[package].severity = constants.SEVERITIES.get(severity, 100)
                 prev_version = re.findall('to (.+) version', dupes[package].finding['title'])[0]
                 if fixed_version != prev_version:
                     if version.parse(fixed_version) > version.parse(prev_version):
                         dupes[package].finding['title'] = title.replace(prev_version, fixed_version)
                         dupes[package].finding['description'] += '  \n  \n' + description
+        if store:
+            store.close()
         self.items = dupes.values()
\ No newline at end of file
@@ -29,30 +29,31 @@ class SpotbugsParser(object):
         dupes = dict()
         find_date = None
 
-        data = xml.etree.ElementTree.parse(filename).getroot()
-        for item in data.findall('BugInstance'):
-            title = item.find('ShortMessage').text
-            description = item.find('LongMessage').text
-            category = item.get('category')
-            issue_type = item.get('type')
-            severity = item.get('priority')
-            classname = item.find('Class').get('classname')
-            filename = item.find('Class').find('SourceLine').get('sourcefile')
-            file_path = item.find('Class').find('SourceLine').get('sourcepath')
-            line = item.find('Class').find('SourceLine').find('Message').text
-            steps_to_reproduce = '\n\n'
-            details = data.find(f'.//BugPattern[@type="{issue_type}"]')
-            for i, element in enumerate(item.findall('Method')):
-                steps_to_reproduce += f"Classname: {classname}\t" \
-                                      f"{element.find('Message').text}\t"
-                try:
-                    steps_to_reproduce += \
-                                      f"{sanitize(item.findall('SourceLine')[i].find('Message').text)}"
-                except:
-                    pass
+        bug_patterns = dict()
+        bug_instances = list()
+        depth = 0
+        root = None
+        # BugPatterns follow BugInstances in the report, so instances are reduced to plain tuples while
+        # streaming and turned into findings once the pattern index is complete
+        for event, element in xml.etree.ElementTree.iterparse(filename, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if element.tag == 'BugInstance':
+                bug_instances.append(self.read_bug_instance(element))
+            elif element.tag == 'BugPattern' and element.find('Details') is not None:
+                bug_patterns[element.get('type')] = element.find('Details').text
+            root.clear()
 
-            if details:
-                description += f'\n\n Details: {details.find("Details").text}'
+        for title, description, category, issue_type, severity, filename, file_path, line, \
+                steps_to_reproduce in bug_instances:
+            if issue_type in bug_patterns:
+                description += f'\n\n Details: {bug_patterns[issue_type]}'
             severity_level = SEVERITY_TYPE.get(int(severity), "")
             dupe_key = hashlib.md5(f'{title} {issue_type} {category}'.encode('utf-8')).hexdigest()
             if file_path:
@@ -72,3 +73,27 @@ class SpotbugsParser(object):
                 dupes[dupe_key].finding['steps_to_reproduce'].append(steps_to_reproduce)
 
         self.items = dupes.values()
+
+    @staticmethod
+    def read_bug_instance(item):
+        title = item.find('ShortMessage').text
+        description = item.find('LongMessage').text
+        category = item.get('category')
+        issue_type = item.get('type')
+        severity = item.get('priority')
+        class_element = item.find('Class')
+        classname = class_element.get('classname')
+        class_source_line = class_element.find('SourceLine')
+        filename = class_source_line.get('sourcefile')
+        file_path = class_source_line.get('sourcepath')
+        line = class_source_line.find('Message').text
+        source_lines = item.findall('SourceLine')
+        steps_to_reproduce = '\n\n'
+        for i, element in enumerate(item.findall('Method')):
+            steps_to_reproduce += f"Classname: {classname}\t" \
+                                  f"{element.find('Message').text}\t"
+            try:
+                steps_to_reproduce += f"{sanitize(source_lines[i].find('Message').text)}"
+            except:
+                pass
+        return title, description, category, issue_type, severity, filename, file_path, line, steps_to_reproduce
@@ -12,51 +12,106 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import math
 import base64
 import hashlib
 
 import lxml.etree as le
+from collections import UserString
 from urllib.parse import urlparse
+from dusty import constants as c
 from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.data_model.endpoints import make_endpoint_from_url
+
+
+class HttpTransaction(object):
+    """ Request/response pair with bodies kept encoded (and bounded) until rendered """
+    __slots__ = ("request_url", "http_method", "response_code", "parts", "max_body_size")
+
+    def __init__(self, request_url, http_method, response_code, parts, max_body_size):
+        self.request_url = request_url
+        self.http_method = http_method
+        self.response_code = response_code
+        self.parts = parts  # [(headers, content_encoding, body_text, truncated), ...]
+        self.max_body_size = max_body_size
+
+    @classmethod
+    def from_element(cls, transaction, max_body_size=c.W3AF_MAX_BODY_SIZE):
+        request = transaction.find("http-request")
+        response = transaction.find("http-response")
+        status = request.find("status").text.split(" ")
+        response_code = response.find("status").text.split(" ")[1]
+        parts = list()
+        for part in [request, response]:
+            headers = [f"{h.attrib['field']} -> {h.attrib['content']}" for h in part.find("headers").findall("header")]
+            body = part.find("body")
+            encoding = body.attrib.get('content-encoding')
+            text = body.text if body.text else ""
+            limit = max_body_size
+            if max_body_size and encoding == "base64":
+                limit = 4 * math.ceil(max_body_size / 3)
+                if len(text) > limit:
+                    text = "".join(text.split())
+            truncated = bool(max_body_size) and len(text) > limit
+            parts.append(("\n".join(headers), encoding, text[:limit] if truncated else text, truncated))
+        return cls(status[1], status[0], response_code, parts, max_body_size)
+
+    def get_hash_code(self):
+        digest = hashlib.md5(f"{self.request_url} {self.http_method} {self.response_code}".encode("utf-8"))
+        for headers, encoding, text, truncated in self.parts:
+            digest.update(f"\0{headers}\0{encoding}\0{truncated}\0".encode("utf-8"))
+            digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def decode_body(self, encoding, text, truncated):
+        if encoding == "base64":
+            body = base64.b64decode(text).decode("utf-8", errors="ignore") if text else ""
+        else:
+            body = text
+        if truncated:
+            body = f"{body[:self.max_body_size]}\n\n... (truncated to {self.max_body_size} bytes)"
+        return body
+
+    def __str__(self):
+        data = f"Request: {self.request_url} {self.http_method} {self.response_code} \n\n"
+        for index, (headers, encoding, text, truncated) in enumerate(self.parts):
+            if index:
+                data += "Response: \n"
+            data += f"Headers: {headers}\n\nBody:{self.decode_body(encoding, text, truncated)}\n\n"
+        return data
+
+
+class HttpReferences(UserString):
+    """ References text of finding, rendered from transactions on first use """
+
+    def __init__(self, transactions):
+        self.transactions = transactions
+        self.text = None
+
+    @property
+    def data(self):
+        if self.text is None:
+            self.text = "".join(str(item) for item in self.transactions)
+        return self.text
 
 
 class W3AFXMLParser(object):
-    def __init__(self, file, test=None):
-        parser = le.XMLParser(resolve_entities=False, huge_tree=True)
-        w3scan = le.parse(file, parser)
-        root = w3scan.getroot()
+    def __init__(self, file, test=None, max_body_size=c.W3AF_MAX_BODY_SIZE):
         dupes = {}
-        for vulnerability in root.findall("vulnerability"):
+        transactions_by_dupe = {}
+        urls_by_dupe = {}
+        # Process vulnerabilities one at a time and drop them right after to keep memory bounded
+        for _, vulnerability in le.iterparse(file, tag="vulnerability", resolve_entities=False, huge_tree=True):
+            if vulnerability.getparent() is None or vulnerability.getparent().getparent() is not None:
+                continue
             name = vulnerability.attrib["name"]
             severity = vulnerability.attrib["severity"]
             description = "%s are:\n\n" % vulnerability.find("description").text.split("are:")[0]
             transactions = vulnerability.find("http-transactions")
-            if transactions is not None:
-                transactions = transactions.findall("http-transaction")
+            transactions = transactions.findall("http-transaction") if transactions is not None else []
             for transaction in transactions:
-                request = transaction.find("http-request")
-                response = transaction.find("http-response")
-                status = request.find("status").text.split(" ")
-                response_code = response.find("status").text.split(" ")[1]
-                http_method = status[0]
-                request_url = status[1]
-                data = ""
-                for part in [request, response]:
-                    headers = [f"{h.attrib['field']} -> {h.attrib['content']}" for h in part.find("headers").findall("header")]
-                    headers = "\n".join(headers)
-                    request_body = part.find("body")
-                    if request_body.attrib['content-encoding'] == "base64":
-                        if request_body.text:
-                            request_body = base64.b64decode(request_body.text).decode("utf-8", errors="ignore")
-                        else:
-                            request_body = ""
-                    else:
-                        request_body = request_body.text if request_body.text else ""
-                    if not data:
-                        data = f"Request: {request_url} {http_method} {response_code} \n\n"
-                    else:
-                        data += "Response: \n"
-                    data += f"Headers: {headers}\n\nBody:{request_body}\n\n"
+                transaction = HttpTransaction.from_element(transaction, max_body_size)
+                request_url = transaction.request_url
                 dupe_url = urlparse(request_url)
                 # Creating dupe path ned to think on more intelligent implementation
                 dupe_path = dupe_url.path[:dupe_url.path.index("%")] if "%" in dupe_url.path else dupe_url.path
@@ -64,23 +119,24 @@ class W3AFXMLParser(object):
                 dupe_path = dupe_path[:dupe_path.index(".")] if "." in dupe_path else dupe_path
                 dupe_path = dupe_path[:dupe_path.rindex("/")] if "/" in dupe_path else dupe_path
                 dupe_url = f"{dupe_url.scheme}://{dupe_url.netloc}{dupe_path}"
-                dupe_code = f"{str(response_code)[0]}xx"
-                dupe_key = hashlib.md5(f"{name} {dupe_url} {http_method} {dupe_code}".encode('utf-8')).hexdigest()
+                dupe_code = f"{str(transaction.response_code)[0]}xx"
+                dupe_key = hashlib.md5(f"{name} {dupe_url} {transaction.http_method} {dupe_code}"
+                                       .encode('utf-8')).hexdigest()
                 if dupe_key not in dupes:
                     dupes[dupe_key] = Finding(title=f"{name} {dupe_url} {dupe_code}", tool='W3AF', test=test,
                                               description=description, severity=severity,
                                               numerical_severity=Finding.get_numerical_severity(severity),
-                                              references=data,
                                               dynamic_finding=True)
-                elif data not in dupes[dupe_key].finding['references']:
-                    dupes[dupe_key].finding['references'] += data
-                if request_url not in dupes[dupe_key].unsaved_endpoints:
+                    transactions_by_dupe[dupe_key] = dict()
+                    urls_by_dupe[dupe_key] = set()
+                transactions_by_dupe[dupe_key].setdefault(transaction.get_hash_code(), transaction)
+                if request_url not in urls_by_dupe[dupe_key]:
                     dupes[dupe_key].finding['description'] += f"- {request_url}\n\n"
-
-                    dupes[dupe_key].unsaved_endpoints.append(request_url)
+                    dupes[dupe_key].unsaved_endpoints.append(make_endpoint_from_url(request_url))
+                    urls_by_dupe[dupe_key].add(request_url)
+            vulnerability.clear()
+            while vulnerability.getprevious() is not None:
+                del vulnerability.getparent()[0]
+        for dupe_key, finding in dupes.items():
+            finding.finding['references'] = HttpReferences(list(transactions_by_dupe[dupe_key].values()))
         self.items = dupes.values()
-        print(len(self.items))
-
-
-
-
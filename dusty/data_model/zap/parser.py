@@ -20,79 +20,127 @@
     ZAP scanner json parser
 """
 
-import re
+import os
 import json
 import html
+import functools
 
-from collections import namedtuple
+from urllib.parse import urlsplit
 from markdownify import markdownify as md
 
 from dusty import constants as c
-from dusty.data_model.canonical_model import Endpoint, DefaultModel as Finding
+from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.data_model.endpoints import make_endpoint_from_url
 
 
 class ZapJsonParser(object):
     """ Parses ZAP json report and populates finding list """
 
     def __init__(self, zap_result, tool_name):
-        zap_json = json.loads(zap_result)
+        """ zap_result: report text or path to saved report (as in parse_artifact) """
+        if os.path.isfile(zap_result):
+            with open(zap_result) as f:
+                zap_json = json.load(f)
+        else:
+            zap_json = json.loads(zap_result)
         # Populate items
         self.items = list()
         for site in zap_json["site"]:
             for alert in site["alerts"]:
-                description = list()
-                if "desc" in alert:
-                    description.append(md(alert["desc"]))
-                if "solution" in alert:
-                    description.append(f'**Solution**:\n {md(alert["solution"])}')
-                if "reference" in alert:
-                    description.append(f'**Reference**:\n {md(alert["reference"])}')
-                if "otherinfo" in alert:
-                    description.append(f'**Other information**:\n {md(alert["otherinfo"])}')
-                description.append(f'**Confidence**: {md(c.ZAP_CONFIDENCES[alert["confidence"]])}')
-                description = "\n".join(description)
-                instances = list()
-                if alert["instances"]:
-                    instances.append("\n")
-                    instances.append("| URI | Method | Parameter | Attack | Evidence |")
-                    instances.append("| --- | ------ | --------- | ------ | -------- |")
-                for item in alert["instances"]:
-                    instances.append("| {} |".format(" | ".join([
-                        html.escape(md_table_escape(item.get("uri", "-"))),
-                        html.escape(md_table_escape(item.get("method", "-"))),
-                        html.escape(md_table_escape(item.get("param", "-"))),
-                        html.escape(md_table_escape(item.get("attack", "-"))),
-                        html.escape(md_table_escape(item.get("evidence", "-")))
-                    ])))
-                finding = Finding(
-                    title=alert["name"],
-                    url=site["@name"],
-                    description=description,
-                    payload="\n".join(instances),
-                    tool=tool_name,
-                    test=tool_name,
-                    severity=c.ZAP_SEVERITIES[alert["riskcode"]],
-                    active=False,
-                    verified=False,
-                    dynamic_finding=True,
-                    numerical_severity=Finding.get_numerical_severity(
-                        c.ZAP_SEVERITIES[alert["riskcode"]]
-                    )
-                )
-                finding.unsaved_endpoints = list()
-                added_endpoints = set()
-                for item in alert["instances"]:
-                    if not item.get("uri", None):
-                        continue
-                    endpoint = make_endpoint_from_url(
-                        item.get("uri"),
-                        include_query=False, include_fragment=False
-                    )
-                    if str(endpoint) in added_endpoints:
-                        continue
-                    finding.unsaved_endpoints.append(endpoint)
-                    added_endpoints.add(str(endpoint))
-                self.items.append(finding)
+                self.items.append(make_finding(
+                    site["@name"], alert["name"], c.ZAP_SEVERITIES[alert["riskcode"]],
+                    alert.get("desc"), alert.get("solution"), alert.get("reference"), alert.get("otherinfo"),
+                    c.ZAP_CONFIDENCES[alert["confidence"]],
+                    [make_instance(item) for item in alert["instances"]], tool_name
+                ))
+
+
+class ZapAlertsParser(object):
+    """ Groups alert instances paged from ZAP API (core.alerts) and populates finding list """
+
+    def __init__(self, alerts, tool_name):
+        groups = dict()
+        for alert in alerts:
+            site = get_site(alert.get("url", ""))
+            key = (site, alert.get("pluginId"), alert["name"], alert["risk"], alert["confidence"])
+            if key not in groups:
+                # Only texts of the first instance are kept, they are the same for all instances of a rule
+                groups[key] = (alert.get("description"), alert.get("solution"), alert.get("reference"),
+                               alert.get("other"), list())
+            groups[key][-1].append(make_instance(alert, uri_key="url"))
+        # Populate items
+        self.items = list()
+        for (site, _, name, risk, confidence), (desc, solution, reference, other, instances) in groups.items():
+            severity = c.ZAP_SEVERITIES[c.ZAP_RISK_CODES.get(risk, "0")]
+            self.items.append(make_finding(site, name, severity, desc, solution, reference, other,
+                                           confidence, instances, tool_name))
+
+
+def make_instance(item, uri_key="uri"):
+    """ Reduces alert instance to (uri, method, param, attack, evidence) tuple """
+    return (item.get(uri_key, "-"), item.get("method", "-"), item.get("param", "-"),
+            item.get("attack", "-"), item.get("evidence", "-"))
+
+
+def make_finding(site, name, severity, desc, solution, reference, other, confidence, instances, tool_name):
+    """ Makes Finding instance from alert texts and its instances """
+    description = list()
+    if desc is not None:
+        description.append(markdown(desc))
+    if solution is not None:
+        description.append(f'**Solution**:\n {markdown(solution)}')
+    if reference is not None:
+        description.append(f'**Reference**:\n {markdown(reference)}')
+    if other is not None:
+        description.append(f'**Other information**:\n {markdown(other)}')
+    description.append(f'**Confidence**: {markdown(confidence)}')
+    description = "\n".join(description)
+    payload = list()
+    if instances:
+        payload.append("\n")
+        payload.append("| URI | Method | Parameter | Attack | Evidence |")
+        payload.append("| --- | ------ | --------- | ------ | -------- |")
+    for item in instances:
+        payload.append("| {} |".format(" | ".join([html.escape(md_table_escape(value)) for value in item])))
+    finding = Finding(
+        title=name,
+        url=site,
+        description=description,
+        payload="\n".join(payload),
+        tool=tool_name,
+        test=tool_name,
+        severity=severity,
+        active=False,
+        verified=False,
+        dynamic_finding=True,
+        numerical_severity=Finding.get_numerical_severity(severity)
+    )
+    finding.unsaved_endpoints = list()
+    added_endpoints = set()
+    for item in instances:
+        if not item[0] or item[0] == "-":
+            continue
+        endpoint = make_endpoint_from_url(
+            item[0],
+            include_query=False, include_fragment=False
+        )
+        if str(endpoint) in added_endpoints:
+            continue
+        finding.unsaved_endpoints.append(endpoint)
+        added_endpoints.add(str(endpoint))
+    return finding
+
+
+@functools.lru_cache(maxsize=c.ZAP_MARKDOWN_CACHE_SIZE)
+def markdown(text):
+    """ Converts alert HTML to markdown, memoized as texts repeat across sites and instances """
+    return md(text)
+
+
+def get_site(url):
+    """ Returns site (scheme://netloc) of URL, as ZAP groups alerts in report """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.scheme else url
 
 
 def md_table_escape(string):
@@ -105,57 +153,3 @@ def md_table_escape(string):
     for item in to_escape:
         string = string.replace(item, f"\\{item}")
     return string.replace("\n", " ")
-
-
-def make_endpoint_from_url(url, include_query=True, include_fragment=True):
-    """ Makes Enpoint instance from URL """
-    parsed_url = parse_url(url)
-    host_value = parsed_url.hostname
-    protocol = parsed_url.protocol
-    port = parsed_url.port
-    if (protocol == "http" and port != "80") or (
-            protocol == "https" and port != "443"):
-        host_value = f'{parsed_url.hostname}:{parsed_url.port}'
-    return Endpoint(
-        protocol=parsed_url.protocol,
-        host=host_value,
-        fqdn=parsed_url.hostname,
-        port=parsed_url.port,
-        path=parsed_url.path,
-        query=parsed_url.query if include_query else "",
-        fragment=parsed_url.fragment if include_fragment else ""
-    )
-
-
-def parse_url(url):
-    """ Parses URL into parts """
-    parsed_url = re.search("".join([
-        "^\s*((?P<protocol>.*?)\:\/\/)?",
-        "((?P<username>.*?)(\:(?P<password>.*))?\@)?",
-        "((?P<hostname>.*?)(\:((?P<port>[0-9]+)))?)(?P<path>/.*?)?",
-        "(?P<query>\?.*?)?(?P<fragment>\#.*?)?\s*$"
-    ]), url)
-    protocol = parsed_url.group("protocol")
-    hostname = parsed_url.group("hostname")
-    port = parsed_url.group("port")
-    path = parsed_url.group("path")
-    query = parsed_url.group("query")
-    fragment = parsed_url.group("fragment")
-    username = parsed_url.group("username")
-    password = parsed_url.group("password")
-    # Prepare result object
-    result = namedtuple("URL", [
-        "protocol", "hostname", "port",
-        "path", "query", "fragment",
-        "username", "password"
-    ])
-    return result(
-        protocol=protocol if protocol is not None else "",
-        hostname=hostname if hostname is not None else "",
-        port=port if port is not None else "",
-        path=path if path is not None else "/",
-        query=query[1:] if query is not None else "",
-        fragment=fragment[1:] if fragment is not None else "",
-        username=username if username is not None else "",
-        password=password if password is not None else ""
-    )
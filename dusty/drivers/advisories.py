@@ -0,0 +1,268 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Local advisory store: SQLite database built from OSV dumps (zip archives, dirs or JSON files),
+    indexed by ecosystem, package and alias (CVE id)
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+import zipfile
+from urllib.parse import quote
+
+from packaging import version
+
+from dusty import constants as c
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS advisories (
+    id TEXT PRIMARY KEY, summary TEXT, details TEXT, severity TEXT, modified TEXT, refs TEXT
+);
+CREATE TABLE IF NOT EXISTS affected (
+    advisory_id TEXT, ecosystem TEXT, package TEXT, introduced TEXT, fixed TEXT, last_affected TEXT,
+    versions TEXT
+);
+CREATE TABLE IF NOT EXISTS aliases (alias TEXT, advisory_id TEXT);
+CREATE INDEX IF NOT EXISTS affected_package ON affected (ecosystem, package);
+CREATE INDEX IF NOT EXISTS aliases_alias ON aliases (alias);
+"""
+REQUIREMENT_PIN = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*===?\s*([^\s;#]+)')
+
+
+def normalize_package(ecosystem, package):
+    if ecosystem == "PyPI":
+        return re.sub(r'[-_.]+', '-', package).lower()
+    return package
+
+
+def parse_version(value):
+    """ Returns comparable version or None (packaging>=22 has no LegacyVersion for odd ones) """
+    try:
+        return version.parse(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_severity(advisory):
+    """ Dusty severity from database_specific severity (GHSA, PyPA) of OSV record """
+    for item in [advisory] + advisory.get("affected", []):
+        severity = str(item.get("database_specific", {}).get("severity", "")).upper()
+        if severity in c.ADVISORY_SEVERITIES:
+            return c.ADVISORY_SEVERITIES[severity]
+    return c.ADVISORY_DEFAULT_SEVERITY
+
+
+class AdvisoryStore(object):
+    def __init__(self, path, writable=False):
+        """ Store is opened read-only (and must exist and have advisories) unless writable is set """
+        self.path = path
+        if writable:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            return
+        if not os.path.isfile(path):
+            raise RuntimeError(f"Advisory store {path} does not exist")
+        self.connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True,
+                                          check_same_thread=False)
+        try:
+            count = self.connection.execute("SELECT COUNT(*) FROM advisories").fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            self.connection.close()
+            raise RuntimeError(f"Advisory store {path} is not valid: {e}")
+        if not count:
+            self.connection.close()
+            raise RuntimeError(f"Advisory store {path} has no advisories")
+
+    def close(self):
+        self.connection.close()
+
+    def import_osv(self, paths):
+        """ Imports OSV records from zip archives (as published per ecosystem), dirs and JSON files """
+        count = 0
+        self.connection.executescript(SCHEMA)
+        with self.connection:
+            for path in paths:
+                for record in self.read_osv(path):
+                    self.add(record)
+                    count += 1
+        logging.info("Imported %d advisories into %s", count, self.path)
+        return count
+
+    @staticmethod
+    def read_osv(path):
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".json"):
+                        yield json.loads(archive.read(name).decode("utf-8"))
+        elif os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(".json"):
+                        with open(os.path.join(root, name)) as f:
+                            yield json.load(f)
+        else:
+            with open(path) as f:
+                data = json.load(f)
+            for record in data if isinstance(data, list) else [data]:
+                yield record
+
+    def add(self, record):
+        advisory_id = record["id"]
+        self.delete(advisory_id)
+        if "withdrawn" in record:
+            return
+        self.connection.execute(
+            "INSERT INTO advisories VALUES (?, ?, ?, ?, ?, ?)",
+            (advisory_id, record.get("summary"), record.get("details"), get_severity(record), record.get("modified"),
+             json.dumps([item.get("url") for item in record.get("references", []) if item.get("url")])))
+        for alias in [advisory_id] + record.get("aliases", []):
+            self.connection.execute("INSERT INTO aliases VALUES (?, ?)", (alias, advisory_id))
+        for affected in record.get("affected", []):
+            package = affected.get("package", {})
+            if not package.get("name"):
+                continue
+            ecosystem = package.get("ecosystem", "").split(":")[0]
+            name = normalize_package(ecosystem, package["name"])
+            rows = list()
+            for item in affected.get("ranges", []):
+                if item.get("type") not in ["ECOSYSTEM", "SEMVER"]:
+                    continue
+                introduced = None
+                for event in item.get("events", []):
+                    if "introduced" in event:
+                        introduced = event["introduced"]
+                    elif "fixed" in event or "last_affected" in event:
+                        rows.append((introduced, event.get("fixed"), event.get("last_affected"), None))
+                        introduced = None
+                if introduced is not None:
+                    rows.append((introduced, None, None, None))
+            if not rows and affected.get("versions"):
+                rows.append((None, None, None, json.dumps(affected["versions"])))
+            for row in rows:
+                self.connection.execute("INSERT INTO affected VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        (advisory_id, ecosystem, name) + row)
+
+    def delete(self, advisory_id):
+        for table, key in [("advisories", "id"), ("affected", "advisory_id"), ("aliases", "advisory_id")]:
+            self.connection.execute(f"DELETE FROM {table} WHERE {key} = ?", (advisory_id,))
+
+    def get_advisory(self, advisory_id):
+        row = self.connection.execute(
+            "SELECT id, summary, details, severity, refs FROM advisories WHERE id = ?", (advisory_id,)).fetchone()
+        if not row:
+            return None
+        fixed = [item[0] for item in self.connection.execute(
+            "SELECT fixed FROM affected WHERE advisory_id = ? AND fixed IS NOT NULL", (advisory_id,))]
+        return {"id": row[0], "summary": row[1], "details": row[2], "severity": row[3],
+                "references": json.loads(row[4]) if row[4] else [], "fixed": fixed}
+
+    def find_alias(self, alias):
+        """ Returns advisory by its id or alias (CVE id) """
+        row = self.connection.execute("SELECT advisory_id FROM aliases WHERE alias = ? LIMIT 1", (alias,)).fetchone()
+        return self.get_advisory(row[0]) if row else None
+
+    def lookup(self, ecosystem, package, installed):
+        """ Returns advisories affecting installed version of the package, with affected version spec """
+        current = parse_version(installed)
+        if current is None:
+            return []
+        results = dict()
+        rows = self.connection.execute(
+            "SELECT advisory_id, introduced, fixed, last_affected, versions FROM affected "
+            "WHERE ecosystem = ? AND package = ?", (ecosystem, normalize_package(ecosystem, package)))
+        for advisory_id, introduced, fixed, last_affected, versions in rows:
+            spec = self.match(current, installed, introduced, fixed, last_affected, versions)
+            if spec is not None and advisory_id not in results:
+                results[advisory_id] = spec
+        found = list()
+        for advisory_id, spec in results.items():
+            advisory = self.get_advisory(advisory_id)
+            advisory["affected"] = spec
+            found.append(advisory)
+        return found
+
+    @staticmethod
+    def match(current, installed, introduced, fixed, last_affected, versions):
+        """ Returns affected version spec (safety style) if version is in range, None otherwise """
+        if versions is not None:
+            return f"=={installed}" if installed in json.loads(versions) else None
+        spec = list()
+        if introduced and introduced != "0":
+            lower = parse_version(introduced)
+            if lower is None or current < lower:
+                return None
+            spec.append(f">={introduced}")
+        if fixed:
+            upper = parse_version(fixed)
+            if upper is None or current >= upper:
+                return None
+            spec.append(f"<{fixed}")
+        elif last_affected:
+            upper = parse_version(last_affected)
+            if upper is None or current > upper:
+                return None
+            spec.append(f"<={last_affected}")
+        return ",".join(spec) if spec else ">=0"
+
+    def audit(self, ecosystem, packages):
+        """ Checks (package, version) pairs: returns vulnerabilities in safety json report format
+            with severity appended """
+        vulnerabilities = list()
+        for package, installed in packages:
+            for advisory in self.lookup(ecosystem, package, installed):
+                vulnerabilities.append([package, advisory["affected"], installed,
+                                        advisory["details"] or advisory["summary"] or advisory["id"],
+                                        advisory["id"], advisory["severity"]])
+        return vulnerabilities
+
+    def severity(self, ecosystem, package, installed):
+        """ Highest severity of advisories affecting installed version, None if not known """
+        severities = [advisory["severity"] for advisory in self.lookup(ecosystem, package, installed)]
+        return min(severities, key=lambda item: c.SEVERITIES.get(item, 100)) if severities else None
+
+
+def read_pinned_requirements(path):
+    """ Returns (name, version) of pinned (==) requirements, -r includes are followed """
+    packages = list()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith(("-r ", "--requirement ")):
+                packages.extend(read_pinned_requirements(
+                    os.path.join(os.path.dirname(path), line.split(None, 1)[1].strip())))
+                continue
+            match = REQUIREMENT_PIN.match(line)
+            if match:
+                packages.append((match.group(1), match.group(2)))
+    return packages
+
+
+class AdvisoryAudit(object):
+    """ Offline replacement of safety: pinned requirements checked against advisory store """
+
+    def __init__(self, code_path, test, files, database):
+        from dusty.data_model.safety.parser import SafetyScanParser
+        packages = list()
+        for file_path in files:
+            packages.extend(read_pinned_requirements(os.path.join(code_path, file_path)))
+        store = AdvisoryStore(database)
+        try:
+            data = store.audit("PyPI", packages)
+        finally:
+            store.close()
+        self.items = SafetyScanParser(None, test, data=data).items
@@ -15,6 +15,7 @@
 import re
 from os import path, environ
 from jinja2 import Environment, PackageLoader, select_autoescape
+from dusty.instrumentation import profile
 
 
 class HTMLReport(object):
@@ -26,7 +27,8 @@ class HTMLReport(object):
             autoescape=select_autoescape(['html', 'xml'])
         )
         self.template = env.get_template('html_report_template.html')
-        res = self.template.render(config=config, findings=findings, other_findings=other_findings)
+        res = self.template.render(config=config, findings=findings, other_findings=other_findings,
+                                   run_profile=profile.summary())
 
         test_name = f'{config["project_name"]}-{config["environment"]}-{config["test_type"]}'
         report_name = environ.get("report_name", None)
@@ -2,6 +2,9 @@ import datetime
 from time import time
 
 from influxdb import InfluxDBClient
+from influxdb.line_protocol import make_lines
+from dusty import constants as c
+from dusty.instrumentation import profile
 from dusty.utils import define_jira_priority
 
 
@@ -13,21 +16,30 @@ class InfluxReport(object):
         self.login = default_config['influx'].get('login', '')
         self.policy = default_config['influx'].get('policy', {'Blocker': 1, 'Critical': 5, 'Major': 15})
         self.password = default_config['influx'].get('password', '')
+        self.batch_size = int(default_config['influx'].get('batch_size', c.INFLUX_BATCH_SIZE))
+        self.retries = int(default_config['influx'].get('retries', c.INFLUX_RETRIES))
         self.project_name = default_config['project_name']
         self.environment = default_config['environment']
         self.test_type = default_config['test_type']
         self.created_jira_tickets = created_jira_tickets
         self.open_issues = len(self.created_jira_tickets)
-        self.execution_time = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        now = int(time())
+        self.timestamp = now * 10 ** 9  # nanoseconds, so line protocol does not re-parse time per point
+        self.execution_time = datetime.datetime.utcfromtimestamp(now).strftime('%Y-%m-%dT%H:%M:%SZ')
         self.results = global_results
+        self.other_results = other_results if other_results else []
         self.results_by_severity = self.sort_results_by_severity()
         self.results_by_severity['new_in_jira'] = self.get_new_jira_issues()
         self.results_by_severity['total_in_jira'] = self.open_issues
         self.results_by_severity['test_to_count'] = 1
         self.build_id = f'{self.execution_time} - {self.project_name}'
         self.client = InfluxDBClient(self.host, self.port, username=self.login,
-                                     password=self.password, database=self.db)
+                                     password=self.password, database=self.db, retries=self.retries)
+        self.points = list()
         self._ingest_active_errors()
+        self._ingest_findings()
+        self._ingest_durations()
+        self.flush()
 
     def sort_results_by_severity(self):
         results = dict()
@@ -52,47 +64,59 @@ class InfluxReport(object):
         # TODO: implement with compliance policy
         pass
 
+    def add_point(self, measurement, tags, fields):
+        point_tags = {
+            'build_id': self.build_id,
+            'test_name': self.test_type,
+            'type': self.test_type,
+            'project': self.project_name
+        }
+        point_tags.update(tags)
+        self.points.append({
+            "measurement": measurement,
+            "time": self.timestamp,
+            "tags": point_tags,
+            "fields": fields
+        })
+
+    def flush(self):
+        if not self.points:
+            return
+        lines = make_lines({"points": self.points}).splitlines()
+        self.client.write_points(lines, batch_size=self.batch_size, protocol='line')
+        self.points = list()
+
     def _ingest_active_errors(self):
-        stats = [{
-            "measurement": "stats",
-            "time": self.execution_time,
-            "tags": {
-                'build_id': self.build_id,
-                'test_name': self.test_type,
-                'type': self.test_type,
-                'project': self.project_name
-            },
-            "fields": self.results_by_severity
-        }]
-        self.client.write_points(stats)
-        jira_issues = []
+        self.add_point("stats", {}, self.results_by_severity)
         for issue in self.created_jira_tickets:
-            ts = int(datetime.datetime.strptime(issue['open_date'], '%Y-%m-%dT%H:%M:%S.%f%z').timestamp())
+            opened = datetime.datetime.strptime(issue['open_date'], '%Y-%m-%dT%H:%M:%S.%f%z')
+            ts = int(opened.timestamp())
             break_policy = 'Y' if str(issue['priority']) in self.policy and \
                                   ts + (self.policy[str(issue['priority'])]*24*3600) < int(time()) else 'N'
-            issue = {
-                "measurement": "errors",
-                "time": self.execution_time,
-                "tags": {
-                    'build_id': self.build_id,
-                    'description': str(issue['description']),
-                    'test_name': self.test_type,
-                    'type': self.test_type,
-                    'project': self.project_name,
-                    'priority': issue['priority'],
-                    'created': datetime.datetime.strptime(
-                        issue['open_date'], '%Y-%m-%dT%H:%M:%S.%f%z').strftime('%d %b %Y %H:%M:%S.%f'),
-                    'link': str(issue['link'])
-                },
-                "fields": {
-                    'breaking_policy': break_policy,
-                    'status': str(issue['status']),
-                    'assignee': str(issue['assignee']),
-                    'quantity': 1
-                }
-            }
-            jira_issues.append(issue)
-        self.client.write_points(jira_issues)
-
+            self.add_point("errors", {
+                'description': str(issue['description']),
+                'priority': str(issue['priority']),
+                'created': opened.strftime('%d %b %Y %H:%M:%S.%f'),
+                'link': str(issue['link'])
+            }, {
+                'breaking_policy': break_policy,
+                'status': str(issue['status']),
+                'assignee': str(issue['assignee']),
+                'quantity': 1
+            })
 
+    def _ingest_findings(self):
+        counts = dict()
+        for each in list(self.results) + list(self.other_results):
+            cwe = each.finding['static_finding_details']['cwe']
+            key = (str(each.finding['tool']), str(each.finding['severity']), str(cwe) if cwe else 'N/A')
+            counts[key] = counts.get(key, 0) + 1
+        for (tool, severity, cwe), count in counts.items():
+            self.add_point("findings", {'tool': tool, 'severity': severity, 'cwe': cwe}, {'count': count})
 
+    def _ingest_durations(self):
+        for tool, duration in profile.durations("tool.").items():
+            self.add_point("tool_duration", {'tool': tool}, {'duration': float(duration)})
+        for stage, duration in profile.durations().items():
+            if not stage.startswith("tool."):
+                self.add_point("stage_duration", {'stage': stage}, {'duration': float(duration)})
@@ -0,0 +1,205 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import re
+import gzip
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from bs4 import BeautifulSoup
+
+from dusty import constants as c
+from dusty.drivers.advisories import AdvisoryStore
+
+CVE_ID = re.compile(r'CVE-\d{4}-\d+', re.IGNORECASE)
+FIXED_VERSION = re.compile(r'versions up to \(excluding\)(.*)')
+
+
+def get_cve_id(reference):
+    match = CVE_ID.search(reference)
+    return match.group(0).upper() if match else None
+
+
+class NvdEnricher(object):
+    """ Resolves NVD references (CVE pages) into description and first fixed version
+
+    Lookup order: on-disk cache (one JSON file per CVE), local advisory store (if set), local NVD JSON
+    feed file (if set), then NVD site itself - fetched concurrently and within bounded time, unless offline.
+    """
+
+    def __init__(self, cache_path=c.NVD_CACHE_PATH, feed_path=None, offline=False,
+                 workers=c.NVD_FETCH_WORKERS, timeout=c.NVD_FETCH_TIMEOUT, total_timeout=c.NVD_ENRICHMENT_TIMEOUT,
+                 advisories=None):
+        self.cache_path = cache_path
+        self.feed_path = feed_path
+        self.advisories = advisories
+        self.offline = offline
+        self.workers = workers
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+
+    @staticmethod
+    def from_config(config):
+        """ Makes enricher from 'nvd' options (composition_analysis section) and env """
+        options = config.get('nvd', {}) if isinstance(config.get('nvd', {}), dict) else {}
+        offline = options.get('offline', os.environ.get('nvd_offline', False))
+        return NvdEnricher(
+            cache_path=options.get('cache_path', os.environ.get('nvd_cache_path', c.NVD_CACHE_PATH)),
+            feed_path=options.get('feed_path', os.environ.get('nvd_feed_path', None)),
+            offline=offline if isinstance(offline, bool) else str(offline).lower() in ['true', 'yes', '1'],
+            workers=int(options.get('workers', c.NVD_FETCH_WORKERS)),
+            timeout=int(options.get('timeout', c.NVD_FETCH_TIMEOUT)),
+            total_timeout=int(options.get('total_timeout', c.NVD_ENRICHMENT_TIMEOUT)),
+            advisories=config.get('advisories')
+        )
+
+    def enrich(self, references):
+        """ Returns dict: reference -> {"description": str or None, "fixed_version": str or None} """
+        cves = dict()
+        for reference in references:
+            cve_id = get_cve_id(reference)
+            if cve_id:
+                cves.setdefault(cve_id, reference)
+        info = self.load_cache(cves)
+        missing = [cve_id for cve_id in cves if cve_id not in info]
+        if missing and self.advisories:
+            info.update(self.load_advisories(missing))
+        missing = [cve_id for cve_id in cves if cve_id not in info]
+        if missing and self.feed_path:
+            info.update(self.load_feed(missing))
+        missing = [cve_id for cve_id in cves if cve_id not in info]
+        if missing and not self.offline:
+            info.update(self.fetch({cve_id: cves[cve_id] for cve_id in missing}))
+        missing = [cve_id for cve_id in cves if cve_id not in info]
+        if missing:
+            logging.warning("NVD data is not available for %d CVE(s): %s", len(missing), ", ".join(missing))
+        return {reference: info[get_cve_id(reference)] for reference in references
+                if get_cve_id(reference) in info}
+
+    def cache_file(self, cve_id):
+        return os.path.join(self.cache_path, f"{cve_id}.json")
+
+    def load_cache(self, cves):
+        info = dict()
+        if not self.cache_path:
+            return info
+        for cve_id in cves:
+            try:
+                with open(self.cache_file(cve_id)) as f:
+                    item = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if self.is_resolved(item):
+                info[cve_id] = item
+        return info
+
+    @staticmethod
+    def is_resolved(item):
+        return bool(item.get("description") or item.get("fixed_version"))
+
+    def save_cache(self, info):
+        """ Caches resolved CVEs only: empty results (NVD errors, throttling) are looked up again next run """
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+            for cve_id, item in info.items():
+                if not self.is_resolved(item):
+                    continue
+                with open(self.cache_file(cve_id), "w") as f:
+                    json.dump(item, f)
+        except OSError as e:
+            logging.warning("Failed to save NVD cache: %s", str(e))
+
+    def load_advisories(self, cve_ids):
+        """ Looks CVEs up in local advisory store by alias """
+        info = dict()
+        store = AdvisoryStore(self.advisories)
+        try:
+            for cve_id in cve_ids:
+                advisory = store.find_alias(cve_id)
+                if advisory:
+                    info[cve_id] = {
+                        "description": advisory["details"] or advisory["summary"],
+                        "fixed_version": advisory["fixed"][0] if advisory["fixed"] else None
+                    }
+        finally:
+            store.close()
+        return info
+
+    def load_feed(self, cve_ids):
+        """ Reads NVD JSON feed (nvdcve-1.1-*.json, optionally gzipped), keeping only requested CVEs """
+        wanted = set(cve_ids)
+        info = dict()
+        try:
+            opener = gzip.open if self.feed_path.endswith(".gz") else open
+            with opener(self.feed_path, "rt", encoding="utf-8") as f:
+                feed = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning("Failed to read NVD feed %s: %s", self.feed_path, str(e))
+            return info
+        for item in feed.get("CVE_Items", []):
+            cve_id = item["cve"]["CVE_data_meta"]["ID"]
+            if cve_id not in wanted:
+                continue
+            descriptions = item["cve"].get("description", {}).get("description_data", [])
+            fixed_version = None
+            for node in item.get("configurations", {}).get("nodes", []):
+                for match in node.get("cpe_match", []):
+                    if match.get("versionEndExcluding"):
+                        fixed_version = match["versionEndExcluding"]
+                        break
+                if fixed_version:
+                    break
+            info[cve_id] = {
+                "description": descriptions[0]["value"] if descriptions else None,
+                "fixed_version": fixed_version
+            }
+        self.save_cache(info)
+        return info
+
+    def fetch(self, cves):
+        """ Scrapes NVD CVE pages concurrently, gives up on what is not done within total_timeout """
+        info = dict()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = {executor.submit(self.fetch_one, reference): cve_id for cve_id, reference in cves.items()}
+        done, not_done = wait(futures, timeout=self.total_timeout)
+        executor.shutdown(wait=False)
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            try:
+                info[futures[future]] = future.result()
+            except Exception as e:
+                logging.warning("Failed to fetch %s from NVD: %s", futures[future], str(e))
+        self.save_cache(info)
+        return info
+
+    def fetch_one(self, reference):
+        response = requests.get(reference, timeout=self.timeout)
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, 'html.parser')
+        result = {"description": None, "fixed_version": None}
+        recomendation = soup.find_all('a', {'id': 'showCPERanges'})
+        if recomendation:
+            ver_res = FIXED_VERSION.findall(recomendation[0].attrs['data-range-description'])
+            if ver_res:
+                result["fixed_version"] = ver_res[0].strip()
+        description = soup.find_all('p', {'data-testid': 'vuln-description'})
+        if description:
+            result["description"] = description[0].text
+        return result
@@ -12,22 +12,71 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import zlib
 import redis
+import logging
 from os import sep
 
+from dusty import constants as c
+from dusty.utils import get_run_id
+
 
 class RedisFile(object):
-    def __init__(self, connection_string, html_report_file, xml_report_file):
+    """ Stores report files in Redis as zlib-compressed chunk lists under run-scoped keys """
+
+    def __init__(self, connection_string, html_report_file=None, xml_report_file=None,
+                 run_id=None, ttl=c.REDIS_KEY_TTL):
         self.client = redis.Redis.from_url(connection_string)
+        self.run_id = run_id if run_id else get_run_id()
+        self.ttl = ttl
         if html_report_file:
             self.set_key(html_report_file)
         if xml_report_file:
             self.set_key(xml_report_file)
 
+    def make_key(self, filepath, run_id=None):
+        return f'{c.REDIS_KEY_PREFIX}:{run_id if run_id else self.run_id}:{filepath.split(sep)[-1]}'
+
     def set_key(self, filepath):
-        with open(filepath, 'r') as f:
-            self.client.set(filepath.split(sep)[-1], f.read())
+        key = self.make_key(filepath)
+        chunks_key = f'{key}:chunks'
+        compressor = zlib.compressobj()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(key, chunks_key)
+        size = 0
+        chunks = 0
+        with open(filepath, 'rb') as f:
+            for data in iter(lambda: f.read(c.REDIS_CHUNK_SIZE), b''):
+                size += len(data)
+                chunk = compressor.compress(data)
+                if not chunk:
+                    continue
+                pipe.rpush(chunks_key, chunk)
+                chunks += 1
+                # Flush pipeline periodically to keep both worker memory and Redis latency bounded
+                if chunks % c.REDIS_PIPELINE_CHUNKS == 0:
+                    pipe.execute()
+        pipe.rpush(chunks_key, compressor.flush())
+        chunks += 1
+        pipe.expire(chunks_key, self.ttl)
+        # Meta is written last so readers never see a partially uploaded file
+        pipe.hmset(key, {'size': size, 'chunks': chunks, 'encoding': 'zlib'})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+        logging.info("Uploaded %s to Redis as %s (%d bytes, %d chunks)", filepath, key, size, chunks)
+        return key
 
-    def get_key(self, filepath):
-        with open(filepath, 'w') as f:
-            f.write(self.client.get(filepath.split(sep)[-1]))
+    def get_key(self, filepath, run_id=None):
+        key = self.make_key(filepath, run_id)
+        chunks_key = f'{key}:chunks'
+        if not self.client.exists(key):
+            logging.warning("Key %s not found in Redis", key)
+            return False
+        decompressor = zlib.decompressobj()
+        total = self.client.llen(chunks_key)
+        with open(filepath, 'wb') as f:
+            for start in range(0, total, c.REDIS_PIPELINE_CHUNKS):
+                for chunk in self.client.lrange(chunks_key, start, start + c.REDIS_PIPELINE_CHUNKS - 1):
+                    f.write(decompressor.decompress(chunk))
+            f.write(decompressor.flush())
+        return True
@@ -0,0 +1,90 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import json
+import redis
+import hashlib
+import logging
+
+from dusty import constants as c
+from dusty.utils import get_run_id
+from dusty.data_model.canonical_model import dump_finding, load_finding
+
+
+class RedisFindings(object):
+    """ Shares canonical findings of a run between workers through Redis
+
+    Layout (all keys are prefixed with dusty:<run_id>):
+        :tools               - set of tool names that reported findings
+        :findings:<tool>     - hash of finding fingerprint -> compressed raw (not filtered) finding
+        :fingerprints        - set of all finding fingerprints
+        :errors              - hash of tool -> error message
+    """
+
+    def __init__(self, connection_string, run_id=None, ttl=c.REDIS_KEY_TTL):
+        self.client = redis.Redis.from_url(connection_string)
+        self.run_id = run_id if run_id else get_run_id()
+        self.ttl = ttl
+
+    def make_key(self, *parts):
+        return ':'.join([c.REDIS_KEY_PREFIX, self.run_id] + list(parts))
+
+    @staticmethod
+    def fingerprint(finding):
+        """ Identity of finding within the run: unlike get_hash_code, tells apart DAST findings
+            with the same title on different endpoints """
+        data = [finding.get_hash_code(), str(finding.finding['tool']), str(finding.finding['description']),
+                sorted(str(item) for item in finding.unsaved_endpoints + finding.endpoints)]
+        return hashlib.sha256(json.dumps(data).encode('utf-8')).hexdigest()
+
+    def store(self, findings, errors=None):
+        pipe = self.client.pipeline(transaction=False)
+        keys = {self.make_key('tools'), self.make_key('fingerprints')}
+        for index, finding in enumerate(findings, 1):
+            tool = str(finding.finding['tool'])
+            fingerprint = self.fingerprint(finding)
+            keys.add(self.make_key('findings', tool))
+            pipe.sadd(self.make_key('tools'), tool)
+            pipe.sadd(self.make_key('fingerprints'), fingerprint)
+            pipe.hset(self.make_key('findings', tool), fingerprint, dump_finding(finding))
+            if index % c.REDIS_FINDINGS_BATCH_SIZE == 0:
+                pipe.execute()
+        if errors:
+            keys.add(self.make_key('errors'))
+            for tool, message in errors.items():
+                pipe.hset(self.make_key('errors'), tool, message)
+        for key in keys:
+            pipe.expire(key, self.ttl)
+        pipe.execute()
+        logging.info("Stored findings snapshot in Redis for run %s", self.run_id)
+
+    def is_known(self, finding):
+        return bool(self.client.sismember(self.make_key('fingerprints'), self.fingerprint(finding)))
+
+    def tools(self):
+        return sorted(item.decode('utf-8') for item in self.client.smembers(self.make_key('tools')))
+
+    def load(self, tools=None):
+        """ Returns findings from all shards of the run, ones reported by several shards are returned once """
+        findings = dict()
+        for tool in tools if tools else self.tools():
+            for fingerprint, data in self.client.hscan_iter(self.make_key('findings', tool),
+                                                            count=c.REDIS_FINDINGS_BATCH_SIZE):
+                if fingerprint not in findings:
+                    findings[fingerprint] = load_finding(data)
+        return list(findings.values())
+
+    def errors(self):
+        return {key.decode('utf-8'): value.decode('utf-8')
+                for key, value in self.client.hgetall(self.make_key('errors')).items()}
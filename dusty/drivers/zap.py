@@ -0,0 +1,252 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Pool of long-lived ZAP daemons: started once and reused by scans (fresh session per scan),
+    recycled when unhealthy or after max_scans. External daemons (already running) can be used too.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import subprocess
+from time import sleep
+from queue import Queue, Empty
+
+from lxml import etree
+from zapv2 import ZAPv2
+
+from dusty import constants as c
+from dusty.utils import id_generator
+
+
+def make_scan_policy(name, disabled):
+    """ Returns scan policy file (in format of ZAP policy export) with given scanners switched off """
+    root = etree.Element("configuration")
+    etree.SubElement(root, "policy").text = name
+    scanner = etree.SubElement(root, "scanner")
+    etree.SubElement(scanner, "level").text = "MEDIUM"
+    etree.SubElement(scanner, "strength").text = "MEDIUM"
+    plugins = etree.SubElement(root, "plugins")
+    for item in disabled:
+        plugin = etree.SubElement(plugins, f"p{item}")
+        etree.SubElement(plugin, "enabled").text = "false"
+        etree.SubElement(plugin, "level").text = "OFF"
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", pretty_print=True)
+
+
+class ZapDaemon(object):
+    def __init__(self, port=c.ZAP_DAEMON_PORT, heap=c.ZAP_DAEMON_HEAP, url=None,
+                 api_key=c.ZAP_API_KEY, start_timeout=c.ZAP_START_TIMEOUT):
+        """ url: address of external daemon (not started nor stopped by dusty) """
+        self.port = port
+        self.heap = heap
+        self.url = url if url else f"http://127.0.0.1:{port}"
+        self.external = url is not None
+        self.api_key = api_key
+        self.start_timeout = start_timeout
+        self.process = None
+        self.scans = 0
+        self.api = ZAPv2(apikey=api_key, proxies={"http": self.url, "https": self.url})
+
+    def start(self):
+        if not self.external:
+            logging.info("Starting ZAP daemon on port %d (heap %s)", self.port, self.heap)
+            self.process = subprocess.Popen([
+                "/usr/bin/java", f"-Xmx{self.heap}",
+                "-jar", "/opt/zap/zap.jar",
+                "-daemon", "-port", str(self.port), "-host", "0.0.0.0",
+                "-config", f"api.key={self.api_key}",
+                "-config", "api.addrs.addr.regex=true",
+                "-config", "api.addrs.addr.name=.*",
+                "-config", "ajaxSpider.browserId=htmlunit"
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(self.start_timeout):
+            if self.healthy():
+                logging.info("Started ZAP %s at %s", self.api.core.version, self.url)
+                return True
+            if self.process is not None and self.process.poll() is not None:
+                break
+            sleep(1)
+        logging.error("ZAP at %s failed to start", self.url)
+        self.stop()
+        return False
+
+    def healthy(self):
+        if self.process is not None and self.process.poll() is not None:
+            return False
+        try:
+            self.api.core.version
+            return True
+        except IOError:
+            return False
+
+    def new_session(self):
+        """ Drops sites, alerts and contexts left by previous scan """
+        self.api.core.new_session(name=f"dusty_{id_generator(8)}", overwrite=True)
+        self.scans += 1
+
+    def apply_scan_policy(self, name, scan_types):
+        """ Creates scan policy with rules of scan_types ('all' or ZAP_SCAN_POCILICES keys) in one import
+            (bulk disable for external daemon, which may not see our files), blacklisted rules are switched
+            off for passive scan too """
+        enabled = [item for policy in scan_types for item in c.ZAP_SCAN_POCILICES.get(policy, [])]
+        disabled = list(c.ZAP_BLACKLISTED_RULES)
+        if "all" not in scan_types:
+            disabled.extend(int(item["id"]) for item in self.api.ascan.scanners())
+        disabled = [item for item in dict.fromkeys(disabled) if item not in enabled]
+        if self.external:
+            self.api.ascan.add_scan_policy(name)
+            if disabled:
+                self.api.ascan.disable_scanners(ids=",".join(str(item) for item in disabled), scanpolicyname=name)
+        else:
+            path = c.ZAP_POLICY_PATH.format(name)
+            with open(path, "wb") as f:
+                f.write(make_scan_policy(name, disabled))
+            try:
+                self.api.ascan.import_scan_policy(path)
+            finally:
+                os.remove(path)
+        if c.ZAP_BLACKLISTED_RULES:
+            self.api.pscan.disable_scanners(ids=",".join(str(item) for item in c.ZAP_BLACKLISTED_RULES))
+
+    def end_scan(self, scan_policy_name=None):
+        """ Stops spiders and active scans and removes scan policy left by (possibly failed) scan """
+        actions = [self.api.spider.stop_all_scans, self.api.ajaxSpider.stop, self.api.ascan.stop_all_scans]
+        if scan_policy_name:
+            actions.append(lambda: self.api.ascan.remove_scan_policy(scan_policy_name))
+        for action in actions:
+            try:
+                action()
+            except Exception as e:
+                logging.warning("ZAP at %s cleanup failed: %s", self.url, str(e))
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class ZapPool(object):
+    """ Hands out ready daemons: idle ones first, new managed ones while below size """
+
+    def __init__(self, size=1, base_port=c.ZAP_DAEMON_PORT, heap=c.ZAP_DAEMON_HEAP, max_scans=None,
+                 urls=None, start_timeout=c.ZAP_START_TIMEOUT):
+        self.size = size
+        # Scans that can run at once: managed daemons and external ones
+        self.capacity = size + len(urls if urls else [])
+        self.base_port = base_port
+        self.heap = heap
+        self.max_scans = max_scans
+        self.start_timeout = start_timeout
+        self.lock = threading.Lock()
+        self.idle = Queue()
+        self.daemons = list()
+        self.free_ports = [base_port + index for index in range(size)]
+        for url in urls if urls else []:
+            daemon = ZapDaemon(url=url, start_timeout=start_timeout)
+            self.daemons.append(daemon)
+            self.idle.put(daemon)
+
+    @staticmethod
+    def from_config(config):
+        urls = config.get("daemons", os.environ.get("zap_daemons", ""))
+        if isinstance(urls, str):
+            urls = [item.strip() for item in urls.split(",") if item.strip()]
+        max_scans = config.get("max_scans", None)
+        return ZapPool(
+            size=int(config.get("pool_size", 1)),
+            base_port=int(config.get("daemon_port", c.ZAP_DAEMON_PORT)),
+            heap=config.get("heap", c.ZAP_DAEMON_HEAP),
+            max_scans=int(max_scans) if max_scans else None,
+            urls=urls,
+            start_timeout=int(config.get("start_timeout", c.ZAP_START_TIMEOUT))
+        )
+
+    def acquire(self):
+        while True:
+            try:
+                daemon = self.idle.get(block=False)
+            except Empty:
+                daemon = self.start_daemon()
+                if daemon is None:
+                    # All ports are busy: wait for scan on another daemon to finish
+                    daemon = self.idle.get()
+            if daemon is False:
+                raise RuntimeError("ZAP failed to start")
+            if daemon.healthy():
+                return daemon
+            logging.warning("ZAP at %s is not healthy, recycling", daemon.url)
+            self.recycle(daemon)
+
+    def start_daemon(self):
+        """ Returns started daemon, None if pool is full, False if daemon failed to start """
+        with self.lock:
+            if not self.free_ports:
+                return None
+            port = self.free_ports.pop(0)
+            daemon = ZapDaemon(port=port, heap=self.heap, start_timeout=self.start_timeout)
+            self.daemons.append(daemon)
+        if daemon.start():
+            return daemon
+        self.remove(daemon)
+        return False
+
+    def release(self, daemon):
+        if self.max_scans and not daemon.external and daemon.scans >= self.max_scans:
+            logging.info("ZAP at %s made %d scan(s), recycling", daemon.url, daemon.scans)
+            self.recycle(daemon)
+        elif daemon.external or daemon.healthy():
+            self.idle.put(daemon)
+        else:
+            self.recycle(daemon)
+
+    def recycle(self, daemon):
+        if daemon.external:
+            # Not ours to restart: wait for it to come back
+            if not daemon.start():
+                raise RuntimeError(f"ZAP at {daemon.url} is not available")
+            self.idle.put(daemon)
+            return
+        self.remove(daemon)
+
+    def remove(self, daemon):
+        daemon.stop()
+        with self.lock:
+            if daemon in self.daemons:
+                self.daemons.remove(daemon)
+            self.free_ports.append(daemon.port)
+
+    def shutdown(self):
+        with self.lock:
+            daemons = list(self.daemons)
+        for daemon in daemons:
+            daemon.stop()
+
+
+pools = dict()
+pools_lock = threading.Lock()
+
+
+def get_zap_pool(config):
+    """ Returns pool shared by ZAP scans (all targets) of the run with the same daemon settings:
+        managed daemons live until the run exits, external ones are reused across runs too """
+    key = tuple(str(config.get(item)) for item in ["daemons", "pool_size", "daemon_port", "heap", "max_scans"])
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ZapPool.from_config(config)
+            atexit.register(pools[key].shutdown)
+        return pools[key]
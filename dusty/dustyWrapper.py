@@ -18,24 +18,17 @@ import json
 import base64
 import urllib
 import logging
-import subprocess
 import pkg_resources
-from time import sleep, time
+from time import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from random import randrange
-from zapv2 import ZAPv2
 
 from dusty import constants as c
-from dusty.utils import execute, find_ip, common_post_processing, id_generator
-from dusty.data_model.nikto.parser import NiktoXMLParser
-from dusty.data_model.nmap.parser import NmapXMLParser
-from dusty.data_model.sslyze.parser import SslyzeJSONParser
-from dusty.data_model.masscan.parser import MasscanJSONParser
-from dusty.data_model.w3af.parser import W3AFXMLParser
-from dusty.data_model.qualys.parser import QualysWebAppParser
-from dusty.data_model.aemhacker.parser import AemOutputParser
-from dusty.data_model.zap.parser import ZapJsonParser
+from dusty.instrumentation import parse
+from dusty.utils import execute, find_ip, common_post_processing, id_generator, AdaptivePoller
 from dusty.drivers.qualys import WAS
+from dusty.drivers.zap import get_zap_pool
 
 
 class DustyWrapper(object):
@@ -44,7 +37,7 @@ class DustyWrapper(object):
         tool_name = "SSlyze"
         exec_cmd = f'sslyze --regular --json_out=/tmp/sslyze.json --quiet {config["host"]}:{config["port"]}'
         execute(exec_cmd)
-        result = SslyzeJSONParser("/tmp/sslyze.json", "SSlyze").items
+        result = parse("sslyze", "/tmp/sslyze.json", "SSlyze").items
         return tool_name, result
 
     @staticmethod
@@ -64,7 +57,7 @@ class DustyWrapper(object):
             ports = config.get("inclusions", "0-65535")
             exec_cmd = f'masscan {host} -p {ports} -pU:{ports} --rate 1000 -oJ /tmp/masscan.json {excluded_addon}'
             execute(exec_cmd.strip())
-            result = MasscanJSONParser("/tmp/masscan.json", "masscan").items
+            result = parse("masscan", "/tmp/masscan.json", "masscan").items
         return tool_name, result
 
     @staticmethod
@@ -76,7 +69,7 @@ class DustyWrapper(object):
                    f'-Format xml -output /tmp/nikto.xml -Save /tmp/extended_nikto'
         cwd = '/opt/nikto/program'
         execute(exec_cmd, cwd)
-        result = NiktoXMLParser("/tmp/nikto.xml", "Nikto").items
+        result = parse("nikto", "/tmp/nikto.xml", "Nikto").items
         return tool_name, result
 
     @staticmethod
@@ -107,7 +100,7 @@ class DustyWrapper(object):
                    f'--min-rate 1000 --max-retries 0 ' \
                    f'--script={nse_scripts} {config["host"]} -oX /tmp/nmap.xml'
         execute(exec_cmd)
-        result = NmapXMLParser('/tmp/nmap.xml', "NMAP").items
+        result = parse("nmap", '/tmp/nmap.xml', "NMAP").items
         return tool_name, result
 
     @staticmethod
@@ -124,7 +117,8 @@ class DustyWrapper(object):
         with open(config_file, 'w') as f:
             f.write(config_content)
         execute(w3af_execution_command)
-        result = W3AFXMLParser("/tmp/w3af.xml", "w3af").items
+        result = parse("w3af", "/tmp/w3af.xml", "w3af",
+                       max_body_size=int(config.get("max_body_size", c.W3AF_MAX_BODY_SIZE))).items
         return tool_name, result
 
     @staticmethod
@@ -151,6 +145,10 @@ class DustyWrapper(object):
         report_id = None
         try:
             qualys = WAS()
+            # Qualys API is rate limited: never check more often than QUALYS_STATUS_CHECK_INTERVAL,
+            # back off on long scans to spend less of the API quota
+            qualys_poller = AdaptivePoller(min_interval=c.QUALYS_STATUS_CHECK_INTERVAL,
+                                           max_interval=c.QUALYS_STATUS_CHECK_MAX_INTERVAL)
             ts = datetime.utcfromtimestamp(int(time())).strftime('%Y-%m-%d %H:%M:%S')
             logging.info("Qualys: searching for existing project")
             project_id = qualys.search_for_project(project_name)
@@ -169,16 +167,14 @@ class DustyWrapper(object):
             if not scan_id:
                 raise RuntimeError("Scan haven't been started")
             logging.info("Qualys: waiting for scan to finish")
-            while not qualys.scan_status(scan_id):
-                sleep(c.QUALYS_STATUS_CHECK_INTERVAL)
+            qualys_poller.wait("qualys.scan", lambda: not qualys.scan_status(scan_id))
             # qualys.download_scan_report(scan_id)
             logging.info("Qualys: requesting report")
             report_id = qualys.request_report(project_name, ts, scan_id, project_id, qualys_template_id)
             if not report_id:
                 raise RuntimeError("Request report failed")
             logging.info("Qualys: waiting for report to be created")
-            while not qualys.get_report_status(report_id):
-                sleep(c.QUALYS_STATUS_CHECK_INTERVAL)
+            qualys_poller.wait("qualys.report", lambda: not qualys.get_report_status(report_id))
             logging.info("Qualys: downloading report")
             qualys.download_report(report_id)
         finally:
@@ -198,7 +194,8 @@ class DustyWrapper(object):
                     logging.info("Qualys: deleting webapp")
                     qualys.delete_asset("webapp", project_id)
         logging.info("Qualys: processing results")
-        result = QualysWebAppParser("/tmp/qualys.xml", "qualys_was").items
+        result = parse("qualys", "/tmp/qualys.xml", "qualys_was",
+                       max_payload_size=int(config.get("max_payload_size", c.QUALYS_MAX_PAYLOAD_SIZE))).items
         return tool_name, result
 
     @staticmethod
@@ -211,224 +208,229 @@ class DustyWrapper(object):
     def aemhacker(config):
         tool_name = "AEM_Hacker"
         aem_hacker_output = execute(f'aem-wrapper.sh -u {config.get("protocol")}://{config.get("host")}:{config.get("port")} --host {config.get("scanner_host", "127.0.0.1")} --port {config.get("scanner_port", "4444")}')[0].decode('utf-8')
-        result = AemOutputParser(aem_hacker_output).items
+        result = parse("aemhacker", aem_hacker_output).items
         return tool_name, result
 
     @staticmethod
     def zap(config):
+        """ Scans target of the suite, or each URL of 'targets': back-to-back scans reuse daemons of the pool,
+            as many targets are scanned at once as the pool has daemons """
+        tool_name = "ZAP"
+        targets = DustyWrapper.zap_targets(config)
+        if len(targets) == 1:
+            return tool_name, DustyWrapper.zap_scan(targets[0])
+        results = list()
+        failed = list()
+        with ThreadPoolExecutor(max_workers=min(len(targets), get_zap_pool(config).capacity)) as executor:
+            futures = [(item, executor.submit(DustyWrapper.zap_scan, item)) for item in targets]
+            for item, future in futures:
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    logging.error("ZAP scan of %s failed: %s", item["host"], str(e))
+                    failed.append(e)
+        if len(failed) == len(targets):
+            raise failed[0]
+        return tool_name, results
+
+    @staticmethod
+    def zap_targets(config):
+        """ Returns scan configs: one per URL in 'targets' (list or comma-separated), suite target otherwise """
+        targets = config.get("targets", None)
+        if isinstance(targets, str):
+            targets = [item.strip() for item in targets.split(",") if item.strip()]
+        if not targets:
+            return [config]
+        configs = list()
+        for target in targets:
+            url = urllib.parse.urlparse(target)
+            port = url.port if url.port else (443 if url.scheme == "https" else 80)
+            configs.append(dict(config, protocol=url.scheme, host=url.hostname, port=port))
+        return configs
+
+    @staticmethod
+    def zap_scan(config):
         # Nested functions
-        def _wait_for_completion(condition, status, message, interval=10):
-            """ Watch progress """
-            current_status = status()
-            logging.info(message, current_status)
-            while condition():
-                sleep(interval)
-                next_status = status()
-                if next_status != current_status:
-                    logging.info(message, next_status)
-                current_status = next_status
+        def _zap_alerts(zap_api, page_size):
+            """ Yield alert instances page by page """
+            start = 0
+            while True:
+                page = zap_api.core.alerts(start=start, count=page_size)
+                yield from page
+                if len(page) < page_size:
+                    break
+                start += page_size
         # ZAP wrapper
         tool_name = "ZAP"
         results = list()
-        # Start ZAP daemon in background (no need for supervisord)
-        logging.info("Starting ZAP daemon")
-        zap_daemon = subprocess.Popen([
-            "/usr/bin/java", "-Xmx499m",
-            "-jar", "/opt/zap/zap.jar",
-            "-daemon", "-port", "8091", "-host", "0.0.0.0",
-            "-config", "api.key=dusty",
-            "-config", "api.addrs.addr.regex=true",
-            "-config", "api.addrs.addr.name=.*",
-            "-config", "ajaxSpider.browserId=htmlunit"
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        zap_api = ZAPv2(
-            apikey="dusty",
-            proxies={
-                "http": "http://127.0.0.1:8091",
-                "https": "http://127.0.0.1:8091"
-            }
-        )
-        # Wait for zap to start
-        zap_started = False
-        for _ in range(600):
-            try:
-                logging.info("Started ZAP %s", zap_api.core.version)
-                zap_started = True
-                break
-            except IOError:
-                sleep(1)
-        if not zap_started:
-            logging.error("ZAP failed to start")
-            zap_daemon.kill()
-            zap_daemon.wait()
-            return tool_name, results
-        # Format target URL
-        proto = config.get("protocol")
-        host = config.get("host")
-        port = config.get("port")
-        target = f"{proto}://{host}"
-        if (proto == "http" and int(port) != 80) or \
-                (proto == "https" and int(port) != 443):
-            target = f"{target}:{port}"
-        logging.info("Scanning target %s", target)
-        # Setup context
-        logging.info("Preparing context")
-        zap_context_name = "dusty"
-        zap_context = zap_api.context.new_context(zap_context_name)
-        # Setup context inclusions and exclusions
-        zap_api.context.include_in_context(zap_context_name, f".*{re.escape(host)}.*")
-        for include_regex in config.get("include", list()):
-            zap_api.context.include_in_context(zap_context_name, include_regex)
-        for exclude_regex in config.get("exclude", list()):
-            zap_api.context.exclude_from_context(zap_context_name, exclude_regex)
-        if config.get("auth_script", None):
-            # Load our authentication script
-            zap_api.script.load(
-                scriptname="zap-selenium-login.js",
-                scripttype="authentication",
-                scriptengine="Oracle Nashorn",
-                filename=pkg_resources.resource_filename(
-                    "dusty", "templates/zap-selenium-login.js"
-                ),
-                scriptdescription="Login via selenium script"
-            )
-            # Enable use of laoded script with supplied selenium-like script
-            zap_api.authentication.set_authentication_method(
-                zap_context,
-                "scriptBasedAuthentication",
-                urllib.parse.urlencode({
-                    "scriptName": "zap-selenium-login.js",
-                    "Script": base64.b64encode(
-                        json.dumps(
-                            config.get("auth_script")
-                        ).encode("utf-8")
-                    ).decode("utf-8")
-                })
-            )
-            # Add user to context
-            zap_user = zap_api.users.new_user(zap_context, "dusty_user")
-            zap_api.users.set_authentication_credentials(
-                zap_context,
-                zap_user,
-                urllib.parse.urlencode({
-                    "Username": config.get("auth_login", ""),
-                    "Password": config.get("auth_password", ""),
-                    "type": "UsernamePasswordAuthenticationCredentials"
-                })
-            )
-            # Enable added user
-            zap_api.users.set_user_enabled(zap_context, zap_user, True)
-            # Setup auth indicators
-            if config.get("logged_in_indicator", None):
-                zap_api.authentication.set_logged_in_indicator(
-                    zap_context, config.get("logged_in_indicator")
+        # Take ZAP daemon from the pool (started on first use, reused by next scans)
+        try:
+            zap_pool = get_zap_pool(config)
+            zap_daemon = zap_pool.acquire()
+        except RuntimeError as e:
+            logging.error(str(e))
+            return results
+        scan_policy_name = None
+        try:
+            zap_daemon.new_session()
+            zap_api = zap_daemon.api
+            zap_poller = AdaptivePoller()
+            # Format target URL
+            proto = config.get("protocol")
+            host = config.get("host")
+            port = config.get("port")
+            target = f"{proto}://{host}"
+            if (proto == "http" and int(port) != 80) or \
+                    (proto == "https" and int(port) != 443):
+                target = f"{target}:{port}"
+            logging.info("Scanning target %s", target)
+            # Setup context
+            logging.info("Preparing context")
+            # Daemon is shared by scans: names are unique per scan
+            zap_context_name = f"dusty_{id_generator(8)}"
+            zap_context = zap_api.context.new_context(zap_context_name)
+            # Setup context inclusions and exclusions
+            zap_api.context.include_in_context(zap_context_name, f".*{re.escape(host)}.*")
+            for include_regex in config.get("include", list()):
+                zap_api.context.include_in_context(zap_context_name, include_regex)
+            for exclude_regex in config.get("exclude", list()):
+                zap_api.context.exclude_from_context(zap_context_name, exclude_regex)
+            if config.get("auth_script", None):
+                # Load our authentication script (once per daemon)
+                if "zap-selenium-login.js" not in [item.get("name") for item in zap_api.script.list_scripts]:
+                    zap_api.script.load(
+                        scriptname="zap-selenium-login.js",
+                        scripttype="authentication",
+                        scriptengine="Oracle Nashorn",
+                        filename=pkg_resources.resource_filename(
+                            "dusty", "templates/zap-selenium-login.js"
+                        ),
+                        scriptdescription="Login via selenium script"
+                    )
+                # Enable use of laoded script with supplied selenium-like script
+                zap_api.authentication.set_authentication_method(
+                    zap_context,
+                    "scriptBasedAuthentication",
+                    urllib.parse.urlencode({
+                        "scriptName": "zap-selenium-login.js",
+                        "Script": base64.b64encode(
+                            json.dumps(
+                                config.get("auth_script")
+                            ).encode("utf-8")
+                        ).decode("utf-8")
+                    })
+                )
+                # Add user to context
+                zap_user = zap_api.users.new_user(zap_context, "dusty_user")
+                zap_api.users.set_authentication_credentials(
+                    zap_context,
+                    zap_user,
+                    urllib.parse.urlencode({
+                        "Username": config.get("auth_login", ""),
+                        "Password": config.get("auth_password", ""),
+                        "type": "UsernamePasswordAuthenticationCredentials"
+                    })
                 )
-            if config.get("logged_out_indicator", None):
-                zap_api.authentication.set_logged_out_indicator(
-                    zap_context, config.get("logged_out_indicator")
+                # Enable added user
+                zap_api.users.set_user_enabled(zap_context, zap_user, True)
+                # Setup auth indicators
+                if config.get("logged_in_indicator", None):
+                    zap_api.authentication.set_logged_in_indicator(
+                        zap_context, config.get("logged_in_indicator")
+                    )
+                if config.get("logged_out_indicator", None):
+                    zap_api.authentication.set_logged_out_indicator(
+                        zap_context, config.get("logged_out_indicator")
+                    )
+            # Setup scan policy (own copy per scan, policy changes would outlive the scan otherwise)
+            scan_policy_name = f"dusty_{id_generator(8)}"
+            scan_policies = [
+                item.strip() for item in config.get("scan_types", "all").split(",")
+            ]
+            zap_daemon.apply_scan_policy(scan_policy_name, scan_policies)
+            # Spider
+            logging.info("Spidering target: %s", target)
+            if config.get("auth_script", None):
+                scan_id = zap_api.spider.scan_as_user(
+                    zap_context, zap_user, target, recurse=True, subtreeonly=True
                 )
-        # Setup scan policy
-        scan_policy_name = "Default Policy"
-        scan_policies = [
-            item.strip() for item in config.get("scan_types", "all").split(",")
-        ]
-        # Disable globally blacklisted rules
-        for item in c.ZAP_BLACKLISTED_RULES:
-            zap_api.ascan.set_scanner_alert_threshold(
-                id=item,
-                alertthreshold="OFF",
-                scanpolicyname=scan_policy_name
+            else:
+                scan_id = zap_api.spider.scan(target)
+            zap_poller.wait(
+                "zap.spider",
+                lambda: int(zap_api.spider.status(scan_id)) < 100,
+                lambda: int(zap_api.spider.status(scan_id)),
+                "Spidering progress: %d%%",
+                target=100
             )
-            zap_api.pscan.set_scanner_alert_threshold(
-                id=item,
-                alertthreshold="OFF"
+            # Wait for passive scan
+            zap_poller.wait(
+                "zap.passive_scan",
+                lambda: int(zap_api.pscan.records_to_scan) > 0,
+                lambda: int(zap_api.pscan.records_to_scan),
+                "Passive scan queue: %d items",
+                target=0
             )
-        if "all" not in scan_policies:
-            # Disable all scanners first
-            for item in zap_api.ascan.scanners(scan_policy_name):
-                zap_api.ascan.set_scanner_alert_threshold(
-                    id=item["id"],
-                    alertthreshold="OFF",
-                    scanpolicyname=scan_policy_name
+            # Ajax Spider
+            logging.info("Ajax spidering target: %s", target)
+            if config.get("auth_script", None):
+                scan_id = zap_api.ajaxSpider.scan_as_user(
+                    zap_context_name, "dusty_user", target, subtreeonly=True
                 )
-            # Enable scanners from suite
-            for policy in scan_policies:
-                for item in c.ZAP_SCAN_POCILICES.get(policy, []):
-                    zap_api.ascan.set_scanner_alert_threshold(
-                        id=item,
-                        alertthreshold="DEFAULT",
-                        scanpolicyname=scan_policy_name)
-        # Spider
-        logging.info("Spidering target: %s", target)
-        if config.get("auth_script", None):
-            scan_id = zap_api.spider.scan_as_user(
-                zap_context, zap_user, target, recurse=True, subtreeonly=True
+            else:
+                scan_id = zap_api.ajaxSpider.scan(target)
+            zap_poller.wait(
+                "zap.ajax_spider",
+                lambda: zap_api.ajaxSpider.status == 'running',
+                lambda: int(zap_api.ajaxSpider.number_of_results),
+                "Ajax spider found: %d URLs"
             )
-        else:
-            scan_id = zap_api.spider.scan(target)
-        _wait_for_completion(
-            lambda: int(zap_api.spider.status(scan_id)) < 100,
-            lambda: int(zap_api.spider.status(scan_id)),
-            "Spidering progress: %d%%"
-        )
-        # Wait for passive scan
-        _wait_for_completion(
-            lambda: int(zap_api.pscan.records_to_scan) > 0,
-            lambda: int(zap_api.pscan.records_to_scan),
-            "Passive scan queue: %d items"
-        )
-        # Ajax Spider
-        logging.info("Ajax spidering target: %s", target)
-        if config.get("auth_script", None):
-            scan_id = zap_api.ajaxSpider.scan_as_user(
-                zap_context_name, "dusty_user", target, subtreeonly=True
+            # Wait for passive scan
+            zap_poller.wait(
+                "zap.passive_scan",
+                lambda: int(zap_api.pscan.records_to_scan) > 0,
+                lambda: int(zap_api.pscan.records_to_scan),
+                "Passive scan queue: %d items",
+                target=0
             )
-        else:
-            scan_id = zap_api.ajaxSpider.scan(target)
-        _wait_for_completion(
-            lambda: zap_api.ajaxSpider.status == 'running',
-            lambda: int(zap_api.ajaxSpider.number_of_results),
-            "Ajax spider found: %d URLs"
-        )
-        # Wait for passive scan
-        _wait_for_completion(
-            lambda: int(zap_api.pscan.records_to_scan) > 0,
-            lambda: int(zap_api.pscan.records_to_scan),
-            "Passive scan queue: %d items"
-        )
-        # Active scan
-        logging.info("Active scan against target %s", target)
-        if config.get("auth_script", None):
-            scan_id = zap_api.ascan.scan_as_user(
-                target, zap_context, zap_user, recurse=True,
-                scanpolicyname=scan_policy_name
+            # Active scan
+            logging.info("Active scan against target %s", target)
+            if config.get("auth_script", None):
+                scan_id = zap_api.ascan.scan_as_user(
+                    target, zap_context, zap_user, recurse=True,
+                    scanpolicyname=scan_policy_name
+                )
+            else:
+                scan_id = zap_api.ascan.scan(
+                    target,
+                    scanpolicyname=scan_policy_name
+                )
+            zap_poller.wait(
+                "zap.active_scan",
+                lambda: int(zap_api.ascan.status(scan_id)) < 100,
+                lambda: int(zap_api.ascan.status(scan_id)),
+                "Active scan progress: %d%%",
+                target=100
             )
-        else:
-            scan_id = zap_api.ascan.scan(
-                target,
-                scanpolicyname=scan_policy_name
+            # Wait for passive scan
+            zap_poller.wait(
+                "zap.passive_scan",
+                lambda: int(zap_api.pscan.records_to_scan) > 0,
+                lambda: int(zap_api.pscan.records_to_scan),
+                "Passive scan queue: %d items",
+                target=0
             )
-        _wait_for_completion(
-            lambda: int(zap_api.ascan.status(scan_id)) < 100,
-            lambda: int(zap_api.ascan.status(scan_id)),
-            "Active scan progress: %d%%"
-        )
-        # Wait for passive scan
-        _wait_for_completion(
-            lambda: int(zap_api.pscan.records_to_scan) > 0,
-            lambda: int(zap_api.pscan.records_to_scan),
-            "Passive scan queue: %d items"
-        )
-        # Get report
-        logging.info("Scan finished. Processing results")
-        zap_report = zap_api.core.jsonreport()
-        if os.environ.get("debug", False):
-            with open("/tmp/zap.json", "wb") as report_file:
-                report_file.write(zap_report.encode("utf-8"))
-        # Stop zap
-        zap_daemon.kill()
-        zap_daemon.wait()
-        # Parse JSON
-        results.extend(ZapJsonParser(zap_report, tool_name).items)
+            # Get report
+            logging.info("Scan finished. Processing results")
+            if os.environ.get("debug", False):
+                with open("/tmp/zap.json", "wb") as report_file:
+                    report_file.write(zap_api.core.jsonreport().encode("utf-8"))
+            # Page through alerts instead of holding full report in memory
+            page_size = int(config.get("alerts_page_size", c.ZAP_ALERTS_PAGE_SIZE))
+            results.extend(parse("zap", _zap_alerts(zap_api, page_size), tool_name).items)
+        finally:
+            # Daemon goes back to the pool: nothing of this scan may be left running on it
+            zap_daemon.end_scan(scan_policy_name)
+            zap_pool.release(zap_daemon)
         pkg_resources.cleanup_resources()
-        return tool_name, results
+        return results
@@ -0,0 +1,74 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Python-based scanners (bandit, safety) called as libraries: their native results are
+    handed over to parsers directly, without json report written to disk and read back.
+    Libraries and parsers are imported on use: module is imported by sastyWrapper for every run
+"""
+
+import os
+import logging
+import importlib.util
+from datetime import datetime
+
+from dusty import constants as c
+
+
+def bandit_available():
+    return importlib.util.find_spec("bandit") is not None
+
+
+def safety_available():
+    """ check() signature and results of safety 1.x (json report format used by SafetyScanParser) """
+    if importlib.util.find_spec("safety") is None:
+        return False
+    import safety
+    return str(getattr(safety, "__version__", "")).startswith("1.")
+
+
+class BanditInProcess(object):
+    """ Runs bandit over code_path (or given files) and parses its issues """
+
+    def __init__(self, code_path, test, targets=None):
+        from bandit.core import config as bandit_config, manager as bandit_manager
+        from dusty.data_model.bandit.parser import BanditParser
+        manager = bandit_manager.BanditManager(bandit_config.BanditConfig(), "file", quiet=True)
+        manager.discover_files(targets if targets else [code_path], recursive=True,
+                               excluded_paths=",".join(c.BANDIT_EXCLUDED_DIRS))
+        manager.run_tests()
+        logging.debug("Bandit scanned %d file(s)", len(manager.files_list))
+        data = {
+            "generated_at": datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "results": [issue.as_dict() for issue in manager.get_issue_list()],
+            "errors": [{"filename": filename, "reason": reason} for filename, reason in manager.skipped]
+        }
+        self.items = BanditParser(None, test, data=data).items
+
+
+class SafetyInProcess(object):
+    """ Checks packages from requirement files (relative to code_path) and parses found vulnerabilities """
+
+    def __init__(self, code_path, test, files, advisories=None):
+        from safety import safety as safety_api
+        from safety.util import read_requirements
+        from dusty.data_model.safety.parser import SafetyScanParser
+        packages = list()
+        for file_path in files:
+            with open(os.path.join(code_path, file_path)) as f:
+                packages.extend(read_requirements(f, resolve=True))
+        vulnerabilities = safety_api.check(packages=packages, key=os.environ.get("SAFETY_API_KEY", ""),
+                                           db_mirror="", cached=True, ignore_ids=[], proxy={})
+        data = [[item.name, item.spec, item.version, item.advisory, item.vuln_id] for item in vulnerabilities]
+        self.items = SafetyScanParser(None, test, data=data, advisories=advisories).items
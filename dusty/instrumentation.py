@@ -0,0 +1,172 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import json
+import pstats
+import cProfile
+import logging
+import resource
+import threading
+import tracemalloc
+from time import time
+from contextlib import contextmanager
+
+from dusty import constants as c
+from dusty.data_model.registry import get_parser
+
+
+def peak_rss():
+    """ Returns peak resident set size (KB) of dusty itself and of the finished tool subprocesses """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, \
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+class RunProfile(object):
+    """ Collects per-stage timings, counters and peak RSS samples of the run """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time()
+        self.stages = dict()
+        self.counters = dict()
+        self.hooks = set()
+        self.hooks_path = None
+        self.hook_lock = threading.Lock()
+        self.hook_owner = None
+
+    def enable_hooks(self, stages, path=None):
+        """ Enables cProfile and tracemalloc around the named stages (parser class names,
+            common_post_processing, HTMLReport, report_to_jira, etc) """
+        if isinstance(stages, str):
+            stages = stages.split(",")
+        self.hooks = {item.strip() for item in stages if item.strip()}
+        self.hooks_path = path if path else os.environ.get("profile_path", c.PROFILE_HOOKS_PATH)
+        logging.info("Profiling enabled for stages: %s", ", ".join(sorted(self.hooks)))
+
+    @contextmanager
+    def stage(self, name):
+        # Only one hook at a time: profilers and tracemalloc are process-wide
+        hooked = name in self.hooks and self.hook_owner != threading.get_ident() \
+            and self.hook_lock.acquire(blocking=False)
+        if hooked:
+            self.hook_owner = threading.get_ident()
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start(c.PROFILE_HOOKS_TRACEBACK_DEPTH)
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif name in self.hooks and self.hook_owner != threading.get_ident():
+            logging.warning("Another stage is being profiled, skipping profiling of %s", name)
+        stage_start = time()
+        try:
+            yield
+        finally:
+            duration = time() - stage_start
+            if hooked:
+                profiler.disable()
+                snapshot = tracemalloc.take_snapshot()
+                if not tracing:
+                    tracemalloc.stop()
+                try:
+                    self.dump_hook(name, profiler, snapshot)
+                except Exception as e:
+                    # Stage result (or its own exception) matters more than its profile
+                    logging.warning("Failed to save profile of %s: %s", name, str(e))
+                finally:
+                    self.hook_owner = None
+                    self.hook_lock.release()
+            self.record(name, duration)
+
+    def dump_hook(self, name, profiler, snapshot):
+        with self.lock:
+            index = self.stages.get(name, {}).get("calls", 0) + 1
+        os.makedirs(self.hooks_path, exist_ok=True)
+        base_path = os.path.join(self.hooks_path, f"{name}-{index}")
+        profiler.dump_stats(f"{base_path}.prof")
+        snapshot.dump(f"{base_path}.tracemalloc")
+        with open(f"{base_path}.txt", "w") as f:
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(c.PROFILE_HOOKS_TOP)
+            f.write("Top allocations:\n")
+            for stat in snapshot.statistics("lineno")[:c.PROFILE_HOOKS_TOP]:
+                f.write(f"{stat}\n")
+        logging.info("Profile of %s saved to %s.prof", name, base_path)
+
+    def record(self, name, duration):
+        rss, children_rss = peak_rss()
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = {"calls": 0, "duration": 0.0, "max_rss_kb": 0, "max_children_rss_kb": 0}
+            stage = self.stages[name]
+            stage["calls"] += 1
+            stage["duration"] += duration
+            stage["max_rss_kb"] = max(stage["max_rss_kb"], rss)
+            stage["max_children_rss_kb"] = max(stage["max_children_rss_kb"], children_rss)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def durations(self, prefix=""):
+        with self.lock:
+            return {name[len(prefix):]: stage["duration"] for name, stage in self.stages.items()
+                    if name.startswith(prefix)}
+
+    def summary(self):
+        """ Returns stages as list of dicts sorted by duration (longest first) """
+        with self.lock:
+            stages = [dict(stage, name=name) for name, stage in self.stages.items()]
+        return sorted(stages, key=lambda item: item["duration"], reverse=True)
+
+    def to_dict(self):
+        rss, children_rss = peak_rss()
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            "run_id": os.environ.get(c.RUN_ID_ENV_KEY),
+            "duration": time() - self.start_time,
+            "max_rss_kb": rss,
+            "max_children_rss_kb": children_rss,
+            "stages": self.summary(),
+            "counters": counters
+        }
+
+    def dump(self, path=None):
+        path = path if path else os.environ.get("run_profile_path", c.RUN_PROFILE_PATH)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        logging.info("Run profile saved to %s", path)
+        return path
+
+    def log_summary(self):
+        for stage in self.summary():
+            logging.info("Stage %s: %d call(s), %.2f s, peak RSS %d KB (tools %d KB)", stage["name"],
+                         stage["calls"], stage["duration"], stage["max_rss_kb"], stage["max_children_rss_kb"])
+        for name, value in sorted(self.counters.items()):
+            logging.info("Counter %s: %d", name, value)
+
+
+profile = RunProfile()
+
+
+def parse(parser_class, *args, **kwargs):
+    """ Runs parser (class or registered tool name) under its own stage (named after parser class)
+        and counts produced findings """
+    if isinstance(parser_class, str):
+        parser_class = get_parser(parser_class)
+    with profile.stage(parser_class.__name__):
+        parser = parser_class(*args, **kwargs)
+    profile.count(f"findings.{parser_class.__name__}", len(parser.items))
+    return parser
@@ -0,0 +1,70 @@
+#   Copyright 2019 getcarrier.io
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import logging
+import threading
+import multiprocessing
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dusty.instrumentation import parse, profile
+from dusty.data_model.registry import get_parser
+from dusty.data_model.canonical_model import dump_finding, load_finding
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def get_workers():
+    """ Parser processes count: parse_workers env (0 - parse in tool threads), all cores by default """
+    workers = os.environ.get("parse_workers")
+    return int(workers) if workers not in [None, ""] else os.cpu_count() or 1
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            # Tool threads are running at this point, so workers are not forked from this process
+            pool = ProcessPoolExecutor(max_workers=get_workers(),
+                                       mp_context=multiprocessing.get_context("forkserver"))
+        return pool
+
+
+def parse_worker(parser_name, args, kwargs):
+    parser_class = get_parser(parser_name)
+    start_time = time()
+    items = parser_class(*args, **kwargs).items
+    return parser_class.__name__, time() - start_time, [dump_finding(item) for item in items]
+
+
+def parse_in_pool(parser_name, *args, **kwargs):
+    """ Runs registered parser in worker process and returns its findings
+
+    Parsing is CPU bound, so parsers running in tool threads would just take turns on GIL.
+    Findings come back serialized (see dump_finding). Arguments have to be picklable.
+    """
+    # Profiling hooks only see the current process
+    if get_workers() == 0 or get_parser(parser_name).__name__ in profile.hooks:
+        return list(parse(parser_name, *args, **kwargs).items)
+    try:
+        class_name, duration, items = get_pool().submit(parse_worker, parser_name, args, kwargs).result()
+    except BrokenProcessPool:
+        logging.warning("Parser process pool is broken, parsing %s in-process", parser_name)
+        return list(parse(parser_name, *args, **kwargs).items)
+    profile.record(class_name, duration)
+    profile.count(f"findings.{class_name}", len(items))
+    return [load_finding(item) for item in items]
@@ -23,6 +23,7 @@ from traceback import format_exc
 from time import time
 
 from dusty import constants
+from dusty.instrumentation import profile
 from dusty.drivers.rp.report_portal_writer import ReportPortalDataWriter
 from dusty.drivers.jira import JiraWrapper
 from dusty.drivers.emails import EmailWrapper
@@ -31,6 +32,7 @@ from dusty.sastyWrapper import SastyWrapper
 from dusty.drivers.html import HTMLReport
 from dusty.drivers.xunit import XUnitReport
 from dusty.drivers.redis_file import RedisFile
+from dusty.drivers.redis_findings import RedisFindings
 from dusty.drivers.influx import InfluxReport
 from dusty.utils import send_emails, common_post_processing, prepare_jira_mapping
 
@@ -40,6 +42,8 @@ requests.packages.urllib3.disable_warnings()
 def arg_parse(suites):
     parser = argparse.ArgumentParser(description='Executor for DAST scanner')
     parser.add_argument('-s', '--suite', type=str, help="specify test suite from (%s)" % ','.join(suites))
+    parser.add_argument('--profile', type=str, help="comma-separated stages to run under cProfile and tracemalloc "
+                                                    "(e.g. NmapXMLParser,common_post_processing,HTMLReport)")
     args, unknown = parser.parse_known_args()
 
     return args
@@ -168,6 +172,9 @@ def config_from_yaml():
     suites = list(config.keys())
     args = arg_parse(suites)
     test_name = args.suite
+    profile_stages = args.profile if args.profile else os.environ.get("profile_stages")
+    if profile_stages:
+        profile.enable_hooks(profile_stages)
     execution_config = config[test_name]
     generate_html = execution_config.get("html_report", False)
     generate_junit = execution_config.get("junit_report", False)
@@ -211,12 +218,14 @@ def config_from_yaml():
                           min_priority=min_priority,
                           rp_config=rp_config,
                           influx=execution_config.get("influx", None),
+                          redis_findings=execution_config.get("redis_findings", False),
                           generate_html=generate_html,
                           generate_junit=generate_junit,
                           html_report=html_report,
                           ptai_report_name=ptai_report_name,
                           code_path=code_path,
                           code_source=code_source,
+                          code_exclusions=execution_config.get('code_exclusions', []),
                           path_to_false_positive=path_to_false_positive,
                           email_service=email_service,
                           email_attachments=email_attachments,
@@ -249,30 +258,52 @@ def process_results(default_config, start_time, global_results=None,
     created_jira_tickets = []
     attachments = []
     if default_config.get('rp_data_writer', None):
-        default_config['rp_data_writer'].finish_test()
+        with profile.stage("ReportPortal"):
+            default_config['rp_data_writer'].finish_test()
     default_config['execution_time'] = int(time() - start_time)
     if other_results is None:
         other_results = []
+    if default_config.get('redis_findings', None) and os.environ.get("redis_connection"):
+        # Shard of distributed run: raw findings are reported by aggregate command
+        with profile.stage("RedisFindings"):
+            RedisFindings(os.environ.get("redis_connection")).store(global_results, errors=global_errors)
+        dump_profile()
+        return
     if default_config.get('generate_html', None):
-        html_report_file = HTMLReport(sorted(global_results, key=lambda item: item.severity),
-                                      default_config,
-                                      other_findings=sorted(other_results, key=lambda item: item.severity)).report_name
+        with profile.stage("HTMLReport"):
+            html_report_file = HTMLReport(sorted(global_results, key=lambda item: item.severity),
+                                          default_config,
+                                          other_findings=sorted(other_results,
+                                                                key=lambda item: item.severity)).report_name
     if default_config.get('generate_junit', None):
-        xml_report_file = XUnitReport(global_results, default_config).report_name
+        with profile.stage("XUnitReport"):
+            xml_report_file = XUnitReport(global_results, default_config).report_name
     if os.environ.get("redis_connection"):
-        RedisFile(os.environ.get("redis_connection"), html_report_file, xml_report_file)
+        with profile.stage("RedisFile"):
+            RedisFile(os.environ.get("redis_connection"), html_report_file, xml_report_file)
     if default_config.get('jira_service', None):
         created_jira_tickets = default_config['jira_service'].get_created_tickets()
     if default_config.get('influx', None):
-        InfluxReport(global_results, other_results, created_jira_tickets, default_config)
+        with profile.stage("InfluxReport"):
+            InfluxReport(global_results, other_results, created_jira_tickets, default_config)
     if default_config.get('email_service', None):
         if html_report_file:
             attachments.append(html_report_file)
         for item in default_config.get('email_attachments', None):
             attachments.append('/attachments/' + item.strip())
         # TODO: Rework sending of emails to be not tiedly coupled with Jira
-        send_emails(default_config['email_service'], True, jira_tickets_info=created_jira_tickets,
-                    attachments=attachments, errors=global_errors)
+        with profile.stage("emails"):
+            send_emails(default_config['email_service'], True, jira_tickets_info=created_jira_tickets,
+                        attachments=attachments, errors=global_errors)
+    dump_profile()
+
+
+def dump_profile():
+    profile.log_summary()
+    try:
+        profile.dump()
+    except OSError:
+        logging.warning("Failed to save run profile")
 
 
 def main():
@@ -307,12 +338,16 @@ def main():
         results = []
         other_results = []
         config = test_configs[key]
+        attr_name = key
         if key in constants.SASTY_SCANNERS_CONFIG_KEYS:
             if key == "scan_opts":
                 continue
             attr_name = config[key] if 'language' in key else key
+            if 'language' in key and (isinstance(attr_name, list) or attr_name == 'auto'):
+                attr_name = 'polyglot'
             try:
-                results = getattr(SastyWrapper, attr_name)(config)
+                with profile.stage(f"tool.{attr_name}"):
+                    results = getattr(SastyWrapper, attr_name)(config)
             except BaseException as e:
                 logging.error("Exception during %s Scanning" % attr_name)
                 global_errors[attr_name] = str(e)
@@ -320,9 +355,11 @@ def main():
                     logging.error(format_exc())
         else:
             try:
-                tool_name, result = getattr(DustyWrapper, key)(config)
-                results, other_results = common_post_processing(config, result, tool_name, need_other_results=True,
-                                                                global_errors=global_errors)
+                with profile.stage(f"tool.{key}"):
+                    tool_name, result = getattr(DustyWrapper, key)(config)
+                    results, other_results = common_post_processing(config, result, tool_name,
+                                                                    need_other_results=True,
+                                                                    global_errors=global_errors)
             except BaseException as e:
                 logging.error("Exception during %s Scanning" % key)
                 global_errors[key] = str(e)
@@ -333,7 +370,8 @@ def main():
             default_config['jira_service'].created_jira_tickets.extend(
                 config.get('jira_service').get_created_tickets()
             )
-        if default_config.get('generate_html', None) or default_config.get('generate_junit', None):
+        if default_config.get('generate_html', None) or default_config.get('generate_junit', None) \
+                or default_config.get('redis_findings', None):
             global_results.extend(results)
             global_other_results.extend(other_results)
     process_results(default_config, start_time, global_results, other_results=global_other_results,
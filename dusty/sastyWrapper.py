@@ -12,18 +12,23 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 from dusty import constants
+from dusty.instrumentation import profile
+from dusty.parsing import parse_in_pool
 from dusty.utils import execute, common_post_processing, ptai_post_processing, \
-    run_in_parallel, get_dependencies
-from dusty.data_model.bandit.parser import BanditParser
-from dusty.data_model.brakeman.parser import BrakemanParser
-from dusty.data_model.spotbugs.parser import SpotbugsParser
-from dusty.data_model.nodejsscan.parser import NodeJsScanParser
-from dusty.data_model.npm.parser import NpmScanParser
-from dusty.data_model.retire.parser import RetireScanParser
-from dusty.data_model.ptai.parser import PTAIScanParser
-from dusty.data_model.safety.parser import SafetyScanParser
-from dusty.data_model.dependency_check.parser import DependencyCheckParser
+    run_in_parallel, get_dependencies, balance_by_size, split_arguments
+from dusty.drivers.nvd import NvdEnricher
+from dusty import inprocess
+from dusty.code_index import get_code_index
+from dusty.data_model.registry import get_parser
+from dusty.data_model.canonical_model import dump_finding, load_finding
 
 
 class SastyWrapper(object):
@@ -35,6 +40,11 @@ class SastyWrapper(object):
     def get_code_source(config):
         return config.get("code_source", SastyWrapper.get_code_path(config))
 
+    @staticmethod
+    def get_code_index(config):
+        """ Index of code_path shared by all tools of the run """
+        return get_code_index(SastyWrapper.get_code_path(config), config.get("code_exclusions"))
+
     @staticmethod
     def execute_parallel(scan_fns, config, language):
         all_results = []
@@ -55,26 +65,166 @@ class SastyWrapper(object):
             return result
 
     @staticmethod
-    def python(config):
+    def polyglot(config):
+        """ Scans all languages of the repo ('language: auto') or listed ones at once,
+            with single post-processing of merged findings """
+        languages = config.get('language')
+        if not isinstance(languages, list):
+            languages = SastyWrapper.get_code_index(config).languages()
+            logging.info("Detected languages: %s", ", ".join(languages) if languages else "none")
+        scan_fns = list()
+        for language in languages:
+            scan_fns.extend(getattr(SastyWrapper, f"{language}_scans")(config))
+        return SastyWrapper.execute_parallel(scan_fns, config, "+".join(languages))
+
+    @staticmethod
+    def composition_options(config, composition_analysis):
+        """ 'monorepo: true' audits every manifest found in code_path, 'workers' limits concurrent audits,
+            'advisories' is path to local advisory store ('advisories_only: true' replaces safety with it) """
+        options = composition_analysis if isinstance(composition_analysis, dict) else {}
+        config['monorepo'] = options.get('monorepo', False)
+        config['composition_workers'] = int(options.get('workers', os.cpu_count() or 1))
+        config['advisories'] = options.get('advisories', os.environ.get('advisories_db'))
+        config['advisories_only'] = options.get('advisories_only', False)
+
+    @staticmethod
+    def unique_manifest_sets(config, patterns, companions=()):
+        """ Groups manifests (with companion lock files from the same dir) by content hash:
+            returns list of lists of manifest paths having identical dependency sets """
+        index = SastyWrapper.get_code_index(config)
+        existing = set(index.get_manifests(*companions)) if companions else set()
+        sets = dict()
+        for manifest in index.get_manifests(*patterns):
+            directory = os.path.dirname(manifest)
+            digest = hashlib.sha256()
+            for path in [manifest] + [os.path.join(directory, item) for item in companions]:
+                if path == manifest or path in existing:
+                    digest.update(f"{os.path.basename(path)}:{index.file_hash(path)}\n".encode("utf-8"))
+            sets.setdefault(digest.hexdigest(), list()).append(manifest)
+        return list(sets.values())
+
+    @staticmethod
+    def audit_manifests(config, manifest_sets, audit_fn):
+        """ Runs audit_fn(config, number, manifest) concurrently for one manifest of each unique set,
+            findings are attributed to every manifest of the set """
+        logging.info("Auditing %d unique dependency set(s) of %d manifest(s)",
+                     len(manifest_sets), sum(len(manifests) for manifests in manifest_sets))
+        with ThreadPoolExecutor(max_workers=max(config.get('composition_workers', 1), 1)) as executor:
+            futures = [(executor.submit(audit_fn, config, number, manifests[0]), manifests)
+                       for number, manifests in enumerate(manifest_sets)]
+        all_results = list()
+        for future, manifests in futures:
+            try:
+                all_results.extend(SastyWrapper.attribute_findings(future.result(), manifests))
+            except Exception as e:
+                logging.error("Composition analysis of %s failed: %s", manifests[0], str(e))
+        return all_results
+
+    @staticmethod
+    def attribute_findings(findings, manifests):
+        attributed = list()
+        for finding in findings:
+            data = dump_finding(finding) if len(manifests) > 1 else None
+            for number, manifest in enumerate(manifests):
+                item = finding if number == 0 else load_finding(data)
+                details = item.finding["static_finding_details"]
+                details["file_name"] = f"{manifest}: {details['file_name']}" if details["file_name"] else manifest
+                attributed.append(item)
+        return attributed
+
+    @staticmethod
+    def python_scans(config):
         scan_fns = [SastyWrapper.bandit]
         composition_analysis = config.get('composition_analysis', None)
         if composition_analysis:
-            scan_fns.append(SastyWrapper.safety)
+            SastyWrapper.composition_options(config, composition_analysis)
+            scan_fns.append(SastyWrapper.safety_monorepo if config['monorepo'] else SastyWrapper.safety)
             if isinstance(composition_analysis, dict):
                 config['files'] = composition_analysis.get('files', ['requirements.txt'])
-        return SastyWrapper.execute_parallel(scan_fns, config, 'python')
+        return scan_fns
+
+    @staticmethod
+    def python(config):
+        return SastyWrapper.execute_parallel(SastyWrapper.python_scans(config), config, 'python')
+
+    @staticmethod
+    def in_process(config):
+        """ Python-based tools are called as libraries if 'in_process: true' is set (or in_process env).
+            Off by default: library runs differ from CLI ones (bandit excludes BANDIT_EXCLUDED_DIRS,
+            safety 1.x only), CLI is used whenever installed library is not supported """
+        value = config.get('in_process', os.environ.get('in_process', False))
+        return value if isinstance(value, bool) else str(value).lower() in ['true', 'yes', '1']
 
     @staticmethod
     def bandit(config, results=None):
-        exec_cmd = "bandit -r {} --format json".format(SastyWrapper.get_code_path(config))
-        res = execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
-        with open("/tmp/bandit.json", "w") as f:
-            f.write(res[0].decode('utf-8', errors='ignore'))
-        result = BanditParser("/tmp/bandit.json", "pybandit").items
+        shards = config.get('bandit_shards', 1)
+        shards = (os.cpu_count() or 1) if shards == 'auto' else int(shards)
+        if shards > 1:
+            SastyWrapper.bandit_sharded(config, shards)
+        elif SastyWrapper.in_process(config) and inprocess.bandit_available():
+            targets = [path for path, _ in SastyWrapper.get_code_index(config).get_files('python')]
+            result = parse_in_pool("bandit_inprocess", SastyWrapper.get_code_path(config), "pybandit",
+                                   targets=targets) if targets else []
+            return SastyWrapper.extend_result(results, result)
+        elif config.get("code_exclusions") or SastyWrapper.get_code_index(config).generated:
+            # bandit -r does not know configured exclusions nor build output: files are passed from the index
+            SastyWrapper.bandit_sharded(config, 1)
+        else:
+            exec_cmd = "bandit -r {} --format json".format(SastyWrapper.get_code_path(config))
+            res = execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
+            with open(constants.BANDIT_REPORT, "w") as f:
+                f.write(res[0].decode('utf-8', errors='ignore'))
+        result = parse_in_pool("bandit", constants.BANDIT_REPORT, "pybandit")
         return SastyWrapper.extend_result(results, result)
 
+    @staticmethod
+    def bandit_sharded(config, shards):
+        """ Runs bandit processes over groups of files of similar total size and merges their reports """
+        code_path = SastyWrapper.get_code_path(config)
+        files = SastyWrapper.get_code_index(config).get_files('python')
+        groups = balance_by_size(files, shards)
+        logging.info("Running bandit in %d shard(s) over %d file(s)", len(groups), len(files))
+        merged = {"results": list(), "errors": list()}
+        # Shard reports live only as long as this run: nothing stale can be merged
+        with tempfile.TemporaryDirectory(prefix="bandit_") as report_dir:
+            reports = run_in_parallel([(SastyWrapper.bandit_shard, (index, group, code_path, report_dir))
+                                       for index, group in enumerate(groups)])
+            for report in sorted(reports):
+                try:
+                    with open(report) as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.error("Failed to read bandit shard report %s: %s", report, str(e))
+                    continue
+                merged.setdefault("generated_at", data.get("generated_at"))
+                merged["results"].extend(data.get("results", []))
+                merged["errors"].extend(data.get("errors", []))
+        with open(constants.BANDIT_REPORT, "w") as f:
+            json.dump(merged, f)
+
+    @staticmethod
+    def bandit_shard(args, results):
+        index, files, code_path, report_dir = args
+        # Shard is split further if its file list does not fit into one command line
+        for batch_index, batch in enumerate(split_arguments(files)):
+            report = os.path.join(report_dir, constants.BANDIT_SHARD_REPORT.format(index, batch_index))
+            execute(["bandit", "-f", "json", "-o", report] + batch, cwd=code_path)
+            if not os.path.isfile(report):
+                logging.error("Bandit shard %d (batch %d) wrote no report, %d file(s) not scanned",
+                              index, batch_index, len(batch))
+                continue
+            results.append(report)
+
+    @staticmethod
+    def ruby_scans(config):
+        return [SastyWrapper.brakeman]
+
     @staticmethod
     def ruby(config):
+        return SastyWrapper.execute_parallel(SastyWrapper.ruby_scans(config), config, 'brakeman')
+
+    @staticmethod
+    def brakeman(config, results=None):
         included_checks = ''
         exclude_checks = ''
         if config.get('include_checks', None):
@@ -87,12 +237,11 @@ class SastyWrapper(object):
         exec_cmd = f"brakeman {included_checks}{exclude_checks}--no-exit-on-warn --no-exit-on-error {excluded_files}" \
                    f"-o /tmp/brakeman.json " + SastyWrapper.get_code_path(config)
         execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
-        result = BrakemanParser("/tmp/brakeman.json", "brakeman").items
-        filtered_result = common_post_processing(config, result, "brakeman")
-        return filtered_result
+        result = parse_in_pool("brakeman", "/tmp/brakeman.json", "brakeman")
+        return SastyWrapper.extend_result(results, result)
 
     @staticmethod
-    def java(config):
+    def java_scans(config):
         scan_fns = [SastyWrapper.spotbugs]
         composition_analysis = config.get('composition_analysis', None)
         if composition_analysis:
@@ -102,51 +251,97 @@ class SastyWrapper(object):
             if isinstance(composition_analysis, dict):
                 config['comp_opts'] = composition_analysis.get('scan_opts', '')
                 config['comp_path'] = composition_analysis.get('scan_path', SastyWrapper.get_code_path(config))
-        return SastyWrapper.execute_parallel(scan_fns, config, 'java')
+        return scan_fns
+
+    @staticmethod
+    def java(config):
+        return SastyWrapper.execute_parallel(SastyWrapper.java_scans(config), config, 'java')
 
     @staticmethod
     def spotbugs(config, results=None):
         exec_cmd = "spotbugs -xml:withMessages {} -output /tmp/spotbugs.xml {}" \
                    "".format(config.get("scan_opts", ""), SastyWrapper.get_code_path(config))
         execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
-        result = SpotbugsParser("/tmp/spotbugs.xml", "spotbugs").items
+        result = parse_in_pool("spotbugs", "/tmp/spotbugs.xml", "spotbugs")
         return SastyWrapper.extend_result(results, result)
 
     @staticmethod
-    def nodejs(config):
+    def nodejs_scans(config):
         scan_fns = [SastyWrapper.nodejsscan]
         composition_analysis = config.get('composition_analysis', None)
         if composition_analysis:
-            scan_fns.extend([SastyWrapper.npm, SastyWrapper.retirejs])
+            SastyWrapper.composition_options(config, composition_analysis)
+            scan_fns.extend([SastyWrapper.npm_monorepo if config['monorepo'] else SastyWrapper.npm,
+                             SastyWrapper.retirejs])
             config['add_devdep'] = composition_analysis.get('devdep', False) \
                 if isinstance(composition_analysis, dict) else False
-        return SastyWrapper.execute_parallel(scan_fns, config, 'nodejs')
+            config['nvd'] = composition_analysis.get('nvd', {}) \
+                if isinstance(composition_analysis, dict) else {}
+        return scan_fns
+
+    @staticmethod
+    def nodejs(config):
+        return SastyWrapper.execute_parallel(SastyWrapper.nodejs_scans(config), config, 'nodejs')
 
     @staticmethod
     def npm(config, results=None):
-        deps = get_dependencies(SastyWrapper.get_code_path(config), config.get('add_devdep'))
+        result = SastyWrapper.npm_audit_path(config, SastyWrapper.get_code_path(config), '/tmp/npm_audit.json')
+        return SastyWrapper.extend_result(results, result)
+
+    @staticmethod
+    def npm_monorepo(config, results=None):
+        manifest_sets = SastyWrapper.unique_manifest_sets(config, ['package.json'],
+                                                          ['package-lock.json', 'npm-shrinkwrap.json'])
+        result = SastyWrapper.audit_manifests(config, manifest_sets, SastyWrapper.npm_audit)
+        return SastyWrapper.extend_result(results, result)
+
+    @staticmethod
+    def npm_audit(config, number, manifest):
+        path = os.path.join(SastyWrapper.get_code_path(config), os.path.dirname(manifest))
+        return SastyWrapper.npm_audit_path(config, path, constants.NPM_AUDIT_REPORT.format(number))
+
+    @staticmethod
+    def npm_audit_path(config, path, report):
+        deps = get_dependencies(path, config.get('add_devdep'), index=SastyWrapper.get_code_index(config))
         exec_cmd = "npm audit --json"
-        res = execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
-        with open('/tmp/npm_audit.json', 'w') as npm_audit:
+        res = execute(exec_cmd, cwd=path)
+        with open(report, 'w') as npm_audit:
             print(res[0].decode(encoding='ascii', errors='ignore'), file=npm_audit)
-        result = NpmScanParser("/tmp/npm_audit.json", "NpmScan", deps).items
-        return SastyWrapper.extend_result(results, result)
+        return parse_in_pool("npm", report, "NpmScan", deps)
 
     @staticmethod
     def retirejs(config, results=None):
-        deps = get_dependencies(SastyWrapper.get_code_path(config), config.get('add_devdep'))
-        exec_cmd = "retire --jspath={} --outputformat=json  " \
-                   "--outputpath=/tmp/retirejs.json --includemeta --exitwith=0"\
-            .format(SastyWrapper.get_code_path(config))
+        index = SastyWrapper.get_code_index(config)
+        if config.get('monorepo'):
+            # retire scans the whole tree at once, so dependencies of all manifests are used
+            deps = list()
+            seen = set()
+            for manifest in index.get_manifests('package.json'):
+                for item in get_dependencies(index.full_path(os.path.dirname(manifest)),
+                                             config.get('add_devdep'), index=index):
+                    if item not in seen:
+                        seen.add(item)
+                        deps.append(item)
+        else:
+            deps = get_dependencies(SastyWrapper.get_code_path(config), config.get('add_devdep'), index=index)
+        exec_cmd = ["retire", f"--jspath={SastyWrapper.get_code_path(config)}", "--outputformat=json",
+                    "--outputpath=/tmp/retirejs.json", "--includemeta", "--exitwith=0"]
+        # Vendored libraries are what retire looks for, so only excluded paths and build output are skipped
+        ignored = [index.full_path(path) for path in index.excluded + index.generated]
+        if ignored:
+            exec_cmd.extend(["--ignore", ",".join(ignored)])
         res = execute(exec_cmd, cwd='/tmp')
-        result = RetireScanParser("/tmp/retirejs.json", "RetireScan", deps).items
+        with profile.stage("nvd_enrichment"):
+            enrichment = NvdEnricher.from_config(config).enrich(
+                get_parser("retirejs").get_nvd_references("/tmp/retirejs.json", deps))
+        result = parse_in_pool("retirejs", "/tmp/retirejs.json", "RetireScan", deps, enrichment=enrichment)
         return SastyWrapper.extend_result(results, result)
 
     @staticmethod
     def nodejsscan(config, results=None):
         exec_cmd = "nodejsscan -o nodejsscan -d {}".format(SastyWrapper.get_code_source(config))
         res = execute(exec_cmd, cwd='/tmp')
-        result = NodeJsScanParser("/tmp/nodejsscan.json", "NodeJsScan").items
+        result = parse_in_pool("nodejsscan", "/tmp/nodejsscan.json", "NodeJsScan")
         return SastyWrapper.extend_result(results, result)
 
     @staticmethod
@@ -155,25 +350,48 @@ class SastyWrapper(object):
         filtered_statuses = config.get('filtered_statuses', constants.PTAI_DEFAULT_FILTERED_STATUSES)
         if isinstance(filtered_statuses, str):
             filtered_statuses = [item.strip() for item in filtered_statuses.split(",")]
-        result = PTAIScanParser(file_path, filtered_statuses).items
+        result = parse_in_pool("ptai", file_path, filtered_statuses)
         filtered_result = ptai_post_processing(config, result)
         return filtered_result
 
     @staticmethod
     def safety(config, results=None):
+        result = SastyWrapper.safety_files(config, config.get('files', []), '/tmp/safety_report.json')
+        return SastyWrapper.extend_result(results, result)
+
+    @staticmethod
+    def safety_monorepo(config, results=None):
+        manifest_sets = SastyWrapper.unique_manifest_sets(config, ['requirements*.txt'])
+        result = SastyWrapper.audit_manifests(config, manifest_sets, SastyWrapper.safety_audit)
+        return SastyWrapper.extend_result(results, result)
+
+    @staticmethod
+    def safety_audit(config, number, manifest):
+        return SastyWrapper.safety_files(config, [manifest], constants.SAFETY_REPORT.format(number))
+
+    @staticmethod
+    def safety_files(config, files, report):
+        advisories = config.get('advisories')
+        if advisories and config.get('advisories_only'):
+            return parse_in_pool("safety_advisories", SastyWrapper.get_code_path(config), "SafetyScan",
+                                 files, advisories)
+        if SastyWrapper.in_process(config):
+            if inprocess.safety_available():
+                return parse_in_pool("safety_inprocess", SastyWrapper.get_code_path(config), "SafetyScan", files,
+                                     advisories=advisories)
+            logging.warning("In-process safety needs safety 1.x, running safety CLI")
         params_str = ''
-        for file_path in config.get('files', []):
+        for file_path in files:
             params_str += '-r {} '.format(file_path)
         exec_cmd = "safety check {}--full-report --json".format(params_str)
         res = execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
-        with open('/tmp/safety_report.json', 'w') as safety_audit:
+        with open(report, 'w') as safety_audit:
             print(res[0].decode(encoding='ascii', errors='ignore'), file=safety_audit)
-        result = SafetyScanParser("/tmp/safety_report.json", "SafetyScan").items
-        return SastyWrapper.extend_result(results, result)
+        return parse_in_pool("safety", report, "SafetyScan", advisories=advisories)
 
     @staticmethod
     def dependency_check(config, results=None):
         exec_cmd = 'dependency-check.sh -n -f JSON -o /tmp -s {} {}'.format(config['comp_path'], config['comp_opts'])
         execute(exec_cmd, cwd=SastyWrapper.get_code_path(config))
-        result = DependencyCheckParser("/tmp/dependency-check-report.json", "dependency_check").items
+        result = parse_in_pool("dependency_check", "/tmp/dependency-check-report.json", "dependency_check")
         return SastyWrapper.extend_result(results, result)
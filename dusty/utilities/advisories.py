@@ -0,0 +1,41 @@
+import os
+import json
+import logging
+import argparse
+
+from dusty.drivers.advisories import AdvisoryStore
+
+
+def main():
+    """ Builds local advisory store from OSV dumps and looks packages up in it """
+    logging.basicConfig(
+        level=logging.DEBUG if os.environ.get("debug", False) else logging.INFO,
+        datefmt='%Y.%m.%d %H:%M:%S',
+        format='%(asctime)s - %(levelname)8s - %(message)s',
+    )
+    parser = argparse.ArgumentParser(description='local advisory store')
+    parser.add_argument('-d', '--database', type=str, default=os.environ.get('advisories_db'),
+                        help="path to SQLite advisory store (advisories_db env)")
+    subparsers = parser.add_subparsers(dest='command')
+    import_parser = subparsers.add_parser('import', help="import OSV dumps: zip archives, dirs or JSON files")
+    import_parser.add_argument('paths', nargs='+')
+    lookup_parser = subparsers.add_parser('lookup', help="list advisories affecting package version")
+    lookup_parser.add_argument('ecosystem', help="OSV ecosystem: PyPI, npm, Maven, etc")
+    lookup_parser.add_argument('package')
+    lookup_parser.add_argument('version')
+    args = parser.parse_args()
+    if not args.database or not args.command:
+        parser.print_help()
+        return
+    store = AdvisoryStore(args.database, writable=args.command == 'import')
+    try:
+        if args.command == 'import':
+            store.import_osv(args.paths)
+        else:
+            print(json.dumps(store.lookup(args.ecosystem, args.package, args.version), indent=2))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
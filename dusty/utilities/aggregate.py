@@ -0,0 +1,36 @@
+import os
+import logging
+from time import time
+
+from dusty.run import config_from_yaml, process_results
+from dusty.utils import common_post_processing
+from dusty.drivers.redis_findings import RedisFindings
+
+
+def main():
+    """ Merges findings stored by the shards of one run (same run_id) and reports them once """
+    logging.basicConfig(
+        level=logging.DEBUG if os.environ.get("debug", False) else logging.INFO,
+        datefmt='%Y.%m.%d %H:%M:%S',
+        format='%(asctime)s - %(levelname)8s - %(message)s',
+    )
+    if not os.environ.get("redis_connection"):
+        logging.error("redis_connection is not set, nothing to aggregate")
+        return
+    start_time = time()
+    default_config, _ = config_from_yaml()
+    # Snapshot is already in Redis, do not store merged results again
+    default_config['redis_findings'] = False
+    storage = RedisFindings(os.environ.get("redis_connection"))
+    global_errors = storage.errors()
+    findings = storage.load()
+    logging.info("Aggregating %d findings from %s", len(findings), ', '.join(storage.tools()))
+    # Shards store raw findings: filtering and reporting are done here, once per run
+    results, other_results = common_post_processing(default_config, findings, "aggregated",
+                                                    need_other_results=True, global_errors=global_errors)
+    process_results(default_config, start_time, results, other_results=other_results,
+                    global_errors=global_errors)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,13 +15,16 @@
 import re
 import os
 import json
+import heapq
 import random
 import string
 import logging
 import threading
+from time import sleep, time
 from subprocess import Popen, PIPE
 from datetime import datetime
 from dusty import constants as c
+from dusty.instrumentation import profile
 from traceback import format_exc
 
 
@@ -29,6 +32,13 @@ def id_generator(size=6, chars=string.ascii_uppercase + string.digits):
     return ''.join(random.choice(chars) for _ in range(size))
 
 
+def get_run_id():
+    """ Returns identifier shared by all artifacts of the current run """
+    if not os.environ.get(c.RUN_ID_ENV_KEY):
+        os.environ[c.RUN_ID_ENV_KEY] = f'{datetime.utcnow().strftime("%Y%m%d%H%M%S")}_{id_generator(8)}'
+    return os.environ[c.RUN_ID_ENV_KEY]
+
+
 def cwe_to_severity(cwe_score):
     if cwe_score <= 3.9:
         priority = "Low"
@@ -121,11 +131,15 @@ def send_emails(emails_service, jira_is_used, jira_tickets_info, attachments, er
 
 
 def execute(exec_cmd, cwd='/tmp', communicate=True):
-    print(f'Running: {exec_cmd}')
-    proc = Popen(exec_cmd.split(), cwd=cwd, stdout=PIPE, stderr=PIPE)
+    """ Runs command (string split by whitespace or list of arguments) """
+    args = exec_cmd if isinstance(exec_cmd, list) else exec_cmd.split()
+    print(f'Running: {" ".join(args[:c.EXECUTE_LOG_MAX_ARGS])}{" ..." if len(args) > c.EXECUTE_LOG_MAX_ARGS else ""}')
+    proc = Popen(args, cwd=cwd, stdout=PIPE, stderr=PIPE)
+    profile.count("subprocesses")
 
     if communicate:
-        res = proc.communicate()
+        with profile.stage(f"execute.{args[0]}"):
+            res = proc.communicate()
         print("Done")
         if os.environ.get("debug", False):
             print(f"stdout: {res[0]}")
@@ -176,34 +190,47 @@ def process_min_priority(config, results, other_results=None):
 
 
 def common_post_processing(config, result, tool_name, need_other_results=False, global_errors=None):
-    other_results = []
-    filtered_result = process_false_positives(result, config)
-    filtered_result = process_min_priority(config, filtered_result, other_results=other_results)
-    try:
-        report_to_rp(config, filtered_result, tool_name)
-    except BaseException as e:
-        print("Failed to report issues in RP")
-        if os.environ.get("debug", False):
-            print(format_exc())
-        if isinstance(global_errors, dict):
-            global_errors["ReportPortal"] = str(e)
-    try:
-        report_to_jira(config, filtered_result)
-    except BaseException as e:
-        print("Failed to report issues in Jira")
-        if os.environ.get("debug", False):
-            print(format_exc())
-        if isinstance(global_errors, dict):
-            global_errors["Jira"] = str(e)
+    if config.get('redis_findings'):
+        # Shard of distributed run: raw findings go to Redis, aggregate filters and reports them once
+        result = list(result)
+        return (result, []) if need_other_results else result
+    with profile.stage("common_post_processing"):
+        other_results = []
+        with profile.stage("process_false_positives"):
+            filtered_result = process_false_positives(result, config)
+        with profile.stage("process_min_priority"):
+            filtered_result = process_min_priority(config, filtered_result, other_results=other_results)
+        try:
+            with profile.stage("report_to_rp"):
+                report_to_rp(config, filtered_result, tool_name)
+        except BaseException as e:
+            print("Failed to report issues in RP")
+            if os.environ.get("debug", False):
+                print(format_exc())
+            if isinstance(global_errors, dict):
+                global_errors["ReportPortal"] = str(e)
+        try:
+            with profile.stage("report_to_jira"):
+                report_to_jira(config, filtered_result)
+        except BaseException as e:
+            print("Failed to report issues in Jira")
+            if os.environ.get("debug", False):
+                print(format_exc())
+            if isinstance(global_errors, dict):
+                global_errors["Jira"] = str(e)
     if need_other_results:
         return filtered_result, other_results
     return filtered_result
 
 
 def ptai_post_processing(config, result):
-    filtered_result = process_false_positives(result, config)
-    filtered_result = process_min_priority(config, filtered_result)
-    report_to_jira(config, filtered_result)
+    if config.get('redis_findings'):
+        return list(result)
+    with profile.stage("ptai_post_processing"):
+        filtered_result = process_false_positives(result, config)
+        filtered_result = process_min_priority(config, filtered_result)
+        with profile.stage("report_to_jira"):
+            report_to_jira(config, filtered_result)
     return filtered_result
 
 
@@ -219,6 +246,45 @@ def run_in_parallel(fns):
     return results
 
 
+class AdaptivePoller(object):
+    """ Waits for long-running remote job: polls often at first, backs off exponentially while nothing
+        changes, and when numeric progress towards target is reported, sleeps for about half of the
+        estimated remaining time. Each wait is recorded as poll.<name> stage of the run profile """
+
+    def __init__(self, min_interval=c.POLL_MIN_INTERVAL, max_interval=c.POLL_MAX_INTERVAL,
+                 factor=c.POLL_BACKOFF_FACTOR):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+
+    def wait(self, name, condition, status=None, message=None, target=None):
+        """ Sleeps while condition() is true; status() returns progress value (logged with message
+            on change), target is its final value (100 for percents, 0 for queues) if known """
+        start_time = time()
+        interval = self.min_interval
+        value = status() if status else None
+        value_time = time()
+        if message and value is not None:
+            logging.info(message, value)
+        with profile.stage(f"poll.{name}"):
+            while condition():
+                sleep(interval)
+                interval = min(interval * self.factor, self.max_interval)
+                if status is None:
+                    continue
+                next_value = status()
+                if next_value == value:
+                    continue
+                now = time()
+                if message:
+                    logging.info(message, next_value)
+                if target is not None:
+                    rate = abs(next_value - value) / max(now - value_time, 0.001)
+                    interval = min(max(abs(target - next_value) / rate / 2, self.min_interval), self.max_interval)
+                value, value_time = next_value, now
+        logging.info("Waited for %s: %.1f seconds", name, time() - start_time)
+
+
 def define_jira_priority(severity, priority_mapping=None):
     priority = c.SEVERITY_MAPPING[severity]
     if priority_mapping and priority in priority_mapping:
@@ -299,9 +365,110 @@ def prepare_jira_mapping(jira_service):
     return mapping
 
 
-def get_dependencies(file_path, add_devdep=False):
-    package_json = json.load(open(f'{file_path}/package.json'))
+def balance_by_size(files, groups):
+    """ Splits (path, size) pairs into up to `groups` lists of similar total size (largest files first) """
+    heap = [(0, index, list()) for index in range(max(groups, 1))]
+    for path, size in sorted(files, key=lambda item: item[1], reverse=True):
+        total, index, group = heapq.heappop(heap)
+        group.append(path)
+        heapq.heappush(heap, (total + size, index, group))
+    return [group for _, _, group in sorted(heap, key=lambda item: item[1]) if group]
+
+
+def split_arguments(args, max_length=c.MAX_ARGUMENTS_LENGTH):
+    """ Splits argument list into batches fitting into command line length limit """
+    batch, length = list(), 0
+    for arg in args:
+        if batch and length + len(arg) + 1 > max_length:
+            yield batch
+            batch, length = list(), 0
+        batch.append(arg)
+        length += len(arg) + 1
+    if batch:
+        yield batch
+
+
+def get_dependencies(file_path, add_devdep=False, index=None):
+    """ Returns dependency names from package.json (read once through code index, when given) """
+    if index is not None:
+        package_json = index.load_json(os.path.relpath(os.path.join(file_path, 'package.json'), index.code_path))
+    else:
+        package_json = json.load(open(f'{file_path}/package.json'))
     deps = list(package_json.get('dependencies', {}).keys())
     if add_devdep:
         deps.extend(list(package_json.get('devDependencies', {}).keys()))
     return deps
+
+
+class JsonStream(object):
+    """ Decodes JSON document one value at a time from buffered reads """
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+    NUMBER_CHARS = set('0123456789.eE+-')
+
+    def __init__(self, file_obj, chunk_size=c.JSON_STREAM_CHUNK_SIZE):
+        self.file_obj = file_obj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+
+    def fill(self, size=None):
+        chunk = self.file_obj.read(size if size else self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Returns next non-whitespace char ('' at the end of document) """
+        while True:
+            self.pos = self.WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' but got '{self.peek()}' in {self.file_obj.name}")
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(size):
+                    raise
+                size *= 2  # value is bigger than buffer, do not re-decode it once per chunk
+                continue
+            # Number may be cut by read boundary (at its end, or at '.', 'e' of float decoded as int)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and (end == len(self.buffer) or self.buffer[end] in self.NUMBER_CHARS) and self.fill(size):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(filename, key, chunk_size=c.JSON_STREAM_CHUNK_SIZE):
+    """ Yields items of top-level array `key` of JSON object one by one, without loading whole file """
+    with open(filename, encoding='utf-8') as f:
+        stream = JsonStream(f, chunk_size)
+        stream.expect('{')
+        while stream.peek() not in ['}', '']:
+            name = stream.decode()
+            stream.expect(':')
+            if name != key or stream.peek() != '[':
+                stream.decode()
+                if stream.peek() == ',':
+                    stream.expect(',')
+                continue
+            stream.expect('[')
+            while stream.peek() not in [']', '']:
+                yield stream.decode()
+                if stream.peek() == ',':
+                    stream.expect(',')
+            return
@@ -37,7 +37,9 @@ setup(
     entry_points={
         'console_scripts': [
             'run = dusty.run:main',
-            'jira_check = dusty.utilities.jira_check:main'
+            'jira_check = dusty.utilities.jira_check:main',
+            'aggregate = dusty.utilities.aggregate:main',
+            'advisories = dusty.utilities.advisories:main'
         ]
     },
 )
@@ -0,0 +1,75 @@
+import json
+import sqlite3
+
+import pytest
+
+from dusty.drivers.advisories import AdvisoryStore, parse_version
+
+RECORDS = [
+    {"id": "PYSEC-1", "aliases": ["CVE-2019-0001"], "summary": "range", "details": "introduced/fixed",
+     "database_specific": {"severity": "HIGH"},
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "Some_Package"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "1.0"}, {"fixed": "1.5"},
+                                                               {"introduced": "2.0"}, {"fixed": "2.1"}]}]}]},
+    {"id": "PYSEC-2", "summary": "last affected",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "other"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"last_affected": "3.0"}]}]}]},
+    {"id": "PYSEC-3", "summary": "versions",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "listed"}, "versions": ["0.1", "0.3"]}]},
+    {"id": "PYSEC-4", "summary": "withdrawn", "withdrawn": "2019-01-01T00:00:00Z",
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "listed"}, "versions": ["0.1"]}]},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    dump = tmp_path / "osv.json"
+    dump.write_text(json.dumps(RECORDS))
+    path = str(tmp_path / "advisories.sqlite")
+    writer = AdvisoryStore(path, writable=True)
+    writer.import_osv([str(dump)])
+    writer.close()
+    reader = AdvisoryStore(path)
+    yield reader
+    reader.close()
+
+
+def match(installed, introduced=None, fixed=None, last_affected=None, versions=None):
+    return AdvisoryStore.match(parse_version(installed), installed, introduced, fixed, last_affected, versions)
+
+
+def test_match_ranges():
+    assert match("1.0", introduced="1.0", fixed="1.5") == ">=1.0,<1.5"
+    assert match("0.9", introduced="1.0", fixed="1.5") is None
+    assert match("1.5", introduced="1.0", fixed="1.5") is None
+    assert match("3.0", introduced="0", last_affected="3.0") == "<=3.0"
+    assert match("3.0.1", introduced="0", last_affected="3.0") is None
+    assert match("5.0", introduced="0") == ">=0"
+    assert match("0.3", versions=json.dumps(["0.1", "0.3"])) == "==0.3"
+    assert match("0.2", versions=json.dumps(["0.1", "0.3"])) is None
+
+
+def test_lookup(store):
+    assert [item["id"] for item in store.lookup("PyPI", "some-package", "1.2")] == ["PYSEC-1"]
+    assert store.lookup("PyPI", "some.package", "2.0.5")[0]["affected"] == ">=2.0,<2.1"
+    assert store.lookup("PyPI", "some-package", "1.7") == []
+    assert store.lookup("PyPI", "other", "2.9")[0]["affected"] == "<=3.0"
+    assert [item["id"] for item in store.lookup("PyPI", "listed", "0.1")] == ["PYSEC-3"]
+    assert store.lookup("npm", "other", "2.9") == []
+    assert store.find_alias("CVE-2019-0001")["fixed"] == ["1.5", "2.1"]
+    assert store.severity("PyPI", "some-package", "1.2") == "High"
+
+
+def test_store_is_read_only(store):
+    with pytest.raises(sqlite3.OperationalError):
+        store.add(RECORDS[0])
+
+
+def test_missing_or_empty_store(tmp_path):
+    path = str(tmp_path / "typo.sqlite")
+    with pytest.raises(RuntimeError):
+        AdvisoryStore(path)
+    assert not (tmp_path / "typo.sqlite").exists()
+    AdvisoryStore(path, writable=True).import_osv([])
+    with pytest.raises(RuntimeError):
+        AdvisoryStore(path)
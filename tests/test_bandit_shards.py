@@ -0,0 +1,29 @@
+import json
+
+from dusty import constants, sastyWrapper
+from dusty.sastyWrapper import SastyWrapper
+
+
+def test_failed_shard_is_not_merged(tmp_path, monkeypatch):
+    code = tmp_path / "code"
+    code.mkdir()
+    for name in ["a.py", "b.py"]:
+        (code / name).write_text("x = 1\n")
+    report_dirs = set()
+
+    def execute(args, cwd=None):
+        report = args[args.index("-o") + 1]
+        report_dirs.add(report.rsplit("/", 1)[0])
+        if "a.py" in args[-1]:
+            with open(report, "w") as f:
+                json.dump({"results": [{"filename": args[-1]}], "errors": []}, f)
+        return b"", b""
+
+    monkeypatch.setattr(sastyWrapper, "execute", execute)
+    monkeypatch.setattr(constants, "BANDIT_REPORT", str(tmp_path / "bandit.json"))
+    SastyWrapper.bandit_sharded({"code_path": str(code)}, 2)
+    with open(constants.BANDIT_REPORT) as f:
+        merged = json.load(f)
+    assert [item["filename"].rsplit("/", 1)[1] for item in merged["results"]] == ["a.py"]
+    assert len(report_dirs) == 1
+    assert not any(tmp_path.joinpath(path).exists() for path in report_dirs)
@@ -0,0 +1,29 @@
+from dusty.data_model.canonical_model import DefaultModel as Finding, Endpoint, dump_finding, load_finding
+
+
+def make_finding():
+    finding = Finding(title="SQL Injection", severity="High", description="Line one\nLine two", tool="ZAP",
+                      endpoints=[Endpoint(protocol="https", host="example.com", port=443, path="/login")],
+                      file_path="app/views.py", line=12, cwe="89", static_finding=True)
+    finding.unsaved_endpoints = [Endpoint(protocol="http", host="example.com", port=80, path="/")]
+    finding.scan_type = "DAST"
+    return finding
+
+
+def test_dict_round_trip():
+    finding = make_finding()
+    restored = Finding.from_dict(finding.to_dict())
+    assert restored.finding["title"] == finding.finding["title"]
+    # Description is not processed again on restore
+    assert restored.finding["description"] == finding.finding["description"]
+    assert restored.severity == finding.severity
+    assert restored.scan_type == "DAST"
+    assert [str(item) for item in restored.unsaved_endpoints] == [str(item) for item in finding.unsaved_endpoints]
+    assert restored.get_hash_code() == finding.get_hash_code()
+
+
+def test_dump_load_finding():
+    finding = make_finding()
+    restored = load_finding(dump_finding(finding))
+    assert restored.to_dict() == finding.to_dict()
+    assert restored.get_hash_code() == finding.get_hash_code()
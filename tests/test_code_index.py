@@ -0,0 +1,89 @@
+import os
+import hashlib
+
+import pytest
+
+from dusty.code_index import CodeIndex, get_code_index
+
+TREE = {
+    "app/main.py": "print(1)\n",
+    "app/views.rb": "",
+    "app/static/app.js": "var a;\n",
+    "app/tests/test_main.py": "",
+    "README.md": "",
+    "requirements.txt": "flask==1.0\n",
+    "web/package.json": '{"dependencies": {"left-pad": "1.0.0"}}',
+    "node_modules/left-pad/index.js": "",
+    "venv/lib/site.py": "",
+    "build/generated.java": "",
+    "pkg/setup.py": "",
+    "pkg/build/lib/pkg/copy.py": "",
+    "pkg/src/build/__init__.py": "",
+    "web/dist/bundle.js": "",
+}
+
+
+def make_tree(root):
+    for path, text in TREE.items():
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(text)
+    return str(root)
+
+
+def test_walk(tmp_path):
+    index = CodeIndex(make_tree(tmp_path))
+    paths = [item.path for item in index.files]
+    assert "node_modules/left-pad/index.js" not in paths
+    assert sorted(index.vendored) == ["node_modules", "venv"]
+    assert sorted(index.generated) == ["pkg/build", "web/dist"]
+    assert "build/generated.java" in paths
+    assert "pkg/src/build/__init__.py" in paths
+    assert index.excluded == []
+    assert index.languages() == ["python", "java", "nodejs", "ruby"]
+    assert index.get_files("python", full_paths=False) == [
+        ("app/main.py", 9), ("app/tests/test_main.py", 0), ("pkg/setup.py", 0), ("pkg/src/build/__init__.py", 0)]
+    assert index.get_files("nodejs")[0][0] == os.path.join(str(tmp_path), "app/static/app.js")
+    assert index.get_manifests("requirements*.txt", "package.json") == ["requirements.txt", "web/package.json"]
+
+
+def test_exclusions(tmp_path):
+    index = CodeIndex(make_tree(tmp_path), ["build", "app/tests/*", "*.rb"])
+    paths = [item.path for item in index.files]
+    assert "build/generated.java" not in paths
+    assert "app/tests/test_main.py" not in paths
+    assert "app/views.rb" not in paths
+    assert "app/main.py" in paths
+    assert sorted(index.excluded) == ["app/tests/test_main.py", "app/views.rb", "build", "pkg/build",
+                                     "pkg/src/build"]
+    assert index.languages() == ["python", "nodejs"]
+
+
+def test_file_access_and_cache(tmp_path):
+    code_path = make_tree(tmp_path)
+    index = get_code_index(code_path)
+    assert get_code_index(code_path) is index
+    assert get_code_index(code_path, ["build"]) is not index
+    assert index.file_hash("app/main.py") == hashlib.sha256(b"print(1)\n").hexdigest()
+    assert index.load_json("web/package.json") is index.load_json("web/package.json")
+
+
+def test_retire_ignores_excluded_and_generated(tmp_path, monkeypatch):
+    from dusty import sastyWrapper
+
+    class Executed(Exception):
+        pass
+
+    def execute(args, cwd=None):
+        raise Executed(args)
+
+    code_path = make_tree(tmp_path)
+    monkeypatch.setattr(sastyWrapper, "execute", execute)
+    with pytest.raises(Executed) as e:
+        sastyWrapper.SastyWrapper.retirejs({"code_path": code_path, "code_exclusions": ["app/tests"],
+                                                 "monorepo": True})
+    args = e.value.args[0]
+    assert args[:2] == ["retire", f"--jspath={code_path}"]
+    assert args[-2:] == ["--ignore", ",".join(os.path.join(code_path, path)
+                                                for path in ["app/tests", "pkg/build", "web/dist"])]
@@ -0,0 +1,20 @@
+import sys
+import subprocess
+
+from dusty.sastyWrapper import SastyWrapper
+
+
+def test_in_process_is_opt_in(monkeypatch):
+    monkeypatch.delenv("in_process", raising=False)
+    assert SastyWrapper.in_process({}) is False
+    assert SastyWrapper.in_process({"in_process": True}) is True
+    assert SastyWrapper.in_process({"in_process": "yes"}) is True
+    monkeypatch.setenv("in_process", "false")
+    assert SastyWrapper.in_process({}) is False
+
+
+def test_parsers_are_not_imported_with_wrapper():
+    code = "import sys, dusty.sastyWrapper; " \
+           "print(sorted(m for m in sys.modules if m.startswith('dusty.data_model.') and m.endswith('.parser')))"
+    output = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, check=True).stdout
+    assert output.decode().strip() == "[]"
@@ -0,0 +1,27 @@
+import pytest
+
+from dusty.instrumentation import RunProfile
+
+
+def test_hook_saves_profile(tmp_path):
+    profile = RunProfile()
+    profile.enable_hooks("parse", str(tmp_path))
+    with profile.stage("parse"):
+        sum(range(1000))
+    assert sorted(item.name for item in tmp_path.iterdir()) == \
+        ["parse-1.prof", "parse-1.tracemalloc", "parse-1.txt"]
+    assert profile.stages["parse"]["calls"] == 1
+
+
+def test_failed_dump_keeps_stage_exception(tmp_path):
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    profile = RunProfile()
+    profile.enable_hooks("parse", str(not_a_dir))
+    with pytest.raises(KeyError):
+        with profile.stage("parse"):
+            raise KeyError("stage failed")
+    with profile.stage("parse"):
+        pass
+    assert profile.stages["parse"]["calls"] == 2
+    assert not profile.hook_lock.locked()
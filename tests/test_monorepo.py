@@ -0,0 +1,17 @@
+import json
+from unittest import mock
+
+from dusty import sastyWrapper
+from dusty.sastyWrapper import SastyWrapper
+
+
+def test_retire_dependencies_of_all_manifests_once(tmp_path, monkeypatch):
+    for name, deps in [("a", ["lodash", "jquery"]), ("b", ["jquery", "react"]), ("c", ["lodash"])]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "package.json").write_text(json.dumps({"dependencies": dict.fromkeys(deps, "1.0")}))
+    parse_in_pool = mock.MagicMock(return_value=[])
+    monkeypatch.setattr(sastyWrapper, "execute", lambda *args, **kwargs: (b"", b""))
+    monkeypatch.setattr(sastyWrapper, "get_parser", lambda name: mock.MagicMock())
+    monkeypatch.setattr(sastyWrapper, "parse_in_pool", parse_in_pool)
+    SastyWrapper.retirejs({"code_path": str(tmp_path), "monorepo": True, "nvd": {"offline": True}})
+    assert parse_in_pool.call_args[0][3] == ["lodash", "jquery", "react"]
@@ -0,0 +1,35 @@
+import json
+
+from dusty.drivers.nvd import NvdEnricher
+
+RESOLVED = {"description": "Remote code execution", "fixed_version": "1.2.3"}
+EMPTY = {"description": None, "fixed_version": None}
+URL = "https://nvd.nist.gov/vuln/detail/{}"
+
+
+def test_only_resolved_lookups_are_cached(tmp_path, monkeypatch):
+    answers = {URL.format("CVE-2019-0001"): RESOLVED, URL.format("CVE-2019-0002"): EMPTY}
+
+    def fetch_one(reference):
+        if reference == URL.format("CVE-2019-0003"):
+            raise IOError("timeout")
+        return answers[reference]
+
+    enricher = NvdEnricher(cache_path=str(tmp_path))
+    monkeypatch.setattr(enricher, "fetch_one", fetch_one)
+    references = [URL.format(f"CVE-2019-000{index}") for index in range(1, 4)]
+    info = enricher.enrich(references)
+    assert info[references[0]] == RESOLVED
+    assert info[references[1]] == EMPTY
+    assert references[2] not in info
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["CVE-2019-0001.json"]
+
+
+def test_empty_cache_entries_are_looked_up_again(tmp_path, monkeypatch):
+    (tmp_path / "CVE-2019-0002.json").write_text(json.dumps(EMPTY))
+    enricher = NvdEnricher(cache_path=str(tmp_path))
+    monkeypatch.setattr(enricher, "fetch_one", lambda reference: RESOLVED)
+    assert enricher.enrich([URL.format("CVE-2019-0002")]) == {URL.format("CVE-2019-0002"): RESOLVED}
+    assert json.loads((tmp_path / "CVE-2019-0002.json").read_text()) == RESOLVED
+    enricher.offline = True
+    assert enricher.enrich([URL.format("cve-2019-0002")]) == {URL.format("cve-2019-0002"): RESOLVED}
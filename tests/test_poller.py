@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+from dusty import utils
+from dusty.utils import AdaptivePoller
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock(object):
+        now = 0.0
+        sleeps = list()
+
+        def sleep(self, seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+    clock = Clock()
+    monkeypatch.setattr(utils, "sleep", clock.sleep)
+    monkeypatch.setattr(utils, "time", lambda: clock.now)
+    return clock
+
+
+def test_backs_off_without_progress(clock):
+    checks = iter([True, True, True, True, False])
+    AdaptivePoller(1, 5, 2).wait("test", lambda: next(checks))
+    assert clock.sleeps == [1, 2, 4, 5]
+
+
+def test_unchanged_status_keeps_backing_off(clock):
+    checks = iter([True, True, True, False])
+    AdaptivePoller(1, 10, 2).wait("test", lambda: next(checks), lambda: 42, "Status: %d", target=100)
+    assert clock.sleeps == [1, 2, 4]
+
+
+def test_sleeps_half_of_estimated_remaining_time(clock):
+    progress = lambda: min(int(clock.now * 10), 100)  # noqa: E731
+    AdaptivePoller(1, 100, 2).wait("test", lambda: progress() < 100, progress, "Progress: %d%%", target=100)
+    assert clock.sleeps[:3] == pytest.approx([1, 4.5, 2.25])
+    assert min(clock.sleeps) == 1
+    assert clock.now >= 10
+
+
+def test_message_is_logged_only_with_status(clock, caplog):
+    caplog.set_level(logging.INFO)
+    checks = iter([True, False])
+    AdaptivePoller(1, 5, 2).wait("test", lambda: next(checks), message="Progress: %d%%")
+    assert "Progress" not in caplog.text
+    assert "Waited for test" in caplog.text
@@ -0,0 +1,31 @@
+import json
+import os
+
+import pytest
+
+from dusty.data_model.ptai.parser import PTAIScanParser
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+REPORT = os.path.join(DATA, "ptai.html")
+# Produced by the BeautifulSoup parser this one replaced
+EXPECTED = os.path.join(DATA, "ptai_expected.json")
+FIELDS = ("title", "description", "severity", "static_finding_details", "steps_to_reproduce")
+
+
+@pytest.mark.parametrize("name,args", [("default", ()), ("all", ([],))])
+def test_matches_bs4_parser(name, args):
+    with open(EXPECTED, encoding="utf8") as f:
+        expected = json.load(f)[name]
+    items = PTAIScanParser(REPORT, *args).items
+    assert [{key: item.finding[key] for key in FIELDS} for item in items] == expected
+
+
+def test_duplicates_merged():
+    items = list(PTAIScanParser(REPORT).items)
+    assert [item.finding["title"] for item in items] == ["SQL Injection in ...\\db.py", "Debug Mode Enabled"]
+    assert len(items[0].finding["steps_to_reproduce"]) == 2
+    assert "user_id: is not validated" in items[0].finding["steps_to_reproduce"][0]
+
+
+def test_missing_report(tmp_path):
+    assert not PTAIScanParser(str(tmp_path / "missing.html")).items
@@ -0,0 +1,26 @@
+import os
+
+from dusty.data_model.canonical_model import dump_finding, load_finding
+from dusty.data_model.qualys.parser import QualysWebAppParser
+
+REPORT = os.path.join(os.path.dirname(__file__), "data", "qualys.xml")
+
+
+def test_payloads_decoded_on_use():
+    items = {item.finding["title"]: item for item in QualysWebAppParser(REPORT, "test").items}
+    assert sorted(items) == ["DNS Host Name - Information Gathered",
+                             "Reflected Cross-Site Scripting - Confirmed Vulnerability"]
+    xss = items["Reflected Cross-Site Scripting - Confirmed Vulnerability"]
+    references = xss.finding["references"]
+    assert references.text is None
+    assert str(references) == f"GET: http://example.com/search?q=1\n\nResponse: &lt;b&gt;{'A' * 50}&lt;/b&gt;\n\n"
+    assert xss.finding["severity"] == "Critical"
+    assert str(items["DNS Host Name - Information Gathered"].finding["references"]) == "&lt;html&gt;ok&lt;/html&gt;"
+    assert load_finding(dump_finding(xss)).finding["references"] == str(references)
+
+
+def test_payloads_truncated():
+    items = {item.finding["title"]: item for item in QualysWebAppParser(REPORT, "test", max_payload_size=10).items}
+    references = str(items["Reflected Cross-Site Scripting - Confirmed Vulnerability"]
+                     .finding["references"])
+    assert f"Response: &lt;b&gt;{'A' * 7}\n\n... (truncated to 10 bytes)\n\n" in references
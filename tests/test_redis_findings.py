@@ -0,0 +1,46 @@
+import pytest
+
+from dusty.data_model.canonical_model import DefaultModel as Finding
+from dusty.drivers.redis_findings import RedisFindings
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_storage():
+    storage = RedisFindings.__new__(RedisFindings)
+    storage.client = fakeredis.FakeRedis()
+    storage.run_id = "test"
+    storage.ttl = 60
+    return storage
+
+
+def make_finding(title, severity, tool="bandit", endpoint=None, description=None):
+    finding = Finding(title=title, severity=severity, description=description or title, tool=tool)
+    if endpoint:
+        finding.unsaved_endpoints.append(endpoint)
+    return finding
+
+
+def test_findings_of_all_shards_are_loaded_once():
+    storage = make_storage()
+    storage.store([make_finding("high", "High"), make_finding("info", "Info")], errors={"safety": "failed"})
+    # Second shard of the same run
+    storage.store([make_finding("high", "High"), make_finding("medium", "Medium", tool="safety")])
+    assert sorted(item.finding["title"] for item in storage.load()) == ["high", "info", "medium"]
+    assert storage.tools() == ["bandit", "safety"]
+    assert storage.errors() == {"safety": "failed"}
+    assert storage.is_known(make_finding("info", "Info"))
+    assert not storage.is_known(make_finding("info", "Info", tool="safety"))
+
+
+def test_dast_findings_with_same_title_are_kept():
+    storage = make_storage()
+    storage.store([
+        make_finding("X-Frame-Options Header Not Set", "Medium", "ZAP", "http://example.com/a"),
+        make_finding("X-Frame-Options Header Not Set", "Medium", "ZAP", "http://example.com/b"),
+        make_finding("X-Frame-Options Header Not Set", "Medium", "ZAP", "http://example.com/a", "other text"),
+    ])
+    loaded = storage.load()
+    assert len(loaded) == 3
+    assert sorted(item.unsaved_endpoints[0] for item in loaded) == \
+        ["http://example.com/a", "http://example.com/a", "http://example.com/b"]
@@ -0,0 +1,41 @@
+import os
+
+import pkg_resources
+
+from dusty.data_model.registry import ParserRegistry, parse_artifact, registry
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+def test_resolve_artifact():
+    assert registry.resolve_artifact("/tmp/zap.json") == "zap_report"
+    assert registry.resolve_artifact("/tmp/bandit_shard_0_1.json") == "bandit"
+    assert registry.resolve_artifact("/tmp/npm_audit.json") == "npm"
+    assert registry.resolve_artifact("/tmp/npm_audit_3.json") == "npm"
+    assert registry.resolve_artifact("/tmp/safety_report.json") == "safety"
+    assert registry.resolve_artifact("/tmp/safety_report_2.json") == "safety"
+
+
+def test_parse_artifact_zap_report():
+    parser = parse_artifact(os.path.join(DATA, "zap.json"), "ZAP")
+    assert len(parser.items) == 1
+    finding = parser.items[0].finding
+    assert finding["title"] == "X-Content-Type-Options Header Missing"
+    assert finding["severity"] == "Low"
+    assert finding["tool"] == "ZAP"
+
+
+def test_parse_artifact_numbered_safety_report():
+    items = list(parse_artifact(os.path.join(DATA, "safety_report_1.json"), "SafetyScan").items)
+    assert [item.finding["title"] for item in items] == ["Update django 1.11.20 to 1.11.29 version"]
+
+
+class PluginParser(object):
+    pass
+
+
+def test_entry_point_overrides_built_in_on_first_lookup(monkeypatch):
+    entry_point = pkg_resources.EntryPoint.parse("bandit = tests.test_registry:PluginParser")
+    monkeypatch.setattr(pkg_resources, "iter_entry_points", lambda group: [entry_point])
+    monkeypatch.setattr(entry_point, "resolve", lambda: PluginParser)
+    assert ParserRegistry().get("bandit") is PluginParser
@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from dusty.utils import balance_by_size, split_arguments, JsonStream, iter_json_array
+
+DOCUMENT = {
+    "meta": {"items": [1, 2], "name": "skipped [array]"},
+    "count": 12345,
+    "items": [{"id": 1, "text": "a \"quoted\" ,] value"}, 67890, "x" * 50, [], {"nested": [1.5e3, None, True]}],
+    "tail": "ignored"
+}
+
+
+def test_balance_by_size():
+    files = [("a", 100), ("b", 60), ("c", 50), ("d", 30), ("e", 10)]
+    groups = balance_by_size(files, 2)
+    assert sorted(path for group in groups for path in group) == ["a", "b", "c", "d", "e"]
+    sizes = dict(files)
+    totals = sorted(sum(sizes[path] for path in group) for group in groups)
+    assert totals == [120, 130]
+    assert balance_by_size(files[:1], 4) == [["a"]]
+    assert balance_by_size([], 3) == []
+    assert balance_by_size(files, 0) == [["a", "b", "c", "d", "e"]]
+
+
+def test_split_arguments():
+    args = ["aaaa", "bbbb", "cccc", "d"]
+    assert list(split_arguments(args, max_length=10)) == [["aaaa", "bbbb"], ["cccc", "d"]]
+    assert list(split_arguments(["a" * 20, "b"], max_length=10)) == [["a" * 20], ["b"]]
+    assert list(split_arguments([], max_length=10)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1024])
+def test_json_stream_values(chunk_size):
+    stream = JsonStream(io.StringIO(' 123456 , "text" [1, {"a": 2}] '), chunk_size)
+    assert stream.decode() == 123456
+    stream.expect(',')
+    assert stream.decode() == "text"
+    assert stream.decode() == [1, {"a": 2}]
+    assert stream.peek() == ''
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1024])
+def test_iter_json_array(tmp_path, chunk_size):
+    path = tmp_path / "report.json"
+    path.write_text(json.dumps(DOCUMENT, indent=2))
+    assert list(iter_json_array(str(path), "items", chunk_size)) == DOCUMENT["items"]
+    assert list(iter_json_array(str(path), "missing", chunk_size)) == []
+    path.write_text('{"items": []}')
+    assert list(iter_json_array(str(path), "items", chunk_size)) == []
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 20))
+@pytest.mark.parametrize("document", [
+    '{"items": [1.5e3]}',
+    '{"items": [12.75]}',
+    '{"items": [{"cvssScore": 7.5}, -0.25, 1E-5, 2.5e+10, 100, true]}',
+])
+def test_iter_json_array_numbers(tmp_path, chunk_size, document):
+    path = tmp_path / "report.json"
+    path.write_text(document)
+    assert list(iter_json_array(str(path), "items", chunk_size)) == json.loads(document)["items"]
+
+
+def test_iter_json_array_not_an_object(tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text('[1, 2]')
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), "items"))
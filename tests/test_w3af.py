@@ -0,0 +1,23 @@
+import os
+
+from dusty.data_model.canonical_model import DefaultModel, dump_finding, load_finding
+from dusty.data_model.w3af.parser import W3AFXMLParser
+
+REPORT = os.path.join(os.path.dirname(__file__), "data", "w3af.xml")
+
+
+def test_references_rendered_on_use():
+    items = list(W3AFXMLParser(REPORT, "test").items)
+    assert len(items) == 1
+    references = items[0].finding["references"]
+    assert references.text is None
+    assert "Body:<html></html>" in references
+    assert references.text is not None
+    assert "Request: http://example.com/a GET 200" in str(items[0])
+
+
+def test_references_serialized_as_text():
+    item = list(W3AFXMLParser(REPORT, "test").items)[0]
+    restored = load_finding(dump_finding(item))
+    assert isinstance(restored, DefaultModel)
+    assert restored.finding["references"] == str(item.finding["references"])
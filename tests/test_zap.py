@@ -0,0 +1,109 @@
+import pathlib
+from unittest import mock
+
+import pytest
+from lxml import etree
+
+pytest.importorskip("zapv2")
+pytest.importorskip("qualysapi")
+
+from dusty.drivers import zap  # noqa: E402
+from dusty.dustyWrapper import DustyWrapper  # noqa: E402
+
+
+def make_daemon(url=None):
+    daemon = zap.ZapDaemon(url=url)
+    daemon.api = mock.MagicMock()
+    return daemon
+
+
+def test_end_scan_stops_scans_and_removes_policy():
+    daemon = make_daemon()
+    daemon.api.spider.stop_all_scans.side_effect = IOError("connection reset")
+    daemon.end_scan("dusty_policy")
+    daemon.api.ajaxSpider.stop.assert_called_once_with()
+    daemon.api.ascan.stop_all_scans.assert_called_once_with()
+    daemon.api.ascan.remove_scan_policy.assert_called_once_with("dusty_policy")
+    daemon.end_scan()
+    assert daemon.api.ascan.remove_scan_policy.call_count == 1
+
+
+def test_failed_scan_is_cleaned_up_before_release():
+    daemon = make_daemon()
+    daemon.apply_scan_policy = mock.MagicMock()
+    daemon.api.spider.scan.side_effect = IOError("spider failed")
+    pool = mock.MagicMock()
+    pool.acquire.return_value = daemon
+    calls = mock.MagicMock()
+    daemon.end_scan = calls.end_scan
+    pool.release = calls.release
+    with mock.patch("dusty.dustyWrapper.get_zap_pool", return_value=pool):
+        with pytest.raises(IOError):
+            DustyWrapper.zap({"protocol": "http", "host": "example.com", "port": 80})
+    policy_name = daemon.apply_scan_policy.call_args[0][0]
+    assert calls.mock_calls == [mock.call.end_scan(policy_name), mock.call.release(daemon)]
+
+
+def test_make_scan_policy():
+    root = etree.fromstring(zap.make_scan_policy("dusty_policy", [40012, 10095]))
+    assert root.findtext("policy") == "dusty_policy"
+    assert [item.tag for item in root.find("plugins")] == ["p40012", "p10095"]
+    assert root.findtext("plugins/p40012/enabled") == "false"
+    assert root.findtext("plugins/p10095/level") == "OFF"
+
+
+def test_apply_scan_policy_imports_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(zap.c, "ZAP_POLICY_PATH", str(tmp_path / "{}.policy"))
+    daemon = make_daemon()
+    daemon.api.ascan.scanners.return_value = [{"id": "40012"}, {"id": "40018"}, {"id": "90019"}]
+    imported = list()
+    daemon.api.ascan.import_scan_policy.side_effect = lambda path: imported.append(pathlib.Path(path).read_bytes())
+    daemon.apply_scan_policy("dusty_policy", ["xss"])
+    disabled = [item.tag for item in etree.fromstring(imported[0]).find("plugins")]
+    assert disabled == ["p10095", "p40018", "p90019"]
+    assert list(tmp_path.iterdir()) == []
+    daemon.api.pscan.disable_scanners.assert_called_once_with(ids="10095")
+    daemon.api.ascan.add_scan_policy.assert_not_called()
+
+
+def test_apply_scan_policy_external_daemon():
+    daemon = make_daemon(url="http://zap:8080")
+    daemon.apply_scan_policy("dusty_policy", ["all"])
+    daemon.api.ascan.scanners.assert_not_called()
+    daemon.api.ascan.add_scan_policy.assert_called_once_with("dusty_policy")
+    daemon.api.ascan.disable_scanners.assert_called_once_with(ids="10095", scanpolicyname="dusty_policy")
+    daemon.api.ascan.import_scan_policy.assert_not_called()
+
+
+def test_zap_targets():
+    config = {"protocol": "http", "host": "suite.local", "port": 80}
+    assert DustyWrapper.zap_targets(config) == [config]
+    targets = DustyWrapper.zap_targets(dict(config, targets="https://a.example.com, http://b.example.com:8080/app"))
+    assert [(item["protocol"], item["host"], item["port"]) for item in targets] == \
+        [("https", "a.example.com", 443), ("http", "b.example.com", 8080)]
+
+
+def test_targets_reuse_pool_daemons():
+    pool = zap.ZapPool(size=1)
+    daemon = make_daemon()
+    daemon.healthy = lambda: True
+    pool.daemons.append(daemon)
+    pool.free_ports = []
+    pool.idle.put(daemon)
+    scanned = list()
+
+    def zap_scan(config):
+        used = pool.acquire()
+        scanned.append((config["host"], used))
+        pool.release(used)
+        if config["host"] == "c.example.com":
+            raise IOError("scan failed")
+        return [config["host"]]
+
+    config = {"targets": ["http://a.example.com", "http://b.example.com", "http://c.example.com"]}
+    with mock.patch("dusty.dustyWrapper.get_zap_pool", return_value=pool), \
+            mock.patch.object(DustyWrapper, "zap_scan", side_effect=zap_scan):
+        tool_name, results = DustyWrapper.zap(config)
+    assert results == ["a.example.com", "b.example.com"]
+    assert [item[1] for item in scanned] == [daemon] * 3
+    assert pool.capacity == 1